@@ -0,0 +1,94 @@
+"""
+Statistiche mensili di spesa per categoria, calcolate in modo vettoriale.
+
+L'aggregazione (categoria, mese) è un singolo np.bincount su chiavi intere:
+niente groupby riga per riga, resta sotto il secondo anche con 1M di
+transazioni. Gli importi arrivano in unità minori (interi) e i totali
+mensili sono somme esatte: si torna alla valuta solo nelle statistiche
+finali. I mesi senza spesa contano come zero, altrimenti media e
+percentili sarebbero gonfiati per le categorie occasionali.
+"""
+import datetime
+import math
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+STAT_COLUMNS = ["mesi", "totale", "media", "mediana", "p25", "p75", "p90"]
+
+# Base per il limite suggerito: etichetta UI -> colonna delle statistiche
+LIMIT_BASIS = {"Media": "media", "Mediana": "mediana", "75° percentile": "p75", "90° percentile": "p90"}
+
+
+def monthly_category_stats(date_ms: np.ndarray, amounts_minor: np.ndarray, categories: np.ndarray,
+                           exclude: np.ndarray = None, decimals=2) -> pd.DataFrame:
+    """
+    Spesa mensile per categoria: una riga per categoria con media, mediana e
+    percentili sul periodo coperto dallo storico. Considera solo le uscite
+    (importo < 0) non escluse (es. trasferimenti). `decimals` è un intero o
+    un array per riga (valute con cifre decimali diverse).
+    """
+    date_ms = np.asarray(date_ms, dtype=np.int64)
+    amounts = np.asarray(amounts_minor, dtype=np.int64)
+    decimals = np.asarray(decimals, dtype=np.int64)
+    scale_dec = int(decimals.max()) if decimals.size else 2
+    if decimals.ndim:  # porta tutto alla stessa scala intera
+        amounts = amounts * 10 ** (scale_dec - decimals)
+    mask = amounts < 0
+    if exclude is not None:
+        mask &= ~np.asarray(exclude, dtype=bool)
+    if not mask.any():
+        return pd.DataFrame(columns=STAT_COLUMNS, dtype=float)
+
+    months = date_ms[mask].astype("datetime64[ms]").astype("datetime64[M]").astype(np.int64)
+    first, n_months = months.min(), int(months.max() - months.min()) + 1
+    codes, names = pd.factorize(np.asarray(categories, dtype=object)[mask])
+
+    # I pesi float64 sono esatti per interi fino a 2^53 unità minori
+    totals = np.bincount(
+        codes * n_months + (months - first), weights=-amounts[mask], minlength=len(names) * n_months
+    ).reshape(len(names), n_months) / 10 ** scale_dec
+
+    p25, p50, p75, p90 = np.percentile(totals, [25, 50, 75, 90], axis=1)
+    stats = pd.DataFrame({
+        "mesi": n_months,
+        "totale": totals.sum(axis=1),
+        "media": totals.mean(axis=1),
+        "mediana": p50,
+        "p25": p25,
+        "p75": p75,
+        "p90": p90,
+    }, index=pd.Index(names, name="categoria"))
+    return stats.sort_values("totale", ascending=False)
+
+
+def suggest_limits(stats: pd.DataFrame, basis: str = "p75", round_to: int = 5) -> Dict[str, float]:
+    """Limite mensile suggerito per categoria, arrotondato per eccesso"""
+    return {
+        cat: float(math.ceil(value / round_to) * round_to)
+        for cat, value in stats[basis].items() if value > 0
+    }
+
+
+def _month_bounds_ms(today: datetime.date):
+    start = datetime.datetime(today.year, today.month, 1)
+    nxt = datetime.datetime(today.year + today.month // 12, today.month % 12 + 1, 1)
+    return int(start.timestamp() * 1000), int(nxt.timestamp() * 1000) - 1
+
+
+def write_budget_suggestions(db, limits: Dict[str, float], category_pks: Dict[str, str],
+                             budget_pk: str, wallet_fk: str, name: str = "Budget mensile suggerito",
+                             today: datetime.date = None) -> int:
+    """
+    Scrive un budget mensile ricorrente pari alla somma dei limiti e un
+    category_budget_limit per ogni categoria nota. Restituisce i limiti scritti.
+    """
+    limits = {cat: v for cat, v in limits.items() if cat in category_pks}
+    if not limits:
+        return 0
+    start_ms, end_ms = _month_bounds_ms(today or datetime.date.today())
+    db.add_budget(budget_pk, name, sum(limits.values()), start_ms, end_ms, wallet_fk)
+    for cat, amount in limits.items():
+        db.add_category_budget_limit(f"{budget_pk}-{category_pks[cat]}", category_pks[cat], budget_pk, amount, wallet_fk)
+    return len(limits)
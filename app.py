@@ -1,10 +1,8 @@
 import streamlit as st
 import copy
-from models import DEFAULT_CASHEW_STRUCTURE
-from ui.step1_upload import render_step1
-from ui.step2_categories import render_step2
-from ui.step3_mapping import render_step3
-from ui.step4_export import render_step4
+import importlib
+import os
+from defaults import DEFAULT_CASHEW_STRUCTURE
 
 # --- CONFIG & STYLE ---
 st.set_page_config(page_title="Wallet to Cashew Migrator", page_icon="🥥", layout="wide")
@@ -114,10 +112,13 @@ st.markdown("""
 # --- STATE ---
 if 'step' not in st.session_state: st.session_state.step = 1
 if 'transactions' not in st.session_state: st.session_state.transactions = []
+if 'rejects' not in st.session_state: st.session_state.rejects = []
 if 'mapping' not in st.session_state: st.session_state.mapping = {}
 if 'accounts' not in st.session_state: st.session_state.accounts = {}
 if 'cashew_struct' not in st.session_state: st.session_state.cashew_struct = copy.deepcopy(DEFAULT_CASHEW_STRUCTURE)
 if 'selected_cat_editor' not in st.session_state: st.session_state.selected_cat_editor = list(st.session_state.cashew_struct.keys())[0]
+if 'rules' not in st.session_state: st.session_state.rules = []
+if 'payee_map' not in st.session_state: st.session_state.payee_map = None
 if 'output_format' not in st.session_state: st.session_state.output_format = "SQL"
 
 # --- HEADER ---
@@ -142,16 +143,25 @@ wizard_html += '</div>'
 st.markdown(wizard_html, unsafe_allow_html=True)
 
 # --- ROUTER ---
+# Gli step vengono importati solo quando servono: pandas, plotly, thefuzz e
+# pydantic non rallentano il primo caricamento della pagina.
+STEP_RENDERERS = {
+    1: ("ui.step1_upload", "render_step1"),
+    2: ("ui.step2_categories", "render_step2"),
+    3: ("ui.step3_mapping", "render_step3"),
+    4: ("ui.step4_export", "render_step4"),
+}
+
 # Using a main container for consistent spacing
 with st.container():
-    if st.session_state.step == 1:
-        render_step1()
-    elif st.session_state.step == 2:
-        render_step2()
-    elif st.session_state.step == 3:
-        render_step3()
-    elif st.session_state.step == 4:
-        render_step4()
+    if st.session_state.step in STEP_RENDERERS:
+        module_name, func_name = STEP_RENDERERS[st.session_state.step]
+        getattr(importlib.import_module(module_name), func_name)()
+
+# Monitoraggio memoria (per chi gestisce il deploy)
+if os.environ.get("CASHEW_SHOW_MEMORY"):
+    from ui.session import render_memory_monitor
+    render_memory_monitor()
 
 # Footer
 st.markdown("""
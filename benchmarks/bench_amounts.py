@@ -0,0 +1,60 @@
+"""
+Importi float vs interi in unità minori: somme, group-by e deriva di arrotondamento.
+
+Uso (dalla root del repo):
+    python -m benchmarks.bench_amounts [--rows 1000000]
+"""
+import argparse
+import time
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import ACCOUNTS
+
+
+def _timed(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(5)
+    minor = rng.integers(-30_000, 20_000, args.rows)
+    floats = minor / 100.0
+    accounts = pd.Categorical(np.array(ACCOUNTS, dtype=object)[rng.integers(0, len(ACCOUNTS), args.rows)])
+    df = pd.DataFrame({"account": accounts, "amount": floats, "amount_minor": minor})
+
+    f_sum, t_fsum = _timed(lambda: floats.sum())
+    i_sum, t_isum = _timed(lambda: minor.sum())
+    f_grp, t_fgrp = _timed(lambda: df.groupby("account", observed=True)["amount"].sum())
+    i_grp, t_igrp = _timed(lambda: df.groupby("account", observed=True)["amount_minor"].sum())
+
+    # Riferimento esatto: Decimal sugli stessi importi
+    exact = sum(Decimal(int(v)) for v in minor) / 100
+    # Accumulo riga per riga (come un saldo calcolato in un loop Python)
+    running = 0.0
+    for v in floats.tolist():
+        running += v
+
+    print(f"{args.rows:,} importi")
+    print(f"  somma float64      {t_fsum * 1000:8.2f} ms   errore {abs(Decimal(repr(float(f_sum))) - exact)}")
+    print(f"  somma int64        {t_isum * 1000:8.2f} ms   errore {abs(Decimal(int(i_sum)) / 100 - exact)}")
+    print(f"  loop float         {'':>8}      errore {abs(Decimal(repr(running)) - exact)}")
+    print(f"  group-by float64   {t_fgrp * 1000:8.2f} ms")
+    print(f"  group-by int64     {t_igrp * 1000:8.2f} ms   "
+          f"conti con saldo diverso al centesimo: {int((f_grp.round(2) * 100).round().astype(np.int64).ne(i_grp).sum())}")
+    print(f"  0.1 x 10 in float = {sum([0.1] * 10)!r}, in centesimi = {sum([10] * 10)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Tempo delle statistiche mensili per categoria (analytics.monthly_category_stats).
+
+Uso (dalla root del repo):
+    python -m benchmarks.bench_analytics [--rows 1000000]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from analytics import monthly_category_stats, suggest_limits
+from benchmarks.synthetic import CATEGORIES
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(3)
+    start_ms = 1_500_000_000_000  # luglio 2017
+    date_ms = start_ms + rng.integers(0, 8 * 365 * 86_400_000, args.rows)
+    amounts = rng.integers(-30_000, 20_000, args.rows)  # unità minori (centesimi)
+    categories = np.array(CATEGORIES, dtype=object)[rng.integers(0, len(CATEGORIES), args.rows)]
+    transfers = rng.random(args.rows) < 0.05
+
+    monthly_category_stats(date_ms[:1000], amounts[:1000], categories[:1000])  # warm-up import numpy/pandas
+    start = time.perf_counter()
+    stats = monthly_category_stats(date_ms, amounts, categories, exclude=transfers)
+    limits = suggest_limits(stats)
+    elapsed = time.perf_counter() - start
+
+    print(stats.round(2).head())
+    print(f"\n{args.rows:,} transazioni, {len(stats)} categorie x {int(stats['mesi'].iloc[0])} mesi "
+          f"-> {len(limits)} limiti in {elapsed:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Upload compressi: dimensione, tempo di parsing e picco di memoria della
+lettura CSV in streaming contro "decomprimi tutto e poi analizza".
+
+Il picco è misurato (tracemalloc) sulla sola lettura CSV -> DataFrame a
+blocchi, senza costruire i modelli: è la parte che cambia tra i due modi.
+
+Uso (dalla root del repo):
+    python -m benchmarks.bench_compression [--rows 200000]
+"""
+import argparse
+import bz2
+import gzip
+import io
+import lzma
+import time
+import tracemalloc
+import zipfile
+
+import pandas as pd
+
+from benchmarks.synthetic import wallet_csv_bytes
+from compression import open_source_streams
+from logic import parse_upload
+from readers.wallet_csv import CHUNK_ROWS
+
+
+def read_rows(data: bytes) -> int:
+    rows = 0
+    for _, stream in open_source_streams(io.BytesIO(data)):
+        for df in pd.read_csv(stream, sep=";", chunksize=CHUNK_ROWS):
+            rows += len(df)
+    return rows
+
+
+def peak_mb(fn) -> float:
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024 / 1024
+
+
+def _zip(data: bytes) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("wallet-export.csv", data)
+    return buf.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    plain = wallet_csv_bytes(args.rows)
+    formats = {
+        "csv": (plain, None),
+        "gzip": (gzip.compress(plain), gzip.decompress),
+        "xz": (lzma.compress(plain, preset=1), lzma.decompress),
+        "bz2": (bz2.compress(plain), bz2.decompress),
+        "zip": (_zip(plain), lambda d: zipfile.ZipFile(io.BytesIO(d)).read("wallet-export.csv")),
+    }
+    mb = 1024 * 1024
+    print(f"{args.rows:,} righe, CSV in chiaro {len(plain) / mb:.1f} MB")
+    print(f"{'formato':8} {'upload MB':>10} {'parse s':>8} {'picco stream MB':>16} {'picco tutto-in-RAM MB':>22}")
+    for name, (data, decompress) in formats.items():
+        start = time.perf_counter()
+        assert len(parse_upload(io.BytesIO(data))) == args.rows
+        elapsed = time.perf_counter() - start
+        p_stream = peak_mb(lambda: read_rows(data))
+        p_full = p_stream if decompress is None else peak_mb(lambda: read_rows(decompress(data)))
+        print(f"{name:8} {len(data) / mb:10.1f} {elapsed:8.2f} {p_stream:16.1f} {p_full:22.1f}")
+
+if __name__ == "__main__":
+    main()
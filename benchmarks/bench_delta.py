@@ -0,0 +1,72 @@
+"""
+Aggiornamento incrementale del DB costruito (builder.MigrationBuilder)
+contro ricostruzione completa, dopo una modifica di mapping o di struttura.
+
+Uso (dalla root del repo):
+    python -m benchmarks.bench_delta [--rows 200000]
+"""
+import argparse
+import copy
+import random
+import time
+
+from benchmarks.synthetic import ACCOUNTS, CATEGORIES
+from builder import MigrationBuilder
+from defaults import DEFAULT_CASHEW_STRUCTURE
+from models import AccountConfig, CashewConfig, WalletTransaction
+
+
+def transactions(n: int, seed: int = 7):
+    rnd = random.Random(seed)
+    # "Cinema" è rara (~0,5% delle righe): una modifica che tocca poche transazioni
+    cats = [c for c in CATEGORIES if c != "Cinema"]
+    return [
+        WalletTransaction.model_construct(
+            account=rnd.choice(ACCOUNTS), category="Cinema" if rnd.random() < 0.005 else rnd.choice(cats),
+            currency="EUR", amount_minor=rnd.randint(-30_000, 20_000), note="", payee="",
+            date_str=f"{2018 + i % 6}-{1 + i % 12:02d}-{1 + i % 28:02d} 10:00:00",
+            is_transfer=False, temp_id=None, paired_with_idx=None,
+        )
+        for i in range(n)
+    ]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    ts = transactions(args.rows)
+    accounts = {a: AccountConfig(name_cashew=a) for a in ACCOUNTS}
+    struct = copy.deepcopy(DEFAULT_CASHEW_STRUCTURE)
+    mains = list(struct)
+    mapping = {c: CashewConfig(main_category=mains[i % len(mains)]) for i, c in enumerate(CATEGORIES)}
+
+    builder = MigrationBuilder()
+    sync = lambda: builder.sync(ts, accounts, struct, mapping, [], {})
+    t_full = timed(sync)
+    print(f"{args.rows:,} transazioni")
+    print(f"  costruzione completa           {t_full:7.3f} s")
+
+    for cat in ("Cinema", "Cibo"):
+        mapping[cat] = CashewConfig(main_category=mains[-1])
+        t = timed(sync)
+        print(f"  mapping '{cat}' ({builder.last_sync}, {builder.rows_touched:,} righe) {t:7.3f} s")
+
+    struct[mains[0]]["color"] = "#000000"
+    struct["Nuova"] = {"color": "#123456", "icon": "category_default.png", "subs": ["Sub"]}
+    t = timed(sync)
+    print(f"  struttura ({builder.last_sync}, {builder.categories_touched} categorie, "
+          f"{builder.rows_touched} righe) {t:7.3f} s")
+    t = timed(sync)
+    print(f"  nessuna modifica ({builder.last_sync})         {t:7.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark del cold start dell'app Streamlit.
+
+Ogni misura gira in un interprete nuovo (niente cache di sys.modules):
+- cold start: primo render di app.py tramite streamlit.testing (nessun browser)
+  e moduli pesanti caricati al primo paint;
+- costo di import per modulo, letto da `python -X importtime`.
+
+Uso (dalla root del repo):
+    python -m benchmarks.bench_imports [--runs 3]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    "streamlit", "pandas", "plotly.graph_objects", "thefuzz.process", "pydantic",
+    "defaults", "resources", "models", "logic", "database",
+    "ui.step1_upload", "ui.step2_categories", "ui.step3_mapping", "ui.step4_export",
+]
+HEAVY = ["pandas", "plotly", "thefuzz", "pydantic", "pyarrow", "numpy"]
+
+COLD_START_SCRIPT = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+at = AppTest.from_file("app.py", default_timeout=120)
+at.run()
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({
+    "ms": elapsed,
+    "errors": [str(e.value) for e in at.exception],
+    "heavy": [m for m in %r if m in sys.modules],
+}))
+""" % (HEAVY,)
+
+
+def _python(args):
+    return subprocess.run([sys.executable] + args, cwd=ROOT, capture_output=True, text=True)
+
+
+def cold_start(runs: int) -> dict:
+    times, heavy, errors = [], [], []
+    for _ in range(runs):
+        proc = _python(["-c", COLD_START_SCRIPT])
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr)
+        res = json.loads(proc.stdout.strip().splitlines()[-1])
+        times.append(res["ms"])
+        heavy, errors = res["heavy"], res["errors"]
+    return {"median_ms": statistics.median(times), "heavy_loaded": heavy, "errors": errors}
+
+
+def import_cost(module: str, runs: int) -> float:
+    """Tempo cumulativo (ms) dell'import di `module`, mediana su `runs` interpreti"""
+    samples = []
+    for _ in range(runs):
+        proc = _python(["-X", "importtime", "-c", f"import {module}"])
+        if proc.returncode != 0:
+            return float("nan")
+        # Formato: "import time: self [us] | cumulative | imported package"
+        cumulative = 0
+        for line in proc.stderr.splitlines():
+            parts = line.split("|")
+            if len(parts) == 3 and parts[2].strip() == module:
+                cumulative = int(parts[1])
+        samples.append(cumulative / 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    res = cold_start(args.runs)
+    print(f"Cold start (primo render app.py): {res['median_ms']:.0f} ms")
+    print(f"Moduli pesanti caricati al primo paint: {', '.join(res['heavy_loaded']) or 'nessuno'}")
+    for err in res["errors"]:
+        print(f"  ! eccezione nell'app: {err}")
+
+    print(f"\n{'Modulo':<24}{'Import (ms)':>12}")
+    for module in MODULES:
+        print(f"{module:<24}{import_cost(module, args.runs):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
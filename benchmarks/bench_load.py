@@ -0,0 +1,239 @@
+"""
+Load test del backend degli step: N migrazioni in parallelo su un server.
+
+Tutte le sessioni girano come thread dello stesso processo, come le sessioni
+di un server Streamlit: condividono la cache dei CSV analizzati e le risorse
+di processo (resources.py), si contendono il GIL e ricadono nello stesso
+report di memoria (session_memory.py, budget per sessione e spill su disco).
+
+Non è un load test dell'interfaccia: nessun widget viene disegnato (AppTest
+usa un Runtime singleton per processo e non regge sessioni concorrenti).
+Ogni sessione chiama, con gli stessi argomenti, le funzioni di backend
+chiamate dai moduli ui/step*: upload (parse_upload_cached con scarti,
+account_currencies, rejects_frame), mappatura (ai_suggest_mapping,
+validate_rules e apply_rules con un set di regole sui payee sintetici),
+costruzione (cluster_payees, MigrationBuilder.sync con le stesse regole,
+monthly_stats, sync_budgets, verify) ed export (get_restore_sqlite).
+
+Per ogni numero di sessioni stampa p50/p95 per step, throughput, picco di
+RSS del processo e memoria contabilizzata per le sessioni, e indica da
+quante sessioni la latenza p95 peggiora oltre la soglia rispetto alla prima
+misura. Con --distinct K le sessioni caricano solo K file diversi (es. la
+stessa banca per più utenti), così si vede l'effetto della cache condivisa.
+
+Uso (dalla root del repo):
+    python -m benchmarks.bench_load [--sessions 1,2,4,8] [--rows 5000] [--rounds 1] [--distinct 0]
+"""
+import argparse
+import copy
+import os
+import resource
+import threading
+import time
+
+from benchmarks.synthetic import dirty_wallet_csv_bytes
+
+STEPS = ("upload", "mappatura", "costruzione", "export")
+SAMPLE_S = 0.05
+BAD_RATIO = 0.02
+# Regole come le compilerebbe un utente nello step 3 (parole chiave e regex
+# sui payee di benchmarks/synthetic.py): (pattern, regex, campo, categoria, sotto)
+RULES = [
+    ("esselunga", False, "payee", "Alimentari", "Supermercato"),
+    ("conad", False, "any", "Alimentari", "Supermercato"),
+    (r"^(amazon|amzn)\b", True, "payee", "Shopping", "Casa"),
+    (r"netflix|spotify", True, "payee", "Intrattenimento", "Streaming (Netflix/Spotify)"),
+    ("eni station", False, "payee", "Trasporti", "Carburante"),
+    ("trenitalia", False, "any", "Trasporti", "Treno"),
+]
+
+
+def percentile(values, q: float) -> float:
+    """Percentile nearest-rank (va bene anche con poche misure)"""
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered) + 0.5) - 1))]
+
+
+def _rss_kb() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def simulate_session(session_id: str, data: bytes) -> dict:
+    """Il backend di una migrazione completa, step per step: latenza (s) di ciascuno"""
+    from analytics import LIMIT_BASIS, suggest_limits
+    from builder import MigrationBuilder
+    from defaults import DEFAULT_CASHEW_STRUCTURE
+    from logic import account_currencies, ai_suggest_mapping, parse_upload_cached
+    from models import AccountConfig, CashewConfig, PayeeRule
+    from payees import cluster_payees
+    from rules import apply_rules, validate_rules
+    from session_memory import SessionArtifacts
+    from validation import rejects_frame
+
+    art = SessionArtifacts(session_id)
+    times = {}
+
+    start = time.perf_counter()
+    rejects = []
+    transactions = parse_upload_cached(data, rejects)
+    accounts = {acc: AccountConfig(name_cashew=acc, currency=cur)
+                for acc, cur in account_currencies(transactions).items()}
+    rejects_frame(rejects)
+    art.track("transactions", transactions)
+    times["upload"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    struct = copy.deepcopy(DEFAULT_CASHEW_STRUCTURE)
+    suggestions = ai_suggest_mapping(list({t.category for t in transactions}), struct)
+    mapping = {cat: CashewConfig(main_category=s["main"], sub_category=s["sub"]) for cat, s in suggestions.items()}
+    rules, _ = validate_rules([PayeeRule(pattern=p, is_regex=rx, field=f, main_category=m, sub_category=sub)
+                               for p, rx, f, m, sub in RULES])
+    apply_rules(transactions, rules)
+    times["mappatura"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    payee_map = cluster_payees(t.payee for t in transactions)
+    builder = MigrationBuilder()
+    builder.sync(transactions, accounts, struct, mapping, rules, payee_map)
+    art.put("db", builder.db)
+    builder.sync_budgets(suggest_limits(builder.monthly_stats(), LIMIT_BASIS["75° percentile"]))
+    art.refresh("db")
+    builder.verify()
+    times["costruzione"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    export, _ = builder.db.get_restore_sqlite()
+    art.put("export", export)
+    times["export"] = time.perf_counter() - start
+    return {"times": times, "artifacts": art}
+
+
+def run_level(n: int, args, uploads) -> dict:
+    from session_memory import memory_report
+
+    barrier = threading.Barrier(n + 1)
+    lock = threading.Lock()
+    sessions, errors, artifacts = [], [], []
+
+    def worker(index: int):
+        barrier.wait()
+        for r in range(args.rounds):
+            try:
+                out = simulate_session(f"load-{n}-{index}-{r}", uploads[(index * args.rounds + r) % len(uploads)])
+            except Exception as e:
+                with lock:
+                    errors.append(f"sessione {index}.{r}: {e!r}")
+                continue
+            with lock:
+                sessions.append(out["times"])
+                artifacts.append(out["artifacts"])  # le sessioni restano aperte fino a fine livello
+
+    peak = [_rss_kb()]
+    stop = threading.Event()
+
+    def sample():
+        while not stop.is_set():
+            peak[0] = max(peak[0], _rss_kb())
+            stop.wait(SAMPLE_S)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(n)]
+    for t in threads:
+        t.start()
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+    report = memory_report()
+    stop.set()
+    sampler.join()
+    for art in artifacts:
+        art.release()
+
+    totals = [sum(s.values()) for s in sessions]
+    return {
+        "sessions": n,
+        "steps": {step: (percentile([s[step] for s in sessions], 50), percentile([s[step] for s in sessions], 95))
+                  for step in STEPS} if sessions else {},
+        "p50": percentile(totals, 50),
+        "p95": percentile(totals, 95),
+        "completed": len(sessions),
+        "per_min": len(sessions) / wall * 60 if wall else 0.0,
+        "steps_per_s": len(sessions) * len(STEPS) / wall if wall else 0.0,
+        "rss_mb": peak[0] / 1024,
+        "session_mb": report["total_memory_bytes"] / 1024 / 1024,
+        "disk_mb": report["total_disk_bytes"] / 1024 / 1024,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", default="1,2,4,8",
+                        help="numeri di sessioni concorrenti da provare, separati da virgola")
+    parser.add_argument("--rows", type=int, default=5_000, help="transazioni per upload sintetico")
+    parser.add_argument("--rounds", type=int, default=1, help="sessioni consecutive per thread")
+    parser.add_argument("--distinct", type=int, default=0,
+                        help="file diversi caricati (0 = uno per sessione, nessun riuso della cache)")
+    parser.add_argument("--degrade", type=float, default=2.0,
+                        help="soglia di degrado: p95 totale rispetto alla prima misura")
+    args = parser.parse_args()
+    levels = [int(n) for n in args.sessions.split(",")]
+
+    # Un file per sessione di ogni livello (seed diversi tra livelli: la cache di
+    # parsing non deve trasformare il livello successivo in una serie di hit)
+    count = args.distinct or max(levels) * args.rounds
+    print(f"Un processo, {os.cpu_count()} CPU, upload di {args.rows:,} righe "
+          f"({BAD_RATIO:.0%} non valide), {args.rounds} sessioni per thread, "
+          f"{args.distinct or 'un'} file {'condivisi' if args.distinct else 'per sessione'}\n")
+
+    # Riscaldamento: import, indice fuzzy e pool SQLite, come in un server già avviato
+    simulate_session("warmup", dirty_wallet_csv_bytes(args.rows, BAD_RATIO, seed=0))["artifacts"].release()
+
+    summary = []
+    for level, n in enumerate(levels, 1):
+        seed = 0 if args.distinct else level * 100_000
+        uploads = [dirty_wallet_csv_bytes(args.rows, BAD_RATIO, seed=seed + i + 1) for i in range(count)]
+        res = run_level(n, args, uploads)
+        summary.append(res)
+        print(f"--- sessioni concorrenti: {n} ---")
+        for step, (p50, p95) in res["steps"].items():
+            print(f"  {step:12} p50 {p50 * 1000:8.0f} ms   p95 {p95 * 1000:8.0f} ms")
+        for err in res["errors"][:5]:
+            print(f"  ERRORE {err}")
+        print()
+
+    base = summary[0]["p95"]
+    print(f"{'sessioni':>8} {'p50 tot s':>10} {'p95 tot s':>10} {'sess/min':>9} {'step/s':>7} "
+          f"{'RSS MB':>7} {'sess MB':>8} {'disco MB':>8}  note")
+    knee = None
+    for res in summary:
+        degraded = res["p95"] > args.degrade * base
+        if degraded and knee is None:
+            knee = res["sessions"]
+        note = f"p95 > {args.degrade:g}x" if degraded else ""
+        if res["errors"]:
+            note += f" {len(res['errors'])} errori"
+        print(f"{res['sessions']:8} {res['p50']:10.2f} {res['p95']:10.2f} {res['per_min']:9.1f} "
+              f"{res['steps_per_s']:7.2f} {res['rss_mb']:7.0f} {res['session_mb']:8.1f} {res['disk_mb']:8.1f}  {note}")
+    print(f"\nPicco RSS del processo: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+    if knee is None:
+        print(f"Nessun degrado oltre {args.degrade:g}x fino a {levels[-1]} sessioni.")
+    else:
+        print(f"La latenza p95 supera {args.degrade:g}x la prima misura ({levels[0]} sessioni) "
+              f"a partire da {knee} sessioni concorrenti.")
+
+
+if __name__ == "__main__":
+    main()
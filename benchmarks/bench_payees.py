@@ -0,0 +1,52 @@
+"""
+Clustering dei payee (payees.cluster_payees) su molti payee distinti.
+
+Genera esercenti casuali con varianti realistiche (forme societarie,
+domini, maiuscole, numeri di punto vendita) e confronta il numero di
+confronti fuzzy con il caso "tutte le coppie".
+
+Uso (dalla root del repo):
+    python -m benchmarks.bench_payees [--distinct 100000]
+"""
+import argparse
+import random
+import string
+import time
+
+from payees import cluster_payees
+
+SUFFIXES = ["", " SPA", " S.R.L.", ".it", " EU SARL", " Mktp", " 0231", " srl", ".com"]
+
+
+def merchant(rnd):
+    words = ["".join(rnd.choice(string.ascii_lowercase) for _ in range(rnd.randint(4, 9)))
+             for _ in range(rnd.randint(1, 2))]
+    return " ".join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--distinct", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rnd = random.Random(11)
+    payees = set()
+    bases = [merchant(rnd) for _ in range(args.distinct // 4)]
+    while len(payees) < args.distinct:
+        base = rnd.choice(bases)
+        variant = base + rnd.choice(SUFFIXES)
+        if rnd.random() < 0.5:
+            variant = variant.upper()
+        payees.add(variant + (f" {rnd.randint(1, 999)}" if rnd.random() < 0.3 else ""))
+
+    start = time.perf_counter()
+    mapping = cluster_payees(payees)
+    elapsed = time.perf_counter() - start
+
+    clusters = len(set(mapping.values()))
+    print(f"{len(payees):,} payee distinti -> {clusters:,} cluster ({len(bases):,} esercenti generati)")
+    print(f"Tempo: {elapsed:.2f} s (tutte le coppie: {len(payees) * (len(payees) - 1) // 2:,} confronti)")
+
+
+if __name__ == "__main__":
+    main()
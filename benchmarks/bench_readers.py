@@ -0,0 +1,38 @@
+"""
+Throughput dei reader di formato sorgente (Wallet CSV, OFX, QIF, CSV bancario)
+su file sintetici, compresa l'auto-rilevazione dal prefisso.
+
+Uso (dalla root del repo):
+    python -m benchmarks.bench_readers [--rows 100000]
+"""
+import argparse
+import io
+import time
+
+from benchmarks.synthetic import bank_csv_bytes, ofx_bytes, qif_bytes, wallet_csv_bytes
+from logic import parse_upload
+from readers import DETECT_BYTES, detect_reader
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    files = {
+        "wallet_csv": wallet_csv_bytes(args.rows),
+        "ofx": ofx_bytes(args.rows),
+        "qif": qif_bytes(args.rows),
+        "bank_csv": bank_csv_bytes(args.rows),
+    }
+    print(f"{'formato':11} {'MB':>6} {'rilevato':>11} {'record':>8} {'s':>7} {'record/s':>10}")
+    for name, data in files.items():
+        detected = detect_reader(data[:DETECT_BYTES]).name
+        start = time.perf_counter()
+        ts = parse_upload(io.BytesIO(data))
+        elapsed = time.perf_counter() - start
+        print(f"{name:11} {len(data) / 1024 / 1024:6.1f} {detected:>11} {len(ts):8,} {elapsed:7.2f} {len(ts) / elapsed:10,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Finalizzazione del backup per il ripristino (CashewDatabase.get_restore_sqlite):
+dimensione del file prima/dopo e tempi di indici, ANALYZE e VACUUM.
+
+Uso (dalla root del repo):
+    python -m benchmarks.bench_restore [--rows 200000] [--deleted 0.2]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from benchmarks.bench_verify import build
+from database import RESTORE_INDEXES
+
+
+def index_bytes(data: bytes) -> dict:
+    """Byte occupati da ciascun indice migrator_* nel file finale (tabella virtuale dbstat)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "restore.sqlite")
+        with open(path, "wb") as f:
+            f.write(data)
+        conn = sqlite3.connect(path)
+        try:
+            return {name: conn.execute("SELECT COALESCE(SUM(pgsize), 0) FROM dbstat WHERE name = ?",
+                                       (name,)).fetchone()[0] for name, _ in RESTORE_INDEXES}
+        finally:
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--wallets", type=int, default=5)
+    parser.add_argument("--deleted", type=float, default=0.2,
+                        help="quota di transazioni cancellate dopo la costruzione (pagine libere)")
+    args = parser.parse_args()
+
+    db, _ = build(args.rows, args.wallets)
+    if args.deleted:
+        # Simula gli aggiornamenti a delta: righe rimosse lasciano pagine libere
+        step = max(1, round(1 / args.deleted))
+        db.cursor.execute("DELETE FROM transactions WHERE rowid % ? = 0", (step,))
+    db.conn.commit()
+
+    start = time.perf_counter()
+    plain = db.get_binary_sqlite()
+    plain_s = time.perf_counter() - start
+    start = time.perf_counter()
+    data, report = db.get_restore_sqlite()
+    total_s = time.perf_counter() - start
+
+    print(f"{args.rows:,} transazioni ({args.deleted:.0%} cancellate), {args.wallets} conti")
+    print(f"  export attuale   : {len(plain) / 1024 / 1024:8.2f} MB in {plain_s:.2f} s")
+    print(f"  come costruito   : {report.size_before / 1024 / 1024:8.2f} MB")
+    print(f"  ottimizzato      : {report.size_after / 1024 / 1024:8.2f} MB in {total_s:.2f} s")
+    sizes = index_bytes(data)
+    total = sum(sizes.values())
+    for name, size in sizes.items():
+        print(f"  {name:36}: {size / 1024 / 1024:8.2f} MB")
+    print(f"  indici in totale : {total / 1024 / 1024:8.2f} MB (+{total / (len(data) - total):.0%} sui dati)")
+    print(f"  indici {report.index_ms:.0f} ms, ANALYZE {report.analyze_ms:.0f} ms, VACUUM {report.vacuum_ms:.0f} ms")
+    print(f"  page_size {report.page_size}, user_version {report.user_version}, "
+          f"differenze di schema: {len(report.schema_issues)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Scalabilità della build completa a shard (shards.py) da 1 a N processi.
+
+Le transazioni sintetiche includono coppie di trasferimenti tra conti diversi,
+così con il partizionamento per conto le coppie attraversano gli shard. Per
+ogni numero di shard la build viene ripetuta e si tiene la migliore; il tempo
+include l'avvio dei processi worker, che ogni build crea e chiude.
+
+Lo speedup è misurato solo dove ci sono almeno tante CPU quanti shard: le
+altre righe sono marcate come non significative (i processi si contendono i
+core) e sotto la tabella compare una PROIEZIONE di Amdahl, non una misura,
+con la quota parallelizzabile (validazione + insert per riga) misurata nella
+build seriale.
+
+Uso (dalla root del repo):
+    python -m benchmarks.bench_shards [--rows 500000] [--max-shards 4] [--partition wallet]
+"""
+import argparse
+import copy
+import os
+import random
+import time
+from unittest import mock
+
+import builder as builder_module
+import database
+from benchmarks.synthetic import ACCOUNTS, CATEGORIES
+from builder import MigrationBuilder
+from defaults import DEFAULT_CASHEW_STRUCTURE
+from models import AccountConfig, CashewConfig, WalletTransaction
+from shards import PARTITIONS
+
+
+def transactions(n: int, seed: int = 11):
+    rnd = random.Random(seed)
+    out = []
+    for i in range(n):
+        date = f"{2015 + i % 10}-{1 + i % 12:02d}-{1 + i % 28:02d} {i % 24:02d}:{i % 60:02d}:00"
+        if i % 50 == 0:  # un trasferimento ogni 50 righe: uscita e entrata su conti diversi
+            src, dst = rnd.sample(ACCOUNTS, 2)
+            amount = rnd.randint(1_000, 50_000)
+            out += [WalletTransaction.model_construct(
+                account=acc, category="Transfer", currency="EUR", amount_minor=sign * amount, note="",
+                payee="", date_str=date, is_transfer=True, temp_id=None, paired_with_idx=None,
+            ) for acc, sign in ((src, -1), (dst, 1))]
+        else:
+            out.append(WalletTransaction.model_construct(
+                account=rnd.choice(ACCOUNTS), category=rnd.choice(CATEGORIES), currency="EUR",
+                amount_minor=rnd.randint(-30_000, 20_000), note=f"nota {i % 100}", payee="",
+                date_str=date, is_transfer=False, temp_id=None, paired_with_idx=None,
+            ))
+    return out[:n]
+
+
+def parallel_fraction(ts, accounts, struct, mapping) -> float:
+    """Quota della build seriale spesa nel lavoro che gli shard dividono"""
+    spent = [0.0]
+
+    def timed(fn):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                spent[0] += time.perf_counter() - start
+        return wrapper
+
+    with mock.patch.object(builder_module, "processed_from_rows", timed(builder_module.processed_from_rows)), \
+            mock.patch.object(database.CashewDatabase, "add_transactions",
+                              timed(database.CashewDatabase.add_transactions)):
+        start = time.perf_counter()
+        MigrationBuilder(shards=1).sync(ts, accounts, struct, mapping, [], {})
+        total = time.perf_counter() - start
+    return spent[0] / total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--max-shards", type=int, default=max(2, os.cpu_count() or 1))
+    parser.add_argument("--partition", choices=PARTITIONS, default="wallet")
+    parser.add_argument("--repeat", type=int, default=2)
+    args = parser.parse_args()
+
+    ts = transactions(args.rows)
+    accounts = {a: AccountConfig(name_cashew=a) for a in ACCOUNTS}
+    struct = copy.deepcopy(DEFAULT_CASHEW_STRUCTURE)
+    mains = list(struct)
+    mapping = {c: CashewConfig(main_category=mains[i % len(mains)]) for i, c in enumerate(CATEGORIES)}
+
+    print(f"{args.rows:,} transazioni, {len(ACCOUNTS)} conti, partizione per {args.partition}, "
+          f"{os.cpu_count()} CPU")
+    cpus = os.cpu_count() or 1
+    print(f"{'shard':>5} {'build s':>8} {'speedup':>8} {'efficienza':>10} {'coppie':>7}  misurato")
+    base = None
+    with mock.patch.object(builder_module, "SHARD_MIN_ROWS", 0):
+        for shards in range(1, args.max_shards + 1):
+            best = float("inf")
+            for _ in range(args.repeat):
+                b = MigrationBuilder(shards=shards, partition=args.partition)
+                start = time.perf_counter()
+                b.sync(ts, accounts, struct, mapping, [], {})
+                best = min(best, time.perf_counter() - start)
+            pairs = b.db.conn.execute("""
+                SELECT COUNT(*) FROM transactions t JOIN transactions p
+                ON p.transaction_pk = t.paired_transaction_fk AND p.paired_transaction_fk = t.transaction_pk
+            """).fetchone()[0]
+            base = base or best
+            note = "sì" if shards <= cpus else f"no, solo {cpus} CPU: non significativo"
+            print(f"{shards:5} {best:8.2f} {base / best:7.2f}x {base / best / shards:9.0%} {pairs // 2:7,}  {note}")
+
+    if cpus < args.max_shards:
+        p = parallel_fraction(ts, accounts, struct, mapping)
+        print(f"\nPROIEZIONE (non misurata): legge di Amdahl con quota parallelizzabile {p:.0%}, "
+              f"senza il costo di avvio worker, invio righe e unione; va confermata su {args.max_shards} CPU")
+        print(f"{'shard':>5} {'speedup stimato':>16}")
+        for shards in range(1, args.max_shards + 1):
+            print(f"{shards:5} {1 / ((1 - p) + p / shards):15.2f}x")
+
+
+if __name__ == "__main__":
+    main()
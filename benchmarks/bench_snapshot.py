@@ -0,0 +1,51 @@
+"""
+Ripresa da snapshot Arrow contro nuovo parsing del CSV.
+
+Uso (dalla root del repo):
+    python -m benchmarks.bench_snapshot [--rows 200000]
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import wallet_csv_bytes
+from defaults import DEFAULT_CASHEW_STRUCTURE
+from logic import parse_csv_to_models
+from snapshot import save_snapshot, load_snapshot, read_snapshot_table
+
+
+def timed(fn):
+    start = time.perf_counter()
+    res = fn()
+    return res, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    data = wallet_csv_bytes(args.rows)
+    ts, t_parse = timed(lambda: parse_csv_to_models(io.BytesIO(data)))
+    snap, t_save = timed(lambda: save_snapshot(ts, {}, DEFAULT_CASHEW_STRUCTURE, {}))
+
+    with tempfile.NamedTemporaryFile(suffix=".arrow", delete=False) as f:
+        f.write(snap)
+    try:
+        (_, _), t_table = timed(lambda: read_snapshot_table(f.name))
+        state, t_load = timed(lambda: load_snapshot(f.name))
+    finally:
+        os.remove(f.name)
+    assert len(state["transactions"]) == len(ts)
+
+    print(f"Righe: {len(ts):,}  CSV: {len(data) / 1e6:.1f} MB  snapshot: {len(snap) / 1e6:.1f} MB")
+    print(f"Parse CSV:                 {t_parse:8.2f} s")
+    print(f"Salvataggio snapshot:      {t_save:8.2f} s")
+    print(f"Lettura tabella (mmap):    {t_table:8.3f} s")
+    print(f"Ripresa completa (modelli):{t_load:8.2f} s  ({t_load / t_parse:.0%} del parse)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Tempo della verifica di integrità (CashewDatabase.verify) su un DB sintetico.
+
+Chiavi UUID come nel DB costruito dal builder, una coppia di trasferimenti
+ogni 20 righe con la categoria di sistema "0" e, con --orphans, transazioni
+normali ricadute su "0": il caso in cui il controllo degli orfani deve
+distinguere i trasferimenti dagli errori.
+
+Uso (dalla root del repo):
+    python -m benchmarks.bench_verify [--rows 1000000] [--orphans 1]
+"""
+import argparse
+import random
+import time
+import uuid
+
+from database import SYSTEM_CATEGORY_PK, TRANSFER_NAME, CashewDatabase
+from models import AccountConfig
+
+INSERT = """INSERT INTO transactions (
+    transaction_pk, paired_transaction_fk, name, amount, note, category_fk, wallet_fk,
+    date_created, income, paid, date_time_modified, original_date_due,
+    upcoming_transaction_notification, skip_paid, created_another_future_transaction, sub_category_fk
+) VALUES (?, ?, ?, ?, '', ?, ?, 0, 0, 1, 0, 0, 1, 0, 0, ?)"""
+
+
+def build(rows: int, wallets: int, orphans: int = 0, seed: int = 7):
+    """DB sintetico -> (db, saldi attesi per conto in millesimi)"""
+    rnd = random.Random(seed)
+    new_id = lambda: str(uuid.UUID(int=rnd.getrandbits(128), version=4))
+    db = CashewDatabase()
+    wallet_pks = [new_id() for _ in range(wallets)]
+    for w, pk in enumerate(wallet_pks):
+        db.add_wallet(pk, AccountConfig(name_cashew=f"Conto {w}"))
+    main, sub = new_id(), new_id()
+    db.add_category(main, "Cibo", "#fff", "food.png")
+    db.add_category(sub, "Bar", None, None, main)
+    ids = [new_id() for _ in range(rows)]
+    expected = dict.fromkeys(wallet_pks, 0)
+    orphan_rows = set(rnd.sample(range(rows), min(orphans, rows)))
+
+    def gen():
+        for i in range(rows):
+            wallet = wallet_pks[i % wallets]
+            expected[wallet] -= 1500
+            # Ogni 20 righe una coppia di trasferimenti collegati, categoria di sistema
+            if i % 20 in (0, 1) and i + 1 - i % 20 < rows:
+                paired = ids[i + 1] if i % 20 == 0 else ids[i - 1]
+                yield (ids[i], paired, TRANSFER_NAME, -1.5, SYSTEM_CATEGORY_PK, wallet, None)
+            elif i in orphan_rows:  # categoria mancante, ripiego su "0": da segnalare
+                yield (ids[i], None, "x", -1.5, SYSTEM_CATEGORY_PK, wallet, None)
+            else:
+                yield (ids[i], None, "x", -1.5, main, wallet, sub if i % 2 else None)
+    db.cursor.executemany(INSERT, gen())
+    return db, expected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--wallets", type=int, default=5)
+    parser.add_argument("--orphans", type=int, default=1, help="transazioni normali con categoria mancante")
+    args = parser.parse_args()
+
+    db, expected = build(args.rows, args.wallets, args.orphans)
+    db.verify(expected)  # riscaldamento della page cache
+    start = time.perf_counter()
+    checks = db.verify(expected)
+    elapsed = time.perf_counter() - start
+
+    for c in checks:
+        print(f"{'OK ' if c.passed else 'KO '} {c.name} ({c.issues})")
+    print(f"\n{args.rows:,} transazioni verificate in {elapsed:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
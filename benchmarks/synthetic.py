@@ -0,0 +1,89 @@
+"""Generatori di dati sintetici condivisi dai benchmark."""
+import random
+
+ACCOUNTS = ["Conto Corrente", "Revolut", "Contanti", "Carta di Credito", "Risparmi"]
+CATEGORIES = ["Cibo", "Ristorante", "Benzina", "Affitto", "Bollette", "Stipendio",
+              "Shopping", "Farmacia", "Cinema", "Viaggi", "Regali", "Tasse"]
+PAYEES = ["AMAZON EU SARL", "Amazon.it", "AMZN Mktp", "Esselunga", "ESSELUNGA SPA",
+          "Conad", "Eni Station", "Netflix", "Spotify AB", "Trenitalia", ""]
+HEADER = "account;category;currency;amount;ref_currency_amount;type;payment_type;note;date;transfer;payee"
+
+
+def wallet_rows(n: int, seed: int = 42):
+    """Righe CSV in formato export Wallet (separatore ';', importi europei)"""
+    rnd = random.Random(seed)
+    for i in range(n):
+        transfer = rnd.random() < 0.05
+        amount = round(rnd.uniform(-300, 200), 2)
+        date = f"{2018 + i % 6}-{1 + i % 12:02d}-{1 + i % 28:02d} {i % 24:02d}:{i % 60:02d}:00"
+        yield (f"{rnd.choice(ACCOUNTS)};{rnd.choice(CATEGORIES)};EUR;{amount:.2f}".replace(".", ",")
+               + f";{amount:.2f};{'TRANSFER' if transfer else ('INCOME' if amount > 0 else 'EXPENSE')}"
+               + f";CARD;nota {i % 100};{date};{str(transfer).lower()};{rnd.choice(PAYEES)}")
+
+
+def wallet_csv_bytes(n: int, seed: int = 42) -> bytes:
+    return ("\n".join([HEADER, *wallet_rows(n, seed)]) + "\n").encode()
+
+
+# Difetti tipici di un export modificato a mano: campo obbligatorio vuoto,
+# importo non numerico, data in un altro formato, valuta mancante
+DEFECTS = (
+    lambda f: f.__setitem__(0, ""),
+    lambda f: f.__setitem__(1, ""),
+    lambda f: f.__setitem__(3, "n/d"),
+    lambda f: f.__setitem__(8, f[8][8:10] + "/" + f[8][5:7] + "/" + f[8][:4]),
+    lambda f: f.__setitem__(2, ""),
+)
+
+
+def dirty_wallet_csv_bytes(n: int, bad_ratio: float = 0.1, seed: int = 42) -> bytes:
+    """Export Wallet con una quota `bad_ratio` di righe non valide"""
+    rnd = random.Random(seed + 1)
+    rows = []
+    for line in wallet_rows(n, seed):
+        if rnd.random() < bad_ratio:
+            fields = line.split(";")
+            rnd.choice(DEFECTS)(fields)
+            line = ";".join(fields)
+        rows.append(line)
+    return ("\n".join([HEADER, *rows]) + "\n").encode()
+
+
+def _records(n: int, seed: int):
+    rnd = random.Random(seed)
+    for i in range(n):
+        yield (i, rnd.choice(ACCOUNTS), rnd.choice(CATEGORIES), round(rnd.uniform(-300, 200), 2),
+               f"{2018 + i % 6}{1 + i % 12:02d}{1 + i % 28:02d}", rnd.choice(PAYEES) or "Bonifico", rnd.random() < 0.05)
+
+
+def ofx_bytes(n: int, seed: int = 42) -> bytes:
+    """Estratto conto OFX 1.x (SGML, tag foglia non chiusi)"""
+    head = ("OFXHEADER:100\nDATA:OFXSGML\nVERSION:102\nCHARSET:1252\n\n"
+            "<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><CURDEF>EUR\n"
+            "<BANKACCTFROM><BANKID>03069<ACCTID>IT60X0542811101000000123456<ACCTTYPE>CHECKING</BANKACCTFROM>\n"
+            "<BANKTRANLIST>\n")
+    body = "".join(
+        f"<STMTTRN><TRNTYPE>{'XFER' if tr else ('CREDIT' if amt > 0 else 'DEBIT')}<DTPOSTED>{d}120000"
+        f"<TRNAMT>{amt:.2f}<FITID>{i}<NAME>{payee}<MEMO>nota {i % 100}</STMTTRN>\n"
+        for i, _, _, amt, d, payee, tr in _records(n, seed)
+    )
+    return (head + body + "</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n").encode("cp1252")
+
+
+def qif_bytes(n: int, seed: int = 42) -> bytes:
+    body = "".join(
+        f"D{d[4:6]}/{d[6:]}'{d[2:4]}\nT{amt:,.2f}\nP{payee}\nMnota {i % 100}\n"
+        f"L{'[Risparmi]' if tr else cat}\n^\n"
+        for i, _, cat, amt, d, payee, tr in _records(n, seed)
+    )
+    return ("!Account\nNConto Corrente\nTBank\n^\n!Type:Bank\n" + body).encode()
+
+
+def bank_csv_bytes(n: int, seed: int = 42) -> bytes:
+    """Export di una banca italiana: righe descrittive, date gg/mm/aaaa, dare/avere"""
+    rows = [f"{d[6:]}/{d[4:6]}/{d[:4]};{d[6:]}/{d[4:6]}/{d[:4]};{payee} nota {i % 100};"
+            + (f"{-amt:.2f};".replace(".", ",") if amt < 0 else f";{amt:.2f}".replace(".", ","))
+            for i, _, _, amt, d, payee, _ in _records(n, seed)]
+    head = ["Estratto conto corrente;;;;", "Intestatario: Mario Rossi;;;;",
+            "Data operazione;Data valuta;Descrizione;Dare;Avere"]
+    return ("\n".join(head + rows) + "\n").encode()
@@ -0,0 +1,281 @@
+"""
+Costruzione del DB Cashew con aggiornamenti incrementali.
+
+Il DB costruito resta in sessione. A ogni visita dello step 4 MigrationBuilder
+confronta lo stato richiesto con quello già applicato:
+- transazioni, conti o regole diversi: ricostruzione completa;
+- struttura categorie diversa: solo INSERT/UPDATE/DELETE sulla tabella categories;
+- mapping diverso (anche come effetto della struttura): un solo UPDATE
+  set-based sulle transazioni delle categorie Wallet interessate, tramite
+  l'indice TEMP transaction_pk -> categoria di origine.
+Il lavoro dopo una piccola modifica è proporzionale alle righe coinvolte.
+La build completa di file grandi può girare a shard in più processi (shards.py).
+"""
+import copy
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from analytics import monthly_category_stats, write_budget_suggestions
+from database import SYSTEM_CATEGORY_PK, TRANSFER_NAME, CashewDatabase
+from logic import detect_transfers, generate_uuid
+from models import AccountConfig, CashewConfig, PayeeRule, WalletTransaction
+from rules import apply_rules, associated_titles
+from shards import BUILD_SHARDS, SHARD_MIN_ROWS, TxRow, build_sharded, processed_from_rows
+
+FALLBACK = CashewConfig(main_category="Altro")
+
+Target = Tuple[str, Optional[str], str]  # (category_fk, sub_category_fk, nome main)
+
+
+def resolve_target(conf: CashewConfig, c_uuids: Dict[tuple, str]) -> Target:
+    main, sub = conf.main_category, conf.sub_category
+    return c_uuids.get((main, ""), SYSTEM_CATEGORY_PK), (c_uuids.get((main, sub)) if sub else None), main
+
+
+class MigrationBuilder:
+    """DB Cashew di una sessione, aggiornato per differenze"""
+
+    def __init__(self, shards: int = BUILD_SHARDS, partition: str = "wallet"):
+        self.shards = shards          # processi per la build completa (1 = nel processo corrente)
+        self.partition = partition    # "wallet" o "time", vedi shards.partition
+        self.shards_used = 1
+        self.db: Optional[CashewDatabase] = None
+        self.version = 0          # cambia a ogni modifica del DB (cache di export e verifica)
+        self.last_sync = "none"   # "full", "delta" o "none"
+        self.rows_touched = 0     # transazioni scritte dall'ultimo aggiornamento
+        self.categories_touched = 0
+        self._transactions = None
+        self._base_key = None
+        self._struct: Dict = {}
+        self._c_uuids: Dict[tuple, str] = {}
+        self._targets: Dict[str, Target] = {}
+        self.w_uuids: Dict[str, str] = {}
+        self.expected_balances: Dict[str, int] = {}
+        self._checks = (None, [])
+        self._budgets_key = None
+        self._remapped = False
+
+    # --- chiavi di confronto ---
+
+    @staticmethod
+    def _effective_rules(rules: List[PayeeRule], struct: Dict) -> List[PayeeRule]:
+        return [r for r in rules if r.main_category in struct]
+
+    @staticmethod
+    def _rules_key(rules: List[PayeeRule], struct: Dict) -> tuple:
+        # Anche l'esistenza della sottocategoria di una regola cambia le FK scritte
+        return tuple((r.pattern, r.is_regex, r.field, r.main_category, r.sub_category,
+                      r.sub_category in struct[r.main_category]['subs']) for r in rules)
+
+    def _make_base_key(self, accounts: Dict[str, AccountConfig], rules: List[PayeeRule], struct: Dict):
+        return (
+            tuple((k, tuple(v.model_dump().items())) for k, v in accounts.items()),
+            self._rules_key(self._effective_rules(rules, struct), struct),
+        )
+
+    # --- sincronizzazione ---
+
+    def sync(self, transactions: List[WalletTransaction], accounts: Dict[str, AccountConfig],
+             struct: Dict, mapping: Dict[str, CashewConfig], rules: List[PayeeRule],
+             payee_map: Dict[str, str]) -> str:
+        """Porta il DB allo stato richiesto con il minimo lavoro. Restituisce il tipo di aggiornamento."""
+        base_key = self._make_base_key(accounts, rules, struct)
+        if self.db is None or transactions is not self._transactions or base_key != self._base_key:
+            self._full_build(transactions, accounts, struct, mapping, rules, payee_map)
+            self._base_key = base_key
+            self.last_sync, self.rows_touched, self.categories_touched = "full", len(transactions), len(self._c_uuids)
+        else:
+            self.categories_touched = self._sync_structure(struct)
+            self.rows_touched = self._sync_mapping(mapping)
+            changed = self.categories_touched or self.rows_touched or self._remapped
+            self.last_sync = "delta" if changed else "none"
+        if self.last_sync != "none":
+            self.version += 1
+        return self.last_sync
+
+    def _full_build(self, transactions, accounts, struct, mapping, rules, payee_map):
+        final = detect_transfers(transactions)
+        db = CashewDatabase()
+
+        self.w_uuids = {}
+        for name, conf in accounts.items():
+            uid = generate_uuid()
+            self.w_uuids[name] = uid
+            db.add_wallet(uid, conf)
+
+        self._c_uuids = {}
+        for main, data in struct.items():
+            self._add_main(db, main, data)
+
+        # Regole payee/nota (hanno priorità sul mapping per categoria)
+        rules = self._effective_rules(rules, struct)
+        rule_hits = apply_rules(final, rules)
+        for order, (title, idx, exact) in enumerate(associated_titles(rules, final, rule_hits)):
+            r = rules[idx]
+            cat_fk = self._c_uuids.get((r.main_category, r.sub_category)) or self._c_uuids[(r.main_category, "")]
+            db.add_associated_title(generate_uuid(), cat_fk, title, order, exact)
+
+        self._targets = {cat: resolve_target(mapping.get(cat, FALLBACK), self._c_uuids)
+                         for cat in dict.fromkeys(t.category for t in final)}
+
+        # Id assegnati prima di tutto: le coppie si risolvono anche tra shard diversi
+        ids = [generate_uuid() for _ in final]
+        rows: List[TxRow] = []
+        source_rows = []
+        main_names = []
+        default_wallet = next(iter(self.w_uuids.values()), "0")
+        for t, hit, t_id in zip(final, rule_hits, ids):
+            payee_title = payee_map.get(t.payee) or None
+            if t.is_transfer:
+                c_fk, s_fk, main = SYSTEM_CATEGORY_PK, None, TRANSFER_NAME
+                title = TRANSFER_NAME
+            elif hit is not None:
+                r = rules[hit]
+                c_fk, s_fk, main = resolve_target(CashewConfig(main_category=r.main_category,
+                                                               sub_category=r.sub_category), self._c_uuids)
+                title = payee_title or main
+            else:
+                c_fk, s_fk, main = self._targets[t.category]
+                title = payee_title or main
+            if not t.is_transfer and hit is None:
+                source_rows.append((t_id, t.category, payee_title))
+            paired = t.paired_with_idx
+            rows.append(TxRow(
+                t_id, ids[paired] if paired is not None and 0 <= paired < len(ids) else None,
+                t.date_str, t.amount_minor, t.decimals, title, f"{t.note} | {t.payee}" if t.payee else t.note,
+                self.w_uuids.get(t.account, default_wallet), c_fk, s_fk, main,
+            ))
+            main_names.append(main if (t.is_transfer or hit is not None) else None)
+            t.temp_id = t_id
+
+        self.shards_used = 1
+        if self.shards > 1 and len(rows) >= SHARD_MIN_ROWS:
+            self.date_ms = build_sharded(db, rows, self.shards, self.partition)
+            self.shards_used = self.shards
+        else:
+            processed = processed_from_rows(rows)
+            db.add_transactions(processed)
+            self.date_ms = np.fromiter((p.date_ms for p in processed), np.int64, len(processed))
+        db.create_source_index(source_rows)
+
+        # Colonne per statistiche e anteprima: i nomi main delle righe da mapping
+        # si ricavano dai target correnti, così restano validi dopo ogni delta
+        self.amount_minor = np.fromiter((r.amount_minor for r in rows), np.int64, len(rows))
+        self.decimals = np.fromiter((r.decimals for r in rows), np.int64, len(rows))
+        self.is_transfer = np.fromiter((t.is_transfer for t in final), bool, len(final))
+        self._fixed_main = np.array(main_names, dtype=object)
+        self._fixed_mask = np.fromiter((m is not None for m in main_names), bool, len(main_names))
+        self._source_codes, self._source_names = pd.factorize(
+            np.array([t.category for t in final], dtype=object))
+
+        self.expected_balances = {uid: 0 for uid in self.w_uuids.values()}
+        for t in final:
+            if t.account in self.w_uuids:
+                # Millesimi per transazione: le cifre decimali sono quelle della sua valuta
+                self.expected_balances[self.w_uuids[t.account]] += t.amount_minor * 10 ** (3 - t.decimals)
+
+        self.db = db
+        self._transactions = transactions
+        self._struct = copy.deepcopy(struct)
+
+    def _add_main(self, db: CashewDatabase, main: str, data: dict):
+        uid_m = generate_uuid()
+        self._c_uuids[(main, "")] = uid_m
+        db.add_category(uid_m, main, data['color'], data['icon'], None)
+        for sub in data['subs']:
+            self._add_sub(db, main, sub)
+
+    def _add_sub(self, db: CashewDatabase, main: str, sub: str):
+        uid_s = generate_uuid()
+        self._c_uuids[(main, sub)] = uid_s
+        db.add_category(uid_s, sub, None, None, self._c_uuids[(main, "")])
+
+    def _sync_structure(self, struct: Dict) -> int:
+        """Applica alla sola tabella categories le differenze di struttura. Restituisce le categorie toccate."""
+        old, db = self._struct, self.db
+        removed = []
+        for main, data in old.items():
+            if main not in struct:
+                removed += [self._c_uuids.pop((main, sub)) for sub in data['subs']]
+                removed.append(self._c_uuids.pop((main, "")))
+            else:
+                removed += [self._c_uuids.pop((main, sub)) for sub in data['subs'] if sub not in struct[main]['subs']]
+        touched = len(removed)
+
+        for main, data in struct.items():
+            if main not in old:
+                self._add_main(db, main, data)
+                touched += 1 + len(data['subs'])
+                continue
+            if (data['color'], data['icon']) != (old[main]['color'], old[main]['icon']):
+                db.update_category(self._c_uuids[(main, "")], data['color'], data['icon'])
+                touched += 1
+            for sub in data['subs']:
+                if (main, sub) not in self._c_uuids:
+                    self._add_sub(db, main, sub)
+                    touched += 1
+
+        # Le transazioni che puntavano a categorie rimosse vengono riassegnate
+        # da _sync_mapping (il loro target risolto cambia) prima del commit
+        db.delete_categories(removed)
+        self._struct = copy.deepcopy(struct)
+        return touched
+
+    def _sync_mapping(self, mapping: Dict[str, CashewConfig]) -> int:
+        """Un solo UPDATE per le categorie Wallet il cui target risolto è cambiato"""
+        targets = {cat: resolve_target(mapping.get(cat, FALLBACK), self._c_uuids) for cat in self._targets}
+        changed = {cat: t for cat, t in targets.items() if t != self._targets[cat]}
+        self._targets = targets
+        # Una categoria Wallet coperta solo da regole/trasferimenti non tocca righe
+        # ma cambia comunque le statistiche: conta come modifica
+        self._remapped = bool(changed)
+        return self.db.remap_source_categories(changed)
+
+    # --- letture ---
+
+    def main_category_names(self) -> np.ndarray:
+        """Nome della categoria main per transazione, secondo il mapping corrente"""
+        current = np.array([self._targets[cat][2] for cat in self._source_names], dtype=object)
+        names = current[self._source_codes] if len(self._source_codes) else np.array([], dtype=object)
+        names[self._fixed_mask] = self._fixed_main[self._fixed_mask]
+        return names
+
+    def monthly_stats(self) -> pd.DataFrame:
+        return monthly_category_stats(self.date_ms, self.amount_minor, self.main_category_names(),
+                                      exclude=self.is_transfer, decimals=self.decimals)
+
+    def verify(self):
+        """Controlli di integrità, ricalcolati solo se il DB è cambiato"""
+        version, checks = self._checks
+        if version != self.version:
+            checks = self.db.verify(self.expected_balances)
+            self._checks = (self.version, checks)
+        return checks
+
+    def export_frame(self) -> pd.DataFrame:
+        """Transazioni con i nomi di categoria correnti (export CSV)"""
+        self.db.conn.commit()
+        return pd.read_sql_query("""
+            SELECT t.transaction_pk AS id, t.date_created AS date_ms, t.amount, t.name AS title, t.note,
+                   t.wallet_fk, w.name AS wallet_name, t.category_fk, c.name AS main_category_name,
+                   t.sub_category_fk, s.name AS sub_category_name, t.income AS is_income,
+                   t.paired_transaction_fk AS paired_id
+            FROM transactions t
+            LEFT JOIN wallets w ON w.wallet_pk = t.wallet_fk
+            LEFT JOIN categories c ON c.category_pk = t.category_fk
+            LEFT JOIN categories s ON s.category_pk = t.sub_category_fk
+        """, self.db.conn)
+
+    def sync_budgets(self, limits: Optional[Dict[str, float]]):
+        """Riscrive budget e limiti suggeriti solo se cambiati o se è cambiato il DB (None = nessun budget)"""
+        key = tuple(sorted(limits.items())) if limits is not None else None
+        if self.last_sync == "none" and key == self._budgets_key:
+            return
+        self.db.clear_budgets()
+        if limits and self.w_uuids:
+            main_pks = {main: self._c_uuids[(main, "")] for main in self._struct}
+            write_budget_suggestions(self.db, limits, main_pks, generate_uuid(), next(iter(self.w_uuids.values())))
+        self._budgets_key = key
+        self.version += 1
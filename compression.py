@@ -0,0 +1,108 @@
+"""
+Decompressione in streaming degli export caricati.
+
+Il formato si riconosce dai magic bytes, non dall'estensione: gzip, xz,
+bz2 e zip (anche con più file dentro). Ogni file viene esposto come stream
+binario che decomprime a blocchi mentre il parser legge, quindi il file
+decompresso non viene mai materializzato per intero in memoria.
+"""
+import bz2
+import gzip
+import io
+import lzma
+import zipfile
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+MAGIC = (
+    (b"\x1f\x8b", "gzip"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"BZh", "bz2"),
+    (b"PK\x03\x04", "zip"),
+    (b"PK\x05\x06", "zip"),  # zip vuoto
+)
+PREFIX_LEN = max(len(m) for m, _ in MAGIC)
+SOURCE_SUFFIXES = (".csv", ".txt", ".ofx", ".qfx", ".qif")
+
+
+def detect_compression(prefix: bytes) -> Optional[str]:
+    """Formato di compressione dai primi bytes, None se il file è in chiaro"""
+    for magic, kind in MAGIC:
+        if prefix.startswith(magic):
+            return kind
+    return None
+
+
+class PrefixedStream(io.RawIOBase):
+    """
+    Rimette davanti a uno stream i bytes già letti (es. per lo sniffing),
+    così non serve seek() e lo stream può essere non riavvolgibile.
+    """
+
+    def __init__(self, prefix: bytes, stream: BinaryIO):
+        self._prefix = memoryview(prefix)
+        self._stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self._prefix:
+            n = min(len(b), len(self._prefix))
+            b[:n] = self._prefix[:n]
+            self._prefix = self._prefix[n:]
+            return n
+        data = self._stream.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+
+def peek_prefix(stream: BinaryIO, size: int) -> Tuple[bytes, BinaryIO]:
+    """Legge i primi `size` bytes e restituisce uno stream equivalente all'originale"""
+    # Solo file e buffer in memoria si riavvolgono davvero: gli stream di
+    # decompressione si dichiarano seekable ma ripartirebbero da capo
+    if isinstance(stream, (io.BytesIO, io.FileIO, io.BufferedReader)) and stream.seekable():
+        pos = stream.tell()
+        prefix = stream.read(size)
+        stream.seek(pos)
+        return prefix, stream
+    prefix = stream.read(size)
+    return prefix, io.BufferedReader(PrefixedStream(prefix, stream))
+
+
+def _zip_members(zf: zipfile.ZipFile):
+    files = [i for i in zf.infolist()
+             if not i.is_dir() and not i.filename.startswith("__MACOSX/")]
+    sources = [i for i in files if i.filename.lower().endswith(SOURCE_SUFFIXES)]
+    return sorted(sources or files, key=lambda i: i.filename)
+
+
+def open_source_streams(stream: BinaryIO) -> Iterator[Tuple[str, BinaryIO]]:
+    """
+    Stream binari (nome, stream) dei file contenuti nell'upload, decompressi
+    al volo. Un file in chiaro o gzip/xz/bz2 produce un solo stream; uno zip
+    uno per ogni file sorgente (lo zip richiede uno stream con seek, come BytesIO).
+    """
+    prefix, stream = peek_prefix(stream, PREFIX_LEN)
+    kind = detect_compression(prefix)
+    if kind is None:
+        yield "", stream
+    elif kind == "gzip":
+        yield "", gzip.GzipFile(fileobj=stream, mode="rb")
+    elif kind == "xz":
+        yield "", lzma.LZMAFile(stream, mode="rb")
+    elif kind == "bz2":
+        yield "", bz2.BZ2File(stream, mode="rb")
+    else:
+        if not stream.seekable():
+            raise ValueError("Gli archivi zip richiedono un file completo, non uno stream.")
+        try:
+            zf = zipfile.ZipFile(stream)
+        except zipfile.BadZipFile as e:
+            raise ValueError(f"Archivio zip non valido: {e}")
+        with zf:
+            members = _zip_members(zf)
+            if not members:
+                raise ValueError("L'archivio zip non contiene file da importare.")
+            for info in members:
+                with zf.open(info) as member:
+                    yield info.filename, member
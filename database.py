@@ -1,45 +1,134 @@
+import os
 import sqlite3
+import threading
 import time
 import tempfile
-from typing import List, Optional
-from models import ProcessedTransaction, AccountConfig, CashewConfig
+from typing import Dict, List, Optional, Tuple
+from models import ProcessedTransaction, AccountConfig, CashewConfig, IntegrityCheck, RestoreReport, currency_decimals, from_minor
+from resources import shared_resource
+
+# Quanti esempi riportare per ogni controllo fallito
+MAX_DETAILS = 5
+
+# category_fk dei trasferimenti: categoria di sistema di Cashew (correzione di
+# saldo) che l'app gestisce da sola e che non compare nella tabella categories
+# del backup. Per i controlli di integrità non è un orfano, ma solo sui
+# trasferimenti (riconosciuti dal titolo): una transazione normale finita su
+# "0" perché la sua categoria manca resta un errore.
+SYSTEM_CATEGORY_PK = "0"
+TRANSFER_NAME = "Trasferimento"
+TRANSFER_EXEMPTION = " AND NOT (category_fk = ? AND name = ?)"
+TRANSFER_PARAMS = (SYSTEM_CATEGORY_PK, TRANSFER_NAME)
+
+# Somme esatte su interi: ogni importo REAL viene riportato a millesimi
+# (3 = massimo di cifre decimali) prima di sommare, così niente deriva float
+BALANCE_SUM = "SUM(CAST(ROUND(amount * 1000) AS INTEGER))"
+# Fino a questo numero di conti i saldi si calcolano con un FILTER per conto
+# nella scansione degli orfani; oltre, un GROUP BY separato costa meno
+BALANCE_FILTER_MAX = 16
+
+# Backup di riferimento esportato da Cashew: schema, user_version e page_size del file finale
+REFERENCE_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "original-cashew-db.sql")
+CASHEW_SCHEMA_VERSION = 46
+RESTORE_PAGE_SIZE = 4096
+
+# Indici secondari aggiunti al backup finale: Cashew filtra le transazioni per
+# data, conto e categoria. Il prefisso li distingue da quelli dello schema Cashew.
+MIGRATOR_INDEX_PREFIX = "migrator_"
+RESTORE_INDEXES = (
+    ("migrator_transactions_date", 'CREATE INDEX "migrator_transactions_date" ON transactions (date_created)'),
+    ("migrator_transactions_wallet_date", 'CREATE INDEX "migrator_transactions_wallet_date" ON transactions (wallet_fk, date_created)'),
+)
+
+def _create_schema(cursor):
+    # 1. Wallets
+    cursor.execute('CREATE TABLE "wallets" ("wallet_pk" TEXT NOT NULL, "name" TEXT NOT NULL, "colour" TEXT NULL, "icon_name" TEXT NULL, "date_created" INTEGER NOT NULL, "date_time_modified" INTEGER NULL DEFAULT 1765012419, "order" INTEGER NOT NULL, "currency" TEXT NULL, "currency_format" TEXT NULL, "decimals" INTEGER NOT NULL DEFAULT 2, "home_page_widget_display" TEXT NULL DEFAULT NULL, PRIMARY KEY ("wallet_pk"));')
+
+    # 2. Categories
+    cursor.execute('CREATE TABLE "categories" ("category_pk" TEXT NOT NULL, "name" TEXT NOT NULL, "colour" TEXT NULL, "icon_name" TEXT NULL, "emoji_icon_name" TEXT NULL, "date_created" INTEGER NOT NULL, "date_time_modified" INTEGER NULL DEFAULT 1765012419, "order" INTEGER NOT NULL, "income" INTEGER NOT NULL DEFAULT 0 CHECK ("income" IN (0, 1)), "method_added" INTEGER NULL, "main_category_pk" TEXT NULL DEFAULT NULL REFERENCES categories (category_pk), PRIMARY KEY ("category_pk"));')
+
+    # 3. Transactions
+    cursor.execute('CREATE TABLE "transactions" ("transaction_pk" TEXT NOT NULL, "paired_transaction_fk" TEXT NULL DEFAULT NULL REFERENCES transactions (transaction_pk), "name" TEXT NOT NULL, "amount" REAL NOT NULL, "note" TEXT NOT NULL, "category_fk" TEXT NOT NULL REFERENCES categories (category_pk), "sub_category_fk" TEXT NULL DEFAULT NULL REFERENCES categories (category_pk), "wallet_fk" TEXT NOT NULL DEFAULT "0" REFERENCES wallets (wallet_pk), "date_created" INTEGER NOT NULL, "date_time_modified" INTEGER NULL DEFAULT 1765012419, "original_date_due" INTEGER NULL DEFAULT 1765012419, "income" INTEGER NOT NULL DEFAULT 0 CHECK ("income" IN (0, 1)), "period_length" INTEGER NULL, "reoccurrence" INTEGER NULL, "end_date" INTEGER NULL, "upcoming_transaction_notification" INTEGER NULL DEFAULT 1 CHECK ("upcoming_transaction_notification" IN (0, 1)), "type" INTEGER NULL, "paid" INTEGER NOT NULL DEFAULT 0 CHECK ("paid" IN (0, 1)), "created_another_future_transaction" INTEGER NULL DEFAULT 0 CHECK ("created_another_future_transaction" IN (0, 1)), "skip_paid" INTEGER NOT NULL DEFAULT 0 CHECK ("skip_paid" IN (0, 1)), "method_added" INTEGER NULL, "transaction_owner_email" TEXT NULL, "transaction_original_owner_email" TEXT NULL, "shared_key" TEXT NULL, "shared_old_key" TEXT NULL, "shared_status" INTEGER NULL, "shared_date_updated" INTEGER NULL, "shared_reference_budget_pk" TEXT NULL, "objective_fk" TEXT NULL, "objective_loan_fk" TEXT NULL, "budget_fks_exclude" TEXT NULL, PRIMARY KEY ("transaction_pk"));')
+
+    # 4. Budgets & Objectives
+    cursor.execute('CREATE TABLE "budgets" ("budget_pk" TEXT NOT NULL, "name" TEXT NOT NULL, "amount" REAL NOT NULL, "colour" TEXT NULL, "start_date" INTEGER NOT NULL, "end_date" INTEGER NOT NULL, "wallet_fks" TEXT NULL, "category_fks" TEXT NULL, "category_fks_exclude" TEXT NULL, "income" INTEGER NOT NULL DEFAULT 0 CHECK ("income" IN (0, 1)), "archived" INTEGER NOT NULL DEFAULT 0 CHECK ("archived" IN (0, 1)), "added_transactions_only" INTEGER NOT NULL DEFAULT 0 CHECK ("added_transactions_only" IN (0, 1)), "period_length" INTEGER NOT NULL, "reoccurrence" INTEGER NULL, "date_created" INTEGER NOT NULL, "date_time_modified" INTEGER NULL DEFAULT 1765012419, "pinned" INTEGER NOT NULL DEFAULT 0 CHECK ("pinned" IN (0, 1)), "order" INTEGER NOT NULL, "wallet_fk" TEXT NOT NULL DEFAULT "0" REFERENCES wallets (wallet_pk), "budget_transaction_filters" TEXT NULL DEFAULT NULL, "member_transaction_filters" TEXT NULL DEFAULT NULL, "shared_key" TEXT NULL, "shared_owner_member" INTEGER NULL, "shared_date_updated" INTEGER NULL, "shared_members" TEXT NULL, "shared_all_members_ever" TEXT NULL, "is_absolute_spending_limit" INTEGER NOT NULL DEFAULT 0 CHECK ("is_absolute_spending_limit" IN (0, 1)), PRIMARY KEY ("budget_pk"));')
+    cursor.execute('CREATE TABLE "objectives" ("objective_pk" TEXT NOT NULL, "type" INTEGER NOT NULL DEFAULT 0, "name" TEXT NOT NULL, "amount" REAL NOT NULL, "order" INTEGER NOT NULL, "colour" TEXT NULL, "date_created" INTEGER NOT NULL, "end_date" INTEGER NULL, "date_time_modified" INTEGER NULL DEFAULT 1765012419, "icon_name" TEXT NULL, "emoji_icon_name" TEXT NULL, "income" INTEGER NOT NULL DEFAULT 0 CHECK ("income" IN (0, 1)), "pinned" INTEGER NOT NULL DEFAULT 1 CHECK ("pinned" IN (0, 1)), "archived" INTEGER NOT NULL DEFAULT 0 CHECK ("archived" IN (0, 1)), "wallet_fk" TEXT NOT NULL DEFAULT "0" REFERENCES wallets (wallet_pk), PRIMARY KEY ("objective_pk"));')
+
+    # 5. Missing Aux Tables
+    cursor.execute('CREATE TABLE "app_settings" ("settings_pk" INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT, "settings_j_s_o_n" TEXT NOT NULL, "date_updated" INTEGER NOT NULL);')
+    cursor.execute('CREATE TABLE "associated_titles" ("associated_title_pk" TEXT NOT NULL, "category_fk" TEXT NOT NULL REFERENCES categories (category_pk), "title" TEXT NOT NULL, "date_created" INTEGER NOT NULL, "date_time_modified" INTEGER NULL DEFAULT 1765012419, "order" INTEGER NOT NULL, "is_exact_match" INTEGER NOT NULL DEFAULT 0 CHECK ("is_exact_match" IN (0, 1)), PRIMARY KEY ("associated_title_pk"));')
+    cursor.execute('CREATE TABLE "category_budget_limits" ("category_limit_pk" TEXT NOT NULL, "category_fk" TEXT NOT NULL REFERENCES categories (category_pk), "budget_fk" TEXT NOT NULL REFERENCES budgets (budget_pk), "amount" REAL NOT NULL, "date_time_modified" INTEGER NULL DEFAULT 1765012419, "wallet_fk" TEXT NOT NULL DEFAULT "0" REFERENCES wallets (wallet_pk), PRIMARY KEY ("category_limit_pk"));')
+    cursor.execute('CREATE TABLE "delete_logs" ("delete_log_pk" TEXT NOT NULL, "entry_pk" TEXT NOT NULL, "type" INTEGER NOT NULL, "date_time_modified" INTEGER NOT NULL DEFAULT 1765012419, PRIMARY KEY ("delete_log_pk"));')
+    cursor.execute('CREATE TABLE "scanner_templates" ("scanner_template_pk" TEXT NOT NULL, "date_created" INTEGER NOT NULL, "date_time_modified" INTEGER NULL DEFAULT 1765012419, "template_name" TEXT NOT NULL, "contains" TEXT NOT NULL, "title_transaction_before" TEXT NOT NULL, "title_transaction_after" TEXT NOT NULL, "amount_transaction_before" TEXT NOT NULL, "amount_transaction_after" TEXT NOT NULL, "default_category_fk" TEXT NOT NULL REFERENCES categories (category_pk), "wallet_fk" TEXT NOT NULL DEFAULT "0" REFERENCES wallets (wallet_pk), "ignore" INTEGER NOT NULL DEFAULT 0 CHECK ("ignore" IN (0, 1)), PRIMARY KEY ("scanner_template_pk"));')
+
+_template_lock = threading.Lock()
+
+@shared_resource
+def _schema_template() -> sqlite3.Connection:
+    """DB vuoto con lo schema Cashew, costruito una volta per processo"""
+    conn = sqlite3.connect(':memory:', check_same_thread=False)
+    _create_schema(conn.cursor())
+    conn.commit()
+    return conn
+
+def _create_source_index(cursor, rows):
+    cursor.execute('DROP TABLE IF EXISTS temp.tx_source')
+    cursor.execute('CREATE TEMP TABLE tx_source (transaction_pk TEXT PRIMARY KEY, '
+                   'source_category TEXT NOT NULL, payee_title TEXT) WITHOUT ROWID')
+    cursor.executemany('INSERT INTO temp.tx_source VALUES (?, ?, ?)', rows)
+    cursor.execute('CREATE INDEX temp.tx_source_category ON tx_source (source_category)')
+
+def _table_columns(conn: sqlite3.Connection) -> Dict[str, List[tuple]]:
+    # I DEFAULT non si confrontano: contengono il timestamp dell'export di riferimento
+    tables = [r[0] for r in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+    return {t: [(c[1], c[2], c[3], c[5]) for c in conn.execute(f'PRAGMA table_info("{t}")')]
+            for t in tables}
+
+def schema_differences(conn: sqlite3.Connection, reference_path: str = REFERENCE_DB) -> List[str]:
+    """Differenze di schema (tabelle, colonne, indici) rispetto al backup Cashew di riferimento"""
+    ref = sqlite3.connect(f"file:{reference_path}?mode=ro", uri=True)
+    try:
+        expected = _table_columns(ref)
+        ref_indexes = {r[0] for r in ref.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    finally:
+        ref.close()
+    actual = _table_columns(conn)
+    issues = [f"Tabella mancante: {t}" for t in expected if t not in actual]
+    issues += [f"Tabella in più: {t}" for t in actual if t not in expected]
+    for table, cols in expected.items():
+        if table in actual and actual[table] != cols:
+            issues.append(f"Colonne diverse in {table}: {actual[table]} invece di {cols}")
+    for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'"):
+        if name not in ref_indexes and not name.startswith(MIGRATOR_INDEX_PREFIX):
+            issues.append(f"Indice non previsto: {name}")
+    return issues
 
 class CashewDatabase:
-    def __init__(self):
-        # Database in memoria per validazione e sicurezza
-        self.conn = sqlite3.connect(':memory:')
+    def __init__(self, path: Optional[str] = None):
+        # Database in memoria per validazione e sicurezza (su file solo per gli
+        # shard della build parallela).
+        # check_same_thread=False: Streamlit esegue ogni rerun in un thread diverso
+        # e il DB può restare in sessione tra un rerun e l'altro.
+        self.conn = sqlite3.connect(path or ':memory:', check_same_thread=False)
         self.cursor = self.conn.cursor()
+        self.path = path
         self._init_schema()
         
     def _init_schema(self):
-        # 1. Wallets
-        self.cursor.execute('CREATE TABLE "wallets" ("wallet_pk" TEXT NOT NULL, "name" TEXT NOT NULL, "colour" TEXT NULL, "icon_name" TEXT NULL, "date_created" INTEGER NOT NULL, "date_time_modified" INTEGER NULL DEFAULT 1765012419, "order" INTEGER NOT NULL, "currency" TEXT NULL, "currency_format" TEXT NULL, "decimals" INTEGER NOT NULL DEFAULT 2, "home_page_widget_display" TEXT NULL DEFAULT NULL, PRIMARY KEY ("wallet_pk"));')
-
-        # 2. Categories
-        self.cursor.execute('CREATE TABLE "categories" ("category_pk" TEXT NOT NULL, "name" TEXT NOT NULL, "colour" TEXT NULL, "icon_name" TEXT NULL, "emoji_icon_name" TEXT NULL, "date_created" INTEGER NOT NULL, "date_time_modified" INTEGER NULL DEFAULT 1765012419, "order" INTEGER NOT NULL, "income" INTEGER NOT NULL DEFAULT 0 CHECK ("income" IN (0, 1)), "method_added" INTEGER NULL, "main_category_pk" TEXT NULL DEFAULT NULL REFERENCES categories (category_pk), PRIMARY KEY ("category_pk"));')
-
-        # 3. Transactions
-        self.cursor.execute('CREATE TABLE "transactions" ("transaction_pk" TEXT NOT NULL, "paired_transaction_fk" TEXT NULL DEFAULT NULL REFERENCES transactions (transaction_pk), "name" TEXT NOT NULL, "amount" REAL NOT NULL, "note" TEXT NOT NULL, "category_fk" TEXT NOT NULL REFERENCES categories (category_pk), "sub_category_fk" TEXT NULL DEFAULT NULL REFERENCES categories (category_pk), "wallet_fk" TEXT NOT NULL DEFAULT "0" REFERENCES wallets (wallet_pk), "date_created" INTEGER NOT NULL, "date_time_modified" INTEGER NULL DEFAULT 1765012419, "original_date_due" INTEGER NULL DEFAULT 1765012419, "income" INTEGER NOT NULL DEFAULT 0 CHECK ("income" IN (0, 1)), "period_length" INTEGER NULL, "reoccurrence" INTEGER NULL, "end_date" INTEGER NULL, "upcoming_transaction_notification" INTEGER NULL DEFAULT 1 CHECK ("upcoming_transaction_notification" IN (0, 1)), "type" INTEGER NULL, "paid" INTEGER NOT NULL DEFAULT 0 CHECK ("paid" IN (0, 1)), "created_another_future_transaction" INTEGER NULL DEFAULT 0 CHECK ("created_another_future_transaction" IN (0, 1)), "skip_paid" INTEGER NOT NULL DEFAULT 0 CHECK ("skip_paid" IN (0, 1)), "method_added" INTEGER NULL, "transaction_owner_email" TEXT NULL, "transaction_original_owner_email" TEXT NULL, "shared_key" TEXT NULL, "shared_old_key" TEXT NULL, "shared_status" INTEGER NULL, "shared_date_updated" INTEGER NULL, "shared_reference_budget_pk" TEXT NULL, "objective_fk" TEXT NULL, "objective_loan_fk" TEXT NULL, "budget_fks_exclude" TEXT NULL, PRIMARY KEY ("transaction_pk"));')
-
-        # 4. Budgets & Objectives
-        self.cursor.execute('CREATE TABLE "budgets" ("budget_pk" TEXT NOT NULL, "name" TEXT NOT NULL, "amount" REAL NOT NULL, "colour" TEXT NULL, "start_date" INTEGER NOT NULL, "end_date" INTEGER NOT NULL, "wallet_fks" TEXT NULL, "category_fks" TEXT NULL, "category_fks_exclude" TEXT NULL, "income" INTEGER NOT NULL DEFAULT 0 CHECK ("income" IN (0, 1)), "archived" INTEGER NOT NULL DEFAULT 0 CHECK ("archived" IN (0, 1)), "added_transactions_only" INTEGER NOT NULL DEFAULT 0 CHECK ("added_transactions_only" IN (0, 1)), "period_length" INTEGER NOT NULL, "reoccurrence" INTEGER NULL, "date_created" INTEGER NOT NULL, "date_time_modified" INTEGER NULL DEFAULT 1765012419, "pinned" INTEGER NOT NULL DEFAULT 0 CHECK ("pinned" IN (0, 1)), "order" INTEGER NOT NULL, "wallet_fk" TEXT NOT NULL DEFAULT "0" REFERENCES wallets (wallet_pk), "budget_transaction_filters" TEXT NULL DEFAULT NULL, "member_transaction_filters" TEXT NULL DEFAULT NULL, "shared_key" TEXT NULL, "shared_owner_member" INTEGER NULL, "shared_date_updated" INTEGER NULL, "shared_members" TEXT NULL, "shared_all_members_ever" TEXT NULL, "is_absolute_spending_limit" INTEGER NOT NULL DEFAULT 0 CHECK ("is_absolute_spending_limit" IN (0, 1)), PRIMARY KEY ("budget_pk"));')
-        self.cursor.execute('CREATE TABLE "objectives" ("objective_pk" TEXT NOT NULL, "type" INTEGER NOT NULL DEFAULT 0, "name" TEXT NOT NULL, "amount" REAL NOT NULL, "order" INTEGER NOT NULL, "colour" TEXT NULL, "date_created" INTEGER NOT NULL, "end_date" INTEGER NULL, "date_time_modified" INTEGER NULL DEFAULT 1765012419, "icon_name" TEXT NULL, "emoji_icon_name" TEXT NULL, "income" INTEGER NOT NULL DEFAULT 0 CHECK ("income" IN (0, 1)), "pinned" INTEGER NOT NULL DEFAULT 1 CHECK ("pinned" IN (0, 1)), "archived" INTEGER NOT NULL DEFAULT 0 CHECK ("archived" IN (0, 1)), "wallet_fk" TEXT NOT NULL DEFAULT "0" REFERENCES wallets (wallet_pk), PRIMARY KEY ("objective_pk"));')
-
-        # 5. Missing Aux Tables
-        self.cursor.execute('CREATE TABLE "app_settings" ("settings_pk" INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT, "settings_j_s_o_n" TEXT NOT NULL, "date_updated" INTEGER NOT NULL);')
-        self.cursor.execute('CREATE TABLE "associated_titles" ("associated_title_pk" TEXT NOT NULL, "category_fk" TEXT NOT NULL REFERENCES categories (category_pk), "title" TEXT NOT NULL, "date_created" INTEGER NOT NULL, "date_time_modified" INTEGER NULL DEFAULT 1765012419, "order" INTEGER NOT NULL, "is_exact_match" INTEGER NOT NULL DEFAULT 0 CHECK ("is_exact_match" IN (0, 1)), PRIMARY KEY ("associated_title_pk"));')
-        self.cursor.execute('CREATE TABLE "category_budget_limits" ("category_limit_pk" TEXT NOT NULL, "category_fk" TEXT NOT NULL REFERENCES categories (category_pk), "budget_fk" TEXT NOT NULL REFERENCES budgets (budget_pk), "amount" REAL NOT NULL, "date_time_modified" INTEGER NULL DEFAULT 1765012419, "wallet_fk" TEXT NOT NULL DEFAULT "0" REFERENCES wallets (wallet_pk), PRIMARY KEY ("category_limit_pk"));')
-        self.cursor.execute('CREATE TABLE "delete_logs" ("delete_log_pk" TEXT NOT NULL, "entry_pk" TEXT NOT NULL, "type" INTEGER NOT NULL, "date_time_modified" INTEGER NOT NULL DEFAULT 1765012419, PRIMARY KEY ("delete_log_pk"));')
-        self.cursor.execute('CREATE TABLE "scanner_templates" ("scanner_template_pk" TEXT NOT NULL, "date_created" INTEGER NOT NULL, "date_time_modified" INTEGER NULL DEFAULT 1765012419, "template_name" TEXT NOT NULL, "contains" TEXT NOT NULL, "title_transaction_before" TEXT NOT NULL, "title_transaction_after" TEXT NOT NULL, "amount_transaction_before" TEXT NOT NULL, "amount_transaction_after" TEXT NOT NULL, "default_category_fk" TEXT NOT NULL REFERENCES categories (category_pk), "wallet_fk" TEXT NOT NULL DEFAULT "0" REFERENCES wallets (wallet_pk), "ignore" INTEGER NOT NULL DEFAULT 0 CHECK ("ignore" IN (0, 1)), PRIMARY KEY ("scanner_template_pk"));')
+        # Lo schema viene copiato dal template condiviso invece di rieseguire il DDL
+        with _template_lock:
+            _schema_template().backup(self.conn)
 
         # Insert Default Settings
         now = int(time.time()*1000)
         self.cursor.execute('INSERT INTO app_settings (settings_j_s_o_n, date_updated) VALUES (?, ?)', ('{}', now))
 
     def add_wallet(self, pk: str, config: AccountConfig):
-        query = """INSERT INTO wallets VALUES (?, ?, ?, NULL, ?, ?, 0, ?, NULL, 2, NULL)"""
+        query = """INSERT INTO wallets VALUES (?, ?, ?, NULL, ?, ?, 0, ?, NULL, ?, NULL)"""
         now = int(time.time()*1000)
-        self.cursor.execute(query, (pk, config.name_cashew, config.color, now, now, config.currency))
+        self.cursor.execute(query, (pk, config.name_cashew, config.color, now, now, config.currency,
+                                    currency_decimals(config.currency)))
 
     def add_category(self, pk: str, name: str, color: str, icon: str, parent_pk: str = None, income: bool = False):
         query = """INSERT INTO categories VALUES (?, ?, ?, ?, NULL, ?, ?, 0, ?, 0, ?)"""
@@ -50,8 +139,7 @@ class CashewDatabase:
 
         self.cursor.execute(query, (pk, name, color, icon, now, now, is_income, parent_pk))
 
-    def add_transaction(self, t: ProcessedTransaction):
-        query = """
+    _INSERT_TRANSACTION = """
         INSERT INTO transactions (
             transaction_pk, paired_transaction_fk, name, amount, note, 
             category_fk, wallet_fk, date_created, income, paid, 
@@ -59,12 +147,254 @@ class CashewDatabase:
             skip_paid, created_another_future_transaction, sub_category_fk
         ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1, ?, ?, 1, 0, 0, ?)
         """
-        self.cursor.execute(query, (
+
+    @staticmethod
+    def _transaction_params(t: ProcessedTransaction) -> tuple:
+        return (
             t.id, t.paired_id, t.title, t.amount, t.note, 
             t.category_fk, t.wallet_fk, t.date_ms, 1 if t.is_income else 0,
             t.date_ms, t.date_ms, t.sub_category_fk
+        )
+
+    def add_transaction(self, t: ProcessedTransaction):
+        self.cursor.execute(self._INSERT_TRANSACTION, self._transaction_params(t))
+
+    def add_transactions(self, ts: List[ProcessedTransaction]):
+        """Inserimento a batch (un solo executemany)"""
+        self.cursor.executemany(self._INSERT_TRANSACTION, map(self._transaction_params, ts))
+
+    def merge_transactions(self, paths: List[str]) -> int:
+        """
+        Copia le transazioni di DB shard (stesso schema, file costruiti da altri
+        processi) con ATTACH + INSERT ... SELECT. Le FK tra shard diversi, come
+        paired_transaction_fk, restano valide perché gli id sono assegnati prima.
+        """
+        self.conn.commit()  # ATTACH non è ammesso dentro una transazione
+        merged = 0
+        for path in paths:
+            self.conn.execute("ATTACH DATABASE ? AS shard", (path,))
+            try:
+                merged += self.conn.execute("INSERT INTO main.transactions SELECT * FROM shard.transactions").rowcount
+                self.conn.commit()
+            finally:
+                self.conn.execute("DETACH DATABASE shard")
+        return merged
+
+    def add_budget(self, pk: str, name: str, amount: float, start_ms: int, end_ms: int, wallet_fk: str):
+        # Budget mensile ricorrente (period_length=1, reoccurrence=3 come nel DB di riferimento)
+        query = """
+        INSERT INTO budgets (
+            budget_pk, name, amount, start_date, end_date, income, archived, added_transactions_only,
+            period_length, reoccurrence, date_created, date_time_modified, pinned, "order", wallet_fk,
+            is_absolute_spending_limit
+        ) VALUES (?, ?, ?, ?, ?, 0, 0, 0, 1, 3, ?, ?, 1, 0, ?, 0)
+        """
+        now = int(time.time()*1000)
+        self.cursor.execute(query, (pk, name, amount, start_ms, end_ms, now, now, wallet_fk))
+
+    def add_category_budget_limit(self, pk: str, category_fk: str, budget_fk: str, amount: float, wallet_fk: str):
+        query = """INSERT INTO category_budget_limits VALUES (?, ?, ?, ?, ?, ?)"""
+        now = int(time.time()*1000)
+        self.cursor.execute(query, (pk, category_fk, budget_fk, amount, now, wallet_fk))
+
+    def add_associated_title(self, pk: str, category_fk: str, title: str, order: int, is_exact_match: bool = False):
+        query = """INSERT INTO associated_titles VALUES (?, ?, ?, ?, ?, ?, ?)"""
+        now = int(time.time()*1000)
+        self.cursor.execute(query, (pk, category_fk, title, now, now, order, 1 if is_exact_match else 0))
+
+    def update_category(self, pk: str, color: str, icon: str):
+        now = int(time.time()*1000)
+        self.cursor.execute('UPDATE categories SET colour = ?, icon_name = ?, date_time_modified = ? WHERE category_pk = ?',
+                            (color, icon, now, pk))
+
+    def delete_categories(self, pks: List[str]):
+        self.cursor.executemany('DELETE FROM categories WHERE category_pk = ?', [(pk,) for pk in pks])
+
+    def clear_budgets(self):
+        self.cursor.execute('DELETE FROM category_budget_limits')
+        self.cursor.execute('DELETE FROM budgets')
+
+    def create_source_index(self, rows):
+        """
+        Tabella TEMP (non finisce nel backup) transaction_pk -> categoria Wallet
+        di origine, indicizzata per categoria. Contiene solo le transazioni la
+        cui categoria dipende dal mapping (no trasferimenti, no regole).
+        rows: (transaction_pk, source_category, payee_title o None)
+        """
+        _create_source_index(self.cursor, rows)
+
+    def remap_source_categories(self, targets: Dict[str, tuple]) -> int:
+        """
+        Un solo UPDATE set-based per tutte le categorie Wallet il cui mapping è
+        cambiato. targets: source_category -> (category_fk, sub_category_fk, nome main).
+        Il titolo resta il payee normalizzato, altrimenti diventa il nome della main.
+        Restituisce le transazioni aggiornate. Le righe da toccare si trovano
+        partendo dalle poche categorie cambiate (CROSS JOIN fissa l'ordine) e
+        scendendo nell'indice per source_category, poi lookup per chiave
+        primaria: nessuna scansione di transactions (con UPDATE ... FROM il
+        planner di SQLite la sceglie).
+        """
+        if not targets:
+            return 0
+        self.cursor.execute('CREATE TEMP TABLE IF NOT EXISTS map_delta (source_category TEXT PRIMARY KEY, '
+                            'category_fk TEXT NOT NULL, sub_category_fk TEXT, main_name TEXT NOT NULL)')
+        self.cursor.execute('DELETE FROM temp.map_delta')
+        self.cursor.executemany('INSERT INTO temp.map_delta VALUES (?, ?, ?, ?)',
+                                [(src, *target) for src, target in targets.items()])
+        self.cursor.execute("""
+            UPDATE transactions SET (category_fk, sub_category_fk, name) = (
+                SELECT d.category_fk, d.sub_category_fk, COALESCE(s.payee_title, d.main_name)
+                FROM temp.tx_source AS s JOIN temp.map_delta AS d ON d.source_category = s.source_category
+                WHERE s.transaction_pk = transactions.transaction_pk
+            )
+            WHERE transaction_pk IN (
+                SELECT s.transaction_pk
+                FROM temp.map_delta AS d CROSS JOIN temp.tx_source AS s ON s.source_category = d.source_category
+            )
+        """)
+        return self.cursor.rowcount
+
+    def _check(self, name: str, query: str, fmt, params=()) -> IntegrityCheck:
+        """Esegue una query che restituisce (chiave, conteggio) per ogni gruppo di problemi"""
+        rows = self.conn.execute(query, params).fetchall()
+        issues = sum(r[-1] for r in rows)
+        return IntegrityCheck(name=name, passed=issues == 0, issues=issues,
+                              details=[fmt(r) for r in rows[:MAX_DETAILS]])
+
+    def verify(self, expected_balances: Optional[Dict[str, int]] = None) -> List[IntegrityCheck]:
+        """
+        Controlli di integrità set-based: poche query aggregate, indipendenti dal
+        numero di righe lato Python. expected_balances (wallet_pk -> totale dal
+        CSV sorgente in millesimi, la scala usata qui per sommare gli importi del
+        DB) abilita il confronto dei saldi per conto. I millesimi vanno calcolati
+        per transazione con le sue cifre decimali: un conto può avere transazioni
+        in una valuta diversa dalla propria.
+        """
+        self.conn.commit()
+        checks = []
+
+        # Coppie dei trasferimenti: coprono anche la FK paired_transaction_fk
+        # (coppia inesistente), così quella colonna non entra nella scansione sotto
+        pair_rows = self.conn.execute(
+            """SELECT b.transaction_pk IS NULL, MIN(a.transaction_pk), COUNT(*) FROM transactions a
+               LEFT JOIN transactions b ON b.transaction_pk = a.paired_transaction_fk
+               WHERE a.paired_transaction_fk IS NOT NULL
+                 AND (b.transaction_pk IS NULL OR b.paired_transaction_fk IS NOT a.transaction_pk)
+               GROUP BY b.transaction_pk IS NULL""").fetchall()
+        fk_counts = {}
+        missing_pairs = sum(n for missing, _, n in pair_rows if missing)
+        if missing_pairs:
+            fk_counts[("transactions", "paired_transaction_fk", "transactions")] = missing_pairs
+
+        # Orfani contati in SQL, una scansione per tabella con una somma per FK:
+        # nessuna riga di PRAGMA foreign_key_check viene portata in Python. Sulla
+        # scansione di transactions viaggiano anche i saldi per conto (FILTER per
+        # conto: evita l'ordinamento di un GROUP BY su un milione di righe)
+        wallets = {pk: (name, dec) for pk, name, dec in
+                   self.conn.execute("SELECT wallet_pk, name, decimals FROM wallets").fetchall()}
+        balance_wallets = list(wallets) if expected_balances is not None and len(wallets) <= BALANCE_FILTER_MAX else []
+        actual = {}
+        for (table,) in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall():
+            fks = [(fk[3], fk[2], fk[4] or "rowid") for fk in
+                   self.conn.execute(f'PRAGMA foreign_key_list("{table}")').fetchall()
+                   if (table, fk[3]) != ("transactions", "paired_transaction_fk")]
+            if not fks:
+                continue
+            sums, params = [], []
+            for col, parent, pk in fks:
+                orphan = f'"{col}" IS NOT NULL AND "{col}" NOT IN (SELECT "{pk}" FROM "{parent}")'
+                if (table, col) == ("transactions", "category_fk"):
+                    orphan += TRANSFER_EXEMPTION
+                    params += TRANSFER_PARAMS
+                sums.append(f"SUM({orphan})")
+            if table == "transactions":
+                sums += [f"{BALANCE_SUM} FILTER (WHERE wallet_fk = ?)"] * len(balance_wallets)
+                params += balance_wallets
+            row = self.conn.execute(f'SELECT {", ".join(sums)} FROM "{table}"', params).fetchone()
+            for (col, parent, _), n in zip(fks, row):
+                if n:
+                    fk_counts[(table, col, parent)] = n
+            if table == "transactions":
+                actual = dict(zip(balance_wallets, row[len(fks):]))
+        issues = sum(fk_counts.values())
+        checks.append(IntegrityCheck(
+            name="Foreign key", passed=not issues, issues=issues,
+            details=[f"{t}.{c} -> {p}: {n} righe" for (t, c, p), n in list(fk_counts.items())[:MAX_DETAILS]],
         ))
 
+        for column, parent, pk in (("category_fk", "categories", "category_pk"),
+                                   ("sub_category_fk", "categories", "category_pk"),
+                                   ("wallet_fk", "wallets", "wallet_pk")):
+            name = f"Transazioni con {column} orfano"
+            if not fk_counts.get(("transactions", column, parent)):
+                checks.append(IntegrityCheck(name=name, passed=True))
+                continue
+            # Solo in caso di errore: quali valori mancano e quante righe li usano
+            exempt = column == "category_fk"
+            checks.append(self._check(
+                name,
+                f"""SELECT {column}, COUNT(*) FROM transactions
+                    WHERE {column} IS NOT NULL AND {column} NOT IN (SELECT {pk} FROM {parent})
+                    {TRANSFER_EXEMPTION if exempt else ""}
+                    GROUP BY {column}""",
+                lambda r: f"{r[0]!r}: {r[1]} righe",
+                TRANSFER_PARAMS if exempt else (),
+            ))
+
+        checks.append(self._check(
+            "Sottocategoria di un'altra categoria madre",
+            """SELECT t.category_fk, s.category_pk, COUNT(*) FROM transactions t
+               JOIN categories s ON s.category_pk = t.sub_category_fk
+               WHERE s.main_category_pk IS NOT t.category_fk
+               GROUP BY t.category_fk, s.category_pk""",
+            lambda r: f"sub {r[1]!r} sotto {r[0]!r}: {r[2]} righe",
+        ))
+
+        pair_issues = sum(r[-1] for r in pair_rows)
+        checks.append(IntegrityCheck(
+            name="Trasferimenti non simmetrici (paired_transaction_fk)", passed=not pair_issues, issues=pair_issues,
+            details=[f"{'coppia inesistente' if r[0] else 'collegamento non ricambiato'}: {r[2]} righe (es. {r[1]})"
+                     for r in pair_rows[:MAX_DETAILS]],
+        ))
+
+        if expected_balances is not None:
+            if not balance_wallets:  # molti conti: un GROUP BY costa meno di un FILTER per conto
+                actual = dict(self.conn.execute(
+                    f"SELECT wallet_fk, {BALANCE_SUM} FROM transactions GROUP BY wallet_fk").fetchall())
+            mismatches = []
+            for pk in sorted(set(expected_balances) | set(actual)):
+                name, dec = wallets.get(pk, (pk, 2))
+                exp = expected_balances.get(pk, 0)
+                got = actual.get(pk) or 0
+                if exp != got:
+                    mismatches.append(f"{name}: atteso {from_minor(exp, 3):.{dec}f}, trovato {from_minor(got, 3):.{dec}f}")
+            checks.append(IntegrityCheck(
+                name="Saldi per conto vs CSV sorgente", passed=not mismatches,
+                issues=len(mismatches), details=mismatches[:MAX_DETAILS],
+            ))
+        return checks
+
+    def memory_bytes(self) -> int:
+        """Memoria occupata dal DB (0 se già spostato su disco)"""
+        if self.path is not None:
+            return 0
+        page_count = self.conn.execute("PRAGMA page_count").fetchone()[0]
+        page_size = self.conn.execute("PRAGMA page_size").fetchone()[0]
+        return page_count * page_size
+
+    def move_to_disk(self, path: str):
+        """Sposta il DB in memoria su un file: resta utilizzabile, libera la RAM"""
+        self.conn.commit()
+        disk = sqlite3.connect(path, check_same_thread=False)
+        self.conn.backup(disk)
+        # Le tabelle TEMP non passano dal backup: l'indice delle categorie sorgente va ricopiato
+        if self.conn.execute("SELECT 1 FROM temp.sqlite_master WHERE name = 'tx_source'").fetchone():
+            _create_source_index(disk.cursor(), self.conn.execute('SELECT * FROM temp.tx_source'))
+        self.conn.close()
+        self.conn = disk
+        self.cursor = disk.cursor()
+        self.path = path
+
     def get_sql_dump(self) -> str:
         """Restituisce il dump SQL testo (Legacy/Debug)"""
         self.conn.commit()
@@ -85,3 +415,53 @@ class CashewDatabase:
             dest_conn.close()
             tmp.seek(0)
             return tmp.read()
+
+    def get_restore_sqlite(self) -> Tuple[bytes, RestoreReport]:
+        """
+        File SQLite finalizzato per il ripristino su telefono: indici su data e
+        conto+data, statistiche ANALYZE, user_version di Cashew, page
+        size del backup di riferimento e VACUUM INTO in un file senza pagine
+        libere. Il DB di lavoro non viene toccato (resta aggiornabile a delta).
+        """
+        self.conn.commit()
+        with tempfile.TemporaryDirectory(prefix="cashew-restore-") as tmp:
+            built, final = os.path.join(tmp, "built.sqlite"), os.path.join(tmp, "final.sqlite")
+            dest = sqlite3.connect(built)
+            try:
+                self.conn.backup(dest)
+                size_before = os.path.getsize(built)
+
+                start = time.perf_counter()
+                for _, ddl in RESTORE_INDEXES:
+                    dest.execute(ddl)
+                dest.commit()
+                index_ms = (time.perf_counter() - start) * 1000
+
+                start = time.perf_counter()
+                dest.execute("ANALYZE")
+                dest.commit()
+                analyze_ms = (time.perf_counter() - start) * 1000
+
+                if not dest.execute("PRAGMA user_version").fetchone()[0]:
+                    dest.execute(f"PRAGMA user_version = {CASHEW_SCHEMA_VERSION}")
+                # VACUUM INTO usa il page_size impostato sulla connessione sorgente
+                dest.execute(f"PRAGMA page_size = {RESTORE_PAGE_SIZE}")
+                start = time.perf_counter()
+                dest.execute("VACUUM INTO ?", (final,))
+                vacuum_ms = (time.perf_counter() - start) * 1000
+            finally:
+                dest.close()
+
+            out = sqlite3.connect(final)
+            try:
+                report = RestoreReport(
+                    size_before=size_before, size_after=os.path.getsize(final),
+                    index_ms=index_ms, analyze_ms=analyze_ms, vacuum_ms=vacuum_ms,
+                    page_size=out.execute("PRAGMA page_size").fetchone()[0],
+                    user_version=out.execute("PRAGMA user_version").fetchone()[0],
+                    schema_issues=schema_differences(out),
+                )
+            finally:
+                out.close()
+            with open(final, "rb") as f:
+                return f.read(), report
@@ -0,0 +1,49 @@
+"""Struttura di default di Cashew.
+
+Tenuta in un modulo senza dipendenze così app.py può leggerla al primo avvio
+senza importare pydantic.
+"""
+
+# --- DEFAULT CONFIGURATION RICCA ---
+DEFAULT_CASHEW_STRUCTURE = {
+    "Alimentari": {
+        "subs": ["Supermercato", "Minimarket", "Panificio", "Macelleria"],
+        "color": "#4CAF50", "icon": "groceries.png"
+    },
+    "Ristorazione": {
+        "subs": ["Ristorante", "Bar", "Fast Food", "Delivery", "Caffè"],
+        "color": "#FF9800", "icon": "food.png"
+    },
+    "Trasporti": {
+        "subs": ["Carburante", "Mezzi Pubblici", "Treno", "Taxi", "Parcheggio", "Manutenzione", "Assicurazione"],
+        "color": "#F44336", "icon": "car.png"
+    },
+    "Abitazione": {
+        "subs": ["Affitto", "Mutuo", "Luce", "Gas", "Acqua", "Internet", "Condominio", "Riparazioni"],
+        "color": "#795548", "icon": "house.png"
+    },
+    "Shopping": {
+        "subs": ["Abbigliamento", "Elettronica", "Casa", "Hobby", "Libri", "Regali"],
+        "color": "#9C27B0", "icon": "shopping.png"
+    },
+    "Salute & Benessere": {
+        "subs": ["Farmacia", "Medico", "Dentista", "Sport", "Barbiere/Parrucchiere"],
+        "color": "#00BCD4", "icon": "health.png"
+    },
+    "Intrattenimento": {
+        "subs": ["Cinema", "Streaming (Netflix/Spotify)", "Viaggi", "Hotel", "Eventi"],
+        "color": "#E91E63", "icon": "entertainment.png"
+    },
+    "Reddito": {
+        "subs": ["Stipendio", "Rimborsi", "Bonus", "Vendite"],
+        "color": "#2196F3", "icon": "salary.png"
+    },
+    "Finanza": {
+        "subs": ["Tasse", "Multe", "Commissioni", "Investimenti"],
+        "color": "#607D8B", "icon": "bank.png"
+    },
+    "Correzione saldo": {
+        "subs": [],
+        "color": "#9E9E9E", "icon": "charts.png"
+    }
+}
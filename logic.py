@@ -1,60 +1,94 @@
-import pandas as pd
+import io
 import uuid
 import datetime
 import time
-from typing import List, Dict
-from thefuzz import process
+from typing import List, Dict, Optional
 from models import WalletTransaction, CashewConfig, DEFAULT_CASHEW_STRUCTURE
+from resources import shared_resource, PARSE_CACHE
+
+# NOTA: pandas e thefuzz sono importati dentro le funzioni che li usano,
+# così lo step 1 si apre senza pagarne il costo di import.
 
 def fix_encoding(text):
     if not isinstance(text, str): return text
     try: return text.encode('cp1252').decode('utf-8')
     except: return text
 
-def parse_csv_to_models(file_buffer) -> List[WalletTransaction]:
-    try:
-        df = pd.read_csv(file_buffer, sep=';')
-        if len(df.columns) < 2:
-            file_buffer.seek(0)
-            df = pd.read_csv(file_buffer, sep=',')
-    except Exception as e:
-        raise ValueError(f"Impossibile leggere il file. Assicurati sia un CSV valido. Errore: {str(e)}")
+def parse_csv_to_models(file_buffer, rejects: Optional[list] = None) -> List[WalletTransaction]:
+    """Parsing di uno stream binario in formato export Wallet"""
+    from readers import wallet_csv
+    return [t for batch in wallet_csv.read(file_buffer, rejects=rejects) for t in batch]
+
+def parse_upload(file_buffer, rejects: Optional[list] = None) -> List[WalletTransaction]:
+    """
+    Upload in chiaro o compresso (gzip, xz, bz2, zip con più file): ogni file
+    viene decompresso in streaming e letto dal reader del suo formato
+    (Wallet CSV, OFX/QFX, QIF, CSV bancario), riconosciuto dai primi bytes.
+    Le righe scartate finiscono in `rejects` (validation.Reject, con il nome
+    del file se l'upload è un archivio).
+    """
+    from compression import open_source_streams, peek_prefix
+    from readers import DETECT_BYTES, DEFAULT_ACCOUNT, detect_reader
 
     transactions = []
-    for _, row in df.iterrows():
-        clean_row = {k: fix_encoding(v) for k, v in row.to_dict().items()}
-        is_transf = str(clean_row.get('transfer', 'false')).lower() == 'true' or \
-                    str(clean_row.get('type', '')).upper() == 'TRANSFER'
-        
+    for name, stream in open_source_streams(file_buffer):
+        prefix, stream = peek_prefix(stream, DETECT_BYTES)
+        reader = detect_reader(prefix)
+        bad = []
         try:
-            t = WalletTransaction(
-                account=clean_row.get('account', 'Unknown'),
-                category=clean_row.get('category', 'Uncategorized'),
-                amount=clean_row.get('amount', 0),
-                currency=clean_row.get('currency', 'EUR'),
-                note=str(clean_row.get('note', '')),
-                payee=str(clean_row.get('payee', '')),
-                date=str(clean_row.get('date', '')),
-                is_transfer=is_transf
-            )
-            transactions.append(t)
-        except: continue
+            if reader is None:
+                raise ValueError("Formato non riconosciuto (supportati: Wallet CSV, OFX/QFX, QIF, CSV bancario).")
+            default_account = name.rsplit("/", 1)[-1].rsplit(".", 1)[0] if name else DEFAULT_ACCOUNT
+            for batch in reader.read(stream, default_account, bad):
+                transactions.extend(batch)
+        except ValueError as e:
+            raise ValueError(f"{name}: {e}" if name else str(e))
+        if rejects is not None:
+            rejects.extend(r._replace(source=name) for r in bad)
     return transactions
 
-def ai_suggest_mapping(wallet_cats: List[str], cashew_structure: Dict) -> Dict[str, dict]:
-    """Suggerisce il mapping basandosi sulla struttura complessa (Main -> Subs)"""
-    suggestions = {}
+# Fa parte della chiave di cache: va incrementata se cambia l'output del parser
+PARSER_OPTIONS = ("readers", 5)
+
+def parse_upload_cached(data: bytes, rejects: Optional[list] = None) -> List[WalletTransaction]:
+    """
+    Parsing con cache condivisa tra sessioni (chiave: hash dei bytes + opzioni).
+    Restituisce copie perché detect_transfers modifica le transazioni; gli
+    scarti in cache vengono aggiunti a `rejects`.
+    """
+    def compute():
+        bad = []
+        return tuple(parse_upload(io.BytesIO(data), bad)), tuple(bad)
+
+    cached, bad = PARSE_CACHE.get_or_compute(data, PARSER_OPTIONS, compute)
+    if rejects is not None:
+        rejects.extend(bad)
+    return [t.model_copy() for t in cached]
+
+def _freeze_structure(cashew_structure: Dict) -> tuple:
+    return tuple((main, tuple(data['subs'])) for main, data in cashew_structure.items())
+
+@shared_resource(maxsize=32)
+def _fuzzy_index(frozen_structure: tuple):
+    """Lista piatta delle scelte Cashew (Main e 'Main Sub') con lookup inverso"""
     flat_cashew = []
-    lookup_map = {} 
-    
-    for main, data in cashew_structure.items():
+    lookup_map = {}
+    for main, subs in frozen_structure:
         flat_cashew.append(main)
         lookup_map[main] = (main, "")
-        for sub in data['subs']:
+        for sub in subs:
             combo = f"{main} {sub}"
             flat_cashew.append(combo)
             lookup_map[combo] = (main, sub)
-            
+    return flat_cashew, lookup_map
+
+def ai_suggest_mapping(wallet_cats: List[str], cashew_structure: Dict) -> Dict[str, dict]:
+    """Suggerisce il mapping basandosi sulla struttura complessa (Main -> Subs)"""
+    from thefuzz import process
+
+    suggestions = {}
+    flat_cashew, lookup_map = _fuzzy_index(_freeze_structure(cashew_structure))
+
     for w_cat in wallet_cats:
         best_match, score = process.extractOne(w_cat, flat_cashew)
         if score > 60:
@@ -66,6 +100,14 @@ def ai_suggest_mapping(wallet_cats: List[str], cashew_structure: Dict) -> Dict[s
 
 def generate_uuid(): return str(uuid.uuid4())
 
+def account_currencies(transactions: List[WalletTransaction]) -> Dict[str, str]:
+    """Valuta di ogni conto: la più frequente tra le sue transazioni"""
+    from collections import Counter
+    counts: Dict[str, Counter] = {}
+    for t in transactions:
+        counts.setdefault(t.account, Counter())[t.currency] += 1
+    return {acc: c.most_common(1)[0][0] for acc, c in counts.items()}
+
 def get_ts(date_str):
     try:
         dt = datetime.datetime.strptime(date_str[:19], "%Y-%m-%d %H:%M:%S")
@@ -98,18 +140,19 @@ def detect_transfers(transactions: List[WalletTransaction]) -> List[WalletTransa
     # Optimization: Dictionary by "Amount_Date"
 
     # Create lookup for incomes
-    incomes = {} # Key: (abs(amount), date_str), Value: List of indices
+    incomes = {} # Key: (abs(amount_minor), date_str), Value: List of indices
+    # Confronto su interi (unità minori): nessun problema di uguaglianza tra float
 
     for i, t in enumerate(transactions):
-        if t.is_transfer and t.amount > 0:
-            key = (abs(t.amount), t.date_str)
+        if t.is_transfer and t.amount_minor > 0:
+            key = (abs(t.amount_minor), t.date_str)
             if key not in incomes: incomes[key] = []
             incomes[key].append(i)
 
     # Match expenses
     for i, t in enumerate(transactions):
-        if t.is_transfer and t.amount < 0:
-            key = (abs(t.amount), t.date_str)
+        if t.is_transfer and t.amount_minor < 0:
+            key = (abs(t.amount_minor), t.date_str)
 
             # Check for direct match
             if key in incomes and incomes[key]:
@@ -1,57 +1,51 @@
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, computed_field, model_validator
 from typing import Optional, List, Dict
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 import time
 
-# --- DEFAULT CONFIGURATION RICCA ---
-DEFAULT_CASHEW_STRUCTURE = {
-    "Alimentari": {
-        "subs": ["Supermercato", "Minimarket", "Panificio", "Macelleria"],
-        "color": "#4CAF50", "icon": "groceries.png"
-    },
-    "Ristorazione": {
-        "subs": ["Ristorante", "Bar", "Fast Food", "Delivery", "Caffè"],
-        "color": "#FF9800", "icon": "food.png"
-    },
-    "Trasporti": {
-        "subs": ["Carburante", "Mezzi Pubblici", "Treno", "Taxi", "Parcheggio", "Manutenzione", "Assicurazione"],
-        "color": "#F44336", "icon": "car.png"
-    },
-    "Abitazione": {
-        "subs": ["Affitto", "Mutuo", "Luce", "Gas", "Acqua", "Internet", "Condominio", "Riparazioni"],
-        "color": "#795548", "icon": "house.png"
-    },
-    "Shopping": {
-        "subs": ["Abbigliamento", "Elettronica", "Casa", "Hobby", "Libri", "Regali"],
-        "color": "#9C27B0", "icon": "shopping.png"
-    },
-    "Salute & Benessere": {
-        "subs": ["Farmacia", "Medico", "Dentista", "Sport", "Barbiere/Parrucchiere"],
-        "color": "#00BCD4", "icon": "health.png"
-    },
-    "Intrattenimento": {
-        "subs": ["Cinema", "Streaming (Netflix/Spotify)", "Viaggi", "Hotel", "Eventi"],
-        "color": "#E91E63", "icon": "entertainment.png"
-    },
-    "Reddito": {
-        "subs": ["Stipendio", "Rimborsi", "Bonus", "Vendite"],
-        "color": "#2196F3", "icon": "salary.png"
-    },
-    "Finanza": {
-        "subs": ["Tasse", "Multe", "Commissioni", "Investimenti"],
-        "color": "#607D8B", "icon": "bank.png"
-    },
-    "Correzione saldo": {
-        "subs": [],
-        "color": "#9E9E9E", "icon": "charts.png"
-    }
+from defaults import DEFAULT_CASHEW_STRUCTURE
+
+# Cifre decimali delle valute che non ne hanno 2 (ISO 4217); default 2
+CURRENCY_DECIMALS = {
+    "JPY": 0, "KRW": 0, "VND": 0, "CLP": 0, "ISK": 0, "PYG": 0, "UGX": 0, "XAF": 0, "XOF": 0,
+    "BHD": 3, "KWD": 3, "OMR": 3, "JOD": 3, "TND": 3, "IQD": 3, "LYD": 3,
 }
 
+def currency_decimals(currency: Optional[str]) -> int:
+    return CURRENCY_DECIMALS.get(str(currency or "").upper(), 2)
+
+def parse_amount(v) -> Decimal:
+    """Importo da CSV (formato europeo o US, con simbolo di valuta) a Decimal esatto"""
+    if isinstance(v, (int, float)): return Decimal(repr(v))
+    val_str = str(v).replace('€', '').replace('$', '').strip()
+    # Gestione formato europeo vs US
+    if ',' in val_str and '.' in val_str:
+        if val_str.rfind(',') > val_str.rfind('.'):
+            val_str = val_str.replace('.', '').replace(',', '.')
+        else:
+            val_str = val_str.replace(',', '')
+    elif ',' in val_str:
+        val_str = val_str.replace(',', '.')
+    try: return Decimal(val_str)
+    except InvalidOperation: return Decimal(0)
+
+def to_minor(value, decimals: int = 2) -> int:
+    """Importo in unità maggiori -> intero in unità minori (es. -12,50 EUR -> -1250)"""
+    try:
+        return int((parse_amount(value) * (10 ** decimals)).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except (InvalidOperation, ValueError, OverflowError): # NaN / infinito
+        return 0
+
+def from_minor(minor: int, decimals: int = 2) -> float:
+    """Conversione al float di Cashew: solo al confine con il DB o la UI"""
+    return minor / (10 ** decimals)
+
 class WalletTransaction(BaseModel):
     """Rappresenta una riga grezza dal CSV di Wallet"""
     account: str
     category: str
-    amount: float
     currency: str = "EUR"
+    amount_minor: int = 0 # Importo in unità minori della valuta (centesimi per EUR)
     note: Optional[str] = ""
     payee: Optional[str] = ""
     date_str: str = Field(alias="date")
@@ -59,20 +53,23 @@ class WalletTransaction(BaseModel):
     temp_id: Optional[str] = None # For processing
     paired_with_idx: Optional[int] = None # For processing
 
-    @validator('amount', pre=True)
-    def parse_amount(cls, v):
-        if isinstance(v, (int, float)): return float(v)
-        val_str = str(v).replace('€', '').replace('$', '').strip()
-        # Gestione formato europeo vs US
-        if ',' in val_str and '.' in val_str:
-            if val_str.rfind(',') > val_str.rfind('.'): 
-                val_str = val_str.replace('.', '').replace(',', '.')
-            else: 
-                val_str = val_str.replace(',', '')
-        elif ',' in val_str: 
-            val_str = val_str.replace(',', '.')
-        try: return float(val_str)
-        except: return 0.0
+    @model_validator(mode='before')
+    @classmethod
+    def convert_amount(cls, data):
+        # "amount" in unità maggiori (come nel CSV) viene convertito in amount_minor
+        if isinstance(data, dict) and 'amount' in data:
+            data = dict(data)
+            data['amount_minor'] = to_minor(data.pop('amount'), currency_decimals(data.get('currency')))
+        return data
+
+    @property
+    def decimals(self) -> int:
+        return currency_decimals(self.currency)
+
+    @computed_field
+    @property
+    def amount(self) -> float:
+        return from_minor(self.amount_minor, self.decimals)
 
 class CashewConfig(BaseModel):
     """Configurazione di mappatura per una categoria"""
@@ -91,7 +88,8 @@ class ProcessedTransaction(BaseModel):
     """Transazione pronta per il DB Cashew"""
     id: str
     date_ms: int
-    amount: float
+    decimals: int = 2 # Cifre decimali della valuta del conto
+    amount_minor: int = 0 # Importo in unità minori, convertito in float solo nel DB
     title: str
     note: str
     wallet_fk: str
@@ -101,3 +99,42 @@ class ProcessedTransaction(BaseModel):
     sub_category_name: Optional[str] = None # Per CSV export
     is_income: bool
     paired_id: Optional[str] = None # Per i transfer
+
+    @model_validator(mode='before')
+    @classmethod
+    def convert_amount(cls, data):
+        if isinstance(data, dict) and 'amount' in data:
+            data = dict(data)
+            data['amount_minor'] = to_minor(data.pop('amount'), data.get('decimals', 2))
+        return data
+
+    @computed_field
+    @property
+    def amount(self) -> float:
+        return from_minor(self.amount_minor, self.decimals)
+
+class IntegrityCheck(BaseModel):
+    """Esito di un controllo di integrità sul database generato"""
+    name: str
+    passed: bool
+    issues: int = 0
+    details: List[str] = []
+
+class RestoreReport(BaseModel):
+    """Esito della finalizzazione del backup per il ripristino su telefono"""
+    size_before: int  # bytes del DB così com'è stato costruito
+    size_after: int   # bytes del file ottimizzato (indici + ANALYZE + VACUUM)
+    index_ms: float
+    analyze_ms: float
+    vacuum_ms: float
+    page_size: int
+    user_version: int
+    schema_issues: List[str] = []
+
+class PayeeRule(BaseModel):
+    """Regola di categorizzazione: parola chiave o regex su payee e/o nota"""
+    pattern: str
+    is_regex: bool = False
+    field: str = "any" # "payee", "note" oppure "any"
+    main_category: str
+    sub_category: str = ""
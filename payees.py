@@ -0,0 +1,82 @@
+"""
+Normalizzazione dei payee: raggruppa le varianti dello stesso esercente
+("AMAZON EU SARL", "Amazon.it", "AMZN Mktp") sotto un nome canonico.
+
+Confrontare tutte le coppie è quadratico; qui ogni payee finisce in pochi
+blocchi (prefisso del nome normalizzato e prefisso del suo scheletro di
+consonanti) e il confronto fuzzy avviene solo con i rappresentanti dei suoi
+blocchi. Il confronto usa RapidFuzz, il motore su cui si basa thefuzz.
+"""
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List
+
+from rapidfuzz import fuzz, process
+
+# Token che non identificano l'esercente: forme societarie, domini, rumore dei circuiti
+NOISE_TOKENS = {
+    "sarl", "srl", "srls", "spa", "snc", "sas", "ltd", "llc", "inc", "gmbh", "ag", "bv", "sa", "plc",
+    "eu", "it", "com", "www", "mktp", "marketplace",
+}
+PREFIX_LEN = 3
+MIN_FUZZY_LEN = 4  # sotto questa lunghezza solo match esatti: "eni" e "enel" non vanno uniti
+DEFAULT_THRESHOLD = 80
+
+
+def normalize_payee(payee: str) -> str:
+    """Chiave di confronto: minuscolo, senza accenti, punteggiatura, numeri e token rumore"""
+    text = unicodedata.normalize("NFKD", payee).encode("ascii", "ignore").decode().lower()
+    text = re.sub(r"(?<=\b\w)\.(?=\w\b)", "", text)  # s.p.a. -> spa
+    tokens = [t for t in re.split(r"[^a-z0-9]+", text) if t and not t.isdigit() and t not in NOISE_TOKENS]
+    return " ".join(tokens)
+
+
+def _skeleton(key: str) -> str:
+    # Prima lettera + consonanti: "amazon" e "amzn" diventano entrambi "amzn"
+    compact = key.replace(" ", "")
+    return compact[:1] + re.sub(r"[aeiou]", "", compact[1:])
+
+
+def _blocks(key: str) -> List[str]:
+    return [f"p:{key[:PREFIX_LEN]}", f"s:{_skeleton(key)[:PREFIX_LEN]}"]
+
+
+def cluster_payees(payees: Iterable[str], threshold: int = DEFAULT_THRESHOLD) -> Dict[str, str]:
+    """
+    Restituisce payee originale -> nome canonico (la grafia più frequente del
+    cluster). I payee vengono processati per frequenza decrescente, così i
+    rappresentanti dei cluster sono le grafie più comuni.
+    """
+    counts = Counter(p for p in payees if p and p.strip())
+    by_key: Dict[str, int] = {}          # chiave normalizzata -> cluster
+    blocks: Dict[str, List[str]] = {}    # blocco -> chiavi rappresentanti
+    leader_cluster: Dict[str, int] = {}  # chiave rappresentante -> cluster
+    members: List[List[str]] = []
+    assigned: Dict[str, int] = {}
+
+    for payee, _ in counts.most_common():
+        key = normalize_payee(payee) or payee.strip().lower()
+        cluster = by_key.get(key)
+
+        if cluster is None and len(key) >= MIN_FUZZY_LEN:
+            candidates = list(dict.fromkeys(k for b in _blocks(key) for k in blocks.get(b, ())))
+            if candidates:
+                best = process.extractOne(key, candidates, scorer=fuzz.ratio, processor=None,
+                                          score_cutoff=threshold)
+                if best is not None:
+                    cluster = leader_cluster[best[0]]
+
+        if cluster is None:
+            cluster = len(members)
+            members.append([])
+            leader_cluster[key] = cluster
+            if len(key) >= MIN_FUZZY_LEN:
+                for b in _blocks(key):
+                    blocks.setdefault(b, []).append(key)
+        by_key.setdefault(key, cluster)
+        members[cluster].append(payee)
+        assigned[payee] = cluster
+
+    # most_common è già ordinato: il primo membro di ogni cluster è la grafia più frequente
+    return {payee: members[c][0].strip() for payee, c in assigned.items()}
@@ -0,0 +1,53 @@
+"""
+Registro dei formati sorgente.
+
+Ogni formato è un reader in streaming: legge uno stream binario e produce
+batch di WalletTransaction normalizzate (importi in unità minori, data
+"YYYY-MM-DD HH:MM:SS"), le stesse che consumano detect_transfers e la
+costruzione del DB. Il formato si riconosce da un prefisso di pochi KB;
+i reader vengono provati nell'ordine di registrazione, dal più specifico
+(OFX, QIF, export Wallet) al CSV bancario generico.
+"""
+from typing import Callable, Iterator, List, NamedTuple, Optional
+
+from models import WalletTransaction
+
+DETECT_BYTES = 8192
+DEFAULT_ACCOUNT = "Conto importato"
+
+
+class Reader(NamedTuple):
+    name: str
+    label: str
+    detect: Callable[[bytes], bool]
+    read: Callable[..., Iterator[List[WalletTransaction]]]  # read(stream, default_account, rejects)
+
+
+READERS: List[Reader] = []
+
+
+def register(name: str, label: str, detect: Callable[[bytes], bool]):
+    """
+    Decoratore: registra la funzione read(stream, default_account, rejects) di
+    un formato. Le righe scartate vanno aggiunte a `rejects` (lista di
+    validation.Reject) se non è None, mai ignorate in silenzio.
+    """
+    def wrap(read):
+        READERS.append(Reader(name, label, detect, read))
+        return read
+    return wrap
+
+
+def detect_reader(prefix: bytes) -> Optional[Reader]:
+    for reader in READERS:
+        if reader.detect(prefix):
+            return reader
+    return None
+
+
+def get_reader(name: str) -> Reader:
+    return next(r for r in READERS if r.name == name)
+
+
+# L'ordine degli import è l'ordine di rilevamento
+from readers import ofx, qif, wallet_csv, bank_csv  # noqa: E402,F401
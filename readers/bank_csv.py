@@ -0,0 +1,149 @@
+"""
+CSV bancario generico: le colonne si riconoscono dai nomi più comuni negli
+export delle banche (italiani, inglesi, tedeschi), anche con righe di
+intestazione prima della tabella. L'importo è una colonna unica oppure la
+coppia dare/avere. È l'ultimo reader provato: prende i CSV che non sono
+export Wallet.
+"""
+import io
+import re
+import unicodedata
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from models import WalletTransaction, parse_amount
+from readers import register
+from readers.base import DEFAULT_CATEGORY, batched, sniff_encoding
+from readers.wallet_csv import CHUNK_ROWS, CSV_SEPARATORS
+from validation import normalize_amount
+
+ALIASES = {
+    "date": {"data", "data operazione", "data contabile", "data registrazione", "date", "booking date",
+             "transaction date", "posting date", "datum", "buchungstag"},
+    "amount": {"importo", "importo eur", "amount", "betrag", "valore", "movimento"},
+    "debit": {"dare", "uscite", "addebiti", "addebito", "debit", "debito", "soll"},
+    "credit": {"avere", "entrate", "accrediti", "accredito", "credit", "credito", "haben"},
+    "description": {"descrizione", "descrizione operazione", "causale", "description", "memo", "dettagli",
+                    "verwendungszweck", "details"},
+    "payee": {"beneficiario", "controparte", "esercente", "payee", "merchant", "counterparty", "empfanger"},
+    # "valuta" negli export italiani è la data valuta, non la divisa
+    "currency": {"divisa", "currency", "wahrung"},
+    "account": {"conto", "account", "iban"},
+    "category": {"categoria", "category", "kategorie"},
+}
+DATE_FORMATS = ("%d/%m/%Y", "%Y-%m-%d", "%d.%m.%Y", "%d-%m-%Y", "%d/%m/%y", "%m/%d/%Y",
+                "%Y-%m-%d %H:%M:%S", "%d/%m/%Y %H:%M", "%d.%m.%y")
+HEADER_SCAN_LINES = 30
+
+
+def _normalize(name: str) -> str:
+    name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode().lower()
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", name).split())
+
+
+def map_columns(columns: List[str]) -> Dict[str, str]:
+    """Campo normalizzato -> nome della colonna (la prima che corrisponde)"""
+    mapping = {}
+    for col in columns:
+        key = _normalize(col)
+        for field, names in ALIASES.items():
+            if key in names and field not in mapping:
+                mapping[field] = col
+                break
+    return mapping
+
+
+def _usable(mapping: Dict[str, str]) -> bool:
+    return "date" in mapping and ("amount" in mapping or ("debit" in mapping and "credit" in mapping))
+
+
+def find_header(prefix: bytes) -> Optional[Tuple[int, str, Dict[str, str]]]:
+    """(indice della riga di intestazione, separatore, mapping) dal prefisso del file"""
+    text = prefix.decode(sniff_encoding(prefix), "replace")
+    for i, line in enumerate(text.splitlines()[:HEADER_SCAN_LINES]):
+        sep = max(CSV_SEPARATORS, key=line.count)
+        if not line.count(sep):
+            continue
+        mapping = map_columns([c.strip().strip('"') for c in line.split(sep)])
+        if _usable(mapping):
+            return i, sep, mapping
+    return None
+
+
+def detect(prefix: bytes) -> bool:
+    return find_header(prefix) is not None
+
+
+def _parse_dates(values):
+    """Formato scelto per blocco: quello che interpreta più valori"""
+    import pandas as pd
+
+    best = None
+    for fmt in DATE_FORMATS:
+        parsed = pd.to_datetime(values, format=fmt, errors="coerce")
+        if best is None or parsed.notna().sum() > best.notna().sum():
+            best = parsed
+        if best.notna().all():
+            break
+    return best.dt.strftime("%Y-%m-%d %H:%M:%S").fillna("")
+
+
+def _signed_amount(debit: str, credit: str) -> str:
+    # Dare/avere: le uscite possono essere scritte con o senza segno. Una cella
+    # illeggibile resta com'è, così viene scartata invece di valere zero
+    for value in (debit, credit):
+        if value.strip() and normalize_amount(value) is None:
+            return value
+    return str(parse_amount(credit or "0") - abs(parse_amount(debit or "0")))
+
+
+def _signed_amounts(df, mapping):
+    if "amount" in mapping:
+        return df[mapping["amount"]].tolist()
+    return [_signed_amount(d, c) for d, c in zip(df[mapping["debit"]], df[mapping["credit"]])]
+
+
+def _records(stream: BinaryIO, header_line: int, sep: str, mapping: Dict[str, str],
+             encoding: str, default_account: str) -> Iterator[dict]:
+    import pandas as pd
+    from compression import PrefixedStream
+
+    for _ in range(header_line):  # righe descrittive prima della tabella
+        stream.readline()
+    header = stream.readline()
+    stream = io.BufferedReader(PrefixedStream(header, stream))
+    chunks = pd.read_csv(stream, sep=sep, dtype=str, keep_default_na=False, chunksize=CHUNK_ROWS,
+                         encoding=encoding, encoding_errors="replace", skipinitialspace=True)
+    first_row = header_line + 2  # righe del file da 1, intestazione inclusa
+    for df in chunks:
+        df.columns = [c.strip().strip('"') for c in df.columns]
+        blank = [""] * len(df)
+        col = lambda field: df[mapping[field]].tolist() if field in mapping else blank
+        # Le date non interpretabili restano "" e la riga finisce negli scarti
+        yield from (
+            dict(account=account or default_account, category=category or DEFAULT_CATEGORY,
+                 currency=currency or "EUR", amount=amount, note=note, payee=payee, date=date, _row=row)
+            for row, date, amount, note, payee, currency, account, category in zip(
+                range(first_row, first_row + len(df)),
+                _parse_dates(df[mapping["date"]]), _signed_amounts(df, mapping),
+                col("description"), col("payee"), col("currency"), col("account"), col("category"),
+            )
+        )
+        first_row += len(df)
+
+
+@register("bank_csv", "CSV bancario generico", detect)
+def read(stream: BinaryIO, default_account: str = "", rejects: Optional[list] = None) -> Iterator[List[WalletTransaction]]:
+    from compression import peek_prefix
+    from readers import DETECT_BYTES
+
+    prefix, stream = peek_prefix(stream, DETECT_BYTES)
+    found = find_header(prefix)
+    if found is None:
+        raise ValueError("Intestazione del CSV bancario non riconosciuta.")
+    header_line, sep, mapping = found
+    try:
+        yield from batched(_records(stream, header_line, sep, mapping, sniff_encoding(prefix), default_account), rejects)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Impossibile leggere il CSV bancario: {e}")
@@ -0,0 +1,52 @@
+"""Utilità comuni ai reader: decodifica del testo e batch di transazioni."""
+import codecs
+import io
+from typing import BinaryIO, Iterable, Iterator, List, Optional
+
+from models import WalletTransaction
+
+BATCH_SIZE = 10_000
+DEFAULT_CATEGORY = "Uncategorized"  # come il default del parser Wallet
+TRANSFER_CATEGORY = "Transfer"
+
+
+def sniff_encoding(prefix: bytes) -> str:
+    """utf-8 se il prefisso è valido (a meno di un carattere troncato in fondo), altrimenti cp1252"""
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(prefix, final=False)
+        return "utf-8-sig"
+    except UnicodeDecodeError:
+        return "cp1252"
+
+
+def text_stream(stream: BinaryIO, encoding: str) -> io.TextIOWrapper:
+    return io.TextIOWrapper(stream, encoding=encoding, errors="replace", newline=None)
+
+
+def batched(records: Iterable[dict], rejects: Optional[list] = None) -> Iterator[List[WalletTransaction]]:
+    """
+    Dict normalizzati -> batch di WalletTransaction. I record con data o
+    importo illeggibili o non validi finiscono in `rejects`; row è la riga
+    del file se il reader la indica nella chiave "_row", altrimenti il
+    numero progressivo del record.
+    """
+    from validation import Reject, exception_reason, record_problem
+
+    batch = []
+    for n, rec in enumerate(records, 1):
+        row = rec.pop("_row", n)
+        problem = record_problem(rec)
+        if problem is None:
+            try:
+                batch.append(WalletTransaction(**rec))
+            except Exception as e:
+                problem = exception_reason(e)
+        if problem is not None:
+            if rejects is not None:
+                rejects.append(Reject("", row, *problem))
+            continue
+        if len(batch) >= BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
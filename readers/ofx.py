@@ -0,0 +1,99 @@
+"""
+OFX/QFX (Open Financial Exchange), sia SGML (v1, tag foglia non chiusi)
+sia XML (v2). Lo stream viene letto a blocchi e tokenizzato con una regex:
+ogni <STMTTRN> chiuso diventa una transazione, senza costruire l'albero.
+"""
+import re
+from typing import BinaryIO, Iterator, List, Optional
+
+from models import WalletTransaction
+from readers import register
+from readers.base import DEFAULT_CATEGORY, TRANSFER_CATEGORY, batched, text_stream
+
+READ_CHARS = 1 << 16
+TOKEN = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+TRANSFER_TYPES = {"XFER"}
+FIELDS = {"TRNTYPE", "DTPOSTED", "TRNAMT", "NAME", "PAYEE", "MEMO", "FITID"}
+# Conto dell'estratto; BANKACCTTO/CCACCTTO dentro una STMTTRN sono la destinazione di un trasferimento
+ACCOUNT_FROM = {"BANKACCTFROM", "CCACCTFROM"}
+
+
+def detect(prefix: bytes) -> bool:
+    head = prefix.lstrip(b"\xef\xbb\xbf \t\r\n")
+    return head.startswith(b"OFXHEADER") or b"<OFX>" in prefix.upper()
+
+
+def parse_ofx_date(value: str) -> str:
+    """
+    YYYYMMDD[HHMMSS[.XXX]][[+-]ZZ:TZ]] -> "YYYY-MM-DD HH:MM:SS" per slicing,
+    senza strptime (fuso ignorato, come l'ora locale di Wallet)
+    """
+    digits = value.split("[", 1)[0].split(".", 1)[0].strip()
+    if len(digits) < 8 or not digits.isdigit():
+        return ""
+    d = digits.ljust(14, "0")
+    return f"{d[:4]}-{d[4:6]}-{d[6:8]} {d[8:10]}:{d[10:12]}:{d[12:14]}"
+
+
+def _encoding(prefix: bytes) -> str:
+    match = re.search(rb"CHARSET:\s*(\w+)|encoding=\"([\w-]+)\"", prefix[:1024])
+    charset = (match.group(1) or match.group(2)).decode().upper() if match else ""
+    return "cp1252" if charset in ("1252", "WINDOWS-1252") else "utf-8-sig"
+
+
+def _tokens(text) -> Iterator[tuple]:
+    """(chiusura, tag, valore) leggendo il testo a blocchi"""
+    buf = ""
+    while True:
+        chunk = text.read(READ_CHARS)
+        buf += chunk
+        # Il token dopo l'ultimo '<' può essere incompleto: resta nel buffer
+        end = buf.rfind("<") if chunk else len(buf)
+        if end > 0:
+            for m in TOKEN.finditer(buf, 0, end):
+                closing, tag, value = m.groups()
+                yield closing == "/", tag.upper(), value.strip()
+            buf = buf[end:]
+        if not chunk:
+            return
+
+
+def _records(text, default_account: str) -> Iterator[dict]:
+    account, currency, trn, in_from = default_account, "EUR", None, False
+    for closing, tag, value in _tokens(text):
+        if tag in ACCOUNT_FROM:
+            in_from = not closing
+        elif tag == "STMTTRN":
+            if not closing:
+                trn = {}
+            elif trn is not None:
+                yield _to_record(trn, account, currency)
+                trn = None
+        elif closing:
+            continue
+        elif trn is not None and tag in FIELDS and value:
+            trn.setdefault(tag, value)
+        elif tag == "ACCTID" and value and in_from:
+            account = value
+        elif tag == "CURDEF" and value:
+            currency = value
+
+
+def _to_record(trn: dict, account: str, currency: str) -> dict:
+    is_transfer = trn.get("TRNTYPE", "").upper() in TRANSFER_TYPES
+    payee = trn.get("NAME") or trn.get("PAYEE", "")
+    return dict(
+        account=account, currency=currency,
+        category=TRANSFER_CATEGORY if is_transfer else DEFAULT_CATEGORY,
+        amount=trn.get("TRNAMT", ""), note=trn.get("MEMO", ""), payee=payee,
+        date=parse_ofx_date(trn.get("DTPOSTED", "")), is_transfer=is_transfer,
+    )
+
+
+@register("ofx", "OFX / QFX", detect)
+def read(stream: BinaryIO, default_account: str = "", rejects: Optional[list] = None) -> Iterator[List[WalletTransaction]]:
+    from compression import peek_prefix
+
+    prefix, stream = peek_prefix(stream, 1024)
+    text = text_stream(stream, _encoding(prefix))
+    yield from batched(_records(text, default_account), rejects)
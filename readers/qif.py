@@ -0,0 +1,89 @@
+"""
+QIF (Quicken Interchange Format): record di righe con codice iniziale
+(D data, T/U importo, P payee, M memo, L categoria) chiusi da '^'.
+Una categoria tra parentesi quadre ([Conto]) indica un trasferimento.
+"""
+import datetime
+import re
+from typing import BinaryIO, Iterator, List, Optional
+
+from models import WalletTransaction
+from readers import register
+from readers.base import DEFAULT_CATEGORY, TRANSFER_CATEGORY, batched, sniff_encoding, text_stream
+
+HEADERS = (b"!type:", b"!account", b"!option", b"!clear")
+DATE_PARTS = re.compile(r"(\d+)\D+(\d+)\D+(\d+)")
+
+
+def detect(prefix: bytes) -> bool:
+    return prefix.lstrip(b"\xef\xbb\xbf \t\r\n").lower().startswith(HEADERS)
+
+
+def parse_qif_date(value: str) -> str:
+    """
+    Date QIF: M/D'YY e M/D/YYYY (Quicken), D.M.YYYY, YYYY-MM-DD. Con '/' vale
+    mese/giorno salvo quando il primo numero non può essere un mese.
+    """
+    m = DATE_PARTS.search(value.replace(" ", ""))
+    if not m:
+        return ""
+    a, b, c = (int(x) for x in m.groups())
+    if len(m.group(1)) == 4:
+        y, mo, d = a, b, c
+    elif "." in value or a > 12:
+        d, mo, y = a, b, c
+    else:
+        mo, d, y = a, b, c
+    if y < 100:
+        y += 2000 if y < 70 else 1900
+    try:
+        datetime.date(y, mo, d)
+    except ValueError:
+        return ""
+    return f"{y:04d}-{mo:02d}-{d:02d} 00:00:00"
+
+
+def _records(text, default_account: str) -> Iterator[dict]:
+    account, in_account_block, rec, start = default_account, False, {}, 0
+    for lineno, line in enumerate(text, 1):
+        line = line.rstrip("\r\n")
+        if not line:
+            continue
+        code, value = line[0], line[1:].strip()
+        if code == "!":
+            header = value.lower()
+            in_account_block = header == "account"
+            if header.startswith("type:") or header.startswith("option") or header.startswith("clear"):
+                in_account_block = False
+            rec = {}
+        elif code == "^":
+            if in_account_block:
+                account = rec.get("N", account)
+            elif "T" in rec or "U" in rec:
+                yield dict(_to_record(rec, account), _row=start)
+            rec = {}
+        elif code in "SE$" and not in_account_block:
+            continue  # righe di split: vale il totale T
+        else:
+            if not rec:
+                start = lineno
+            rec.setdefault(code, value)
+
+
+def _to_record(rec: dict, account: str) -> dict:
+    category = rec.get("L", "")
+    is_transfer = category.startswith("[") and category.endswith("]")
+    return dict(
+        account=account, currency="EUR",
+        category=TRANSFER_CATEGORY if is_transfer else (category or DEFAULT_CATEGORY),
+        amount=rec.get("T") or rec.get("U") or "", note=rec.get("M", ""), payee=rec.get("P", ""),
+        date=parse_qif_date(rec.get("D", "")), is_transfer=is_transfer,
+    )
+
+
+@register("qif", "QIF (Quicken)", detect)
+def read(stream: BinaryIO, default_account: str = "", rejects: Optional[list] = None) -> Iterator[List[WalletTransaction]]:
+    from compression import peek_prefix
+
+    prefix, stream = peek_prefix(stream, 4096)
+    yield from batched(_records(text_stream(stream, sniff_encoding(prefix)), default_account), rejects)
@@ -0,0 +1,53 @@
+"""Export CSV di BudgetBakers Wallet (separatore ';' o ',', importi europei o US)."""
+import io
+from typing import BinaryIO, Iterator, List, Optional
+
+from models import WalletTransaction
+from readers import register
+from validation import TEXT_DTYPE, Reject, validate_wallet_frame
+
+CSV_SEPARATORS = (';', ',', '\t')
+CHUNK_ROWS = 50_000
+REQUIRED_COLUMNS = {"account", "category", "amount"}
+
+
+def sniff_separator(header: bytes) -> str:
+    """Separatore dalla riga di intestazione (a parità vince ';', il default di Wallet)"""
+    return max(CSV_SEPARATORS, key=lambda sep: header.count(sep.encode()))
+
+
+def header_columns(prefix: bytes) -> List[str]:
+    header = prefix.lstrip(b"\xef\xbb\xbf").split(b"\n", 1)[0].rstrip(b"\r")
+    sep = sniff_separator(header).encode()
+    return [c.strip(b' "').decode("utf-8", "replace").lower() for c in header.split(sep)]
+
+
+def detect(prefix: bytes) -> bool:
+    return REQUIRED_COLUMNS <= set(header_columns(prefix))
+
+
+@register("wallet_csv", "Wallet (BudgetBakers) CSV", detect)
+def read(stream: BinaryIO, default_account: str = "", rejects: Optional[List[Reject]] = None) -> Iterator[List[WalletTransaction]]:
+    """
+    Il separatore si deduce dall'intestazione senza riavvolgere lo stream e
+    pandas legge a blocchi di CHUNK_ROWS righe: funziona anche su stream di
+    decompressione non riavvolgibili. Le righe non valide vanno in `rejects`.
+    """
+    import pandas as pd
+    from compression import PrefixedStream
+
+    header = stream.readline()
+    sep = sniff_separator(header)
+    stream = io.BufferedReader(PrefixedStream(header, stream))
+    row = 2  # la riga 1 è l'intestazione
+    try:
+        # Tutto come testo (Arrow): tipi, importi e date li controlla validate_wallet_frame
+        for df in pd.read_csv(stream, sep=sep, chunksize=CHUNK_ROWS, dtype=TEXT_DTYPE, keep_default_na=False):
+            df.columns = [str(c).strip().lower() for c in df.columns]
+            transactions, bad = validate_wallet_frame(df, row)
+            if rejects is not None:
+                rejects.extend(bad)
+            row += len(df)
+            yield transactions
+    except Exception as e:
+        raise ValueError(f"Impossibile leggere il file. Assicurati sia un CSV valido. Errore: {str(e)}")
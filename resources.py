@@ -0,0 +1,178 @@
+"""
+Cache di processo per oggetti costosi da costruire.
+
+Streamlit riesegue gli script a ogni interazione e ogni sessione ha il suo
+st.session_state: tutto quello che è immutabile e costoso (indici fuzzy,
+template, strutture di lookup) viene costruito una sola volta per processo e
+condiviso tra rerun e sessioni.
+"""
+import functools
+import hashlib
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+_lock = threading.RLock()
+_registry = {}
+
+
+class SharedResource:
+    """Memoizza una factory per argomenti (hashable), con lock per evitare build doppi"""
+
+    def __init__(self, factory, maxsize: Optional[int] = None):
+        self.factory = factory
+        self.maxsize = maxsize
+        self.name = f"{factory.__module__}.{factory.__qualname__}"
+        self._values = OrderedDict()
+        self._build_ms = {}
+        self._lock = threading.Lock()
+        functools.update_wrapper(self, factory)
+
+    def __call__(self, *args):
+        with self._lock:
+            if args in self._values:
+                self._values.move_to_end(args)
+                return self._values[args]
+            start = time.perf_counter()
+            value = self.factory(*args)
+            self._values[args] = value
+            self._build_ms[args] = (time.perf_counter() - start) * 1000
+            # LRU: le strutture modificate dagli utenti non devono accumularsi
+            while self.maxsize is not None and len(self._values) > self.maxsize:
+                old, _ = self._values.popitem(last=False)
+                self._build_ms.pop(old, None)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self._build_ms.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._values),
+            "build_ms": round(sum(self._build_ms.values()), 2),
+        }
+
+
+def shared_resource(factory=None, *, maxsize: Optional[int] = None):
+    """
+    Decoratore: il risultato viene calcolato una volta per processo e argomenti.
+    Usabile come @shared_resource oppure @shared_resource(maxsize=32).
+    """
+    def wrap(f):
+        res = SharedResource(f, maxsize=maxsize)
+        with _lock:
+            _registry[res.name] = res
+        return res
+    return wrap(factory) if factory is not None else wrap
+
+
+def resources_stats() -> dict:
+    """Statistiche di tutte le risorse condivise registrate"""
+    with _lock:
+        return {name: res.stats() for name, res in _registry.items()}
+
+
+def approx_sizeof(obj, sample: int = 200) -> int:
+    """
+    Stima (byte) della memoria occupata da obj. Per liste lunghe misura un
+    campione ed estrapola, così resta O(sample) anche con 1M transazioni.
+    """
+    if isinstance(obj, (list, tuple)):
+        if not obj:
+            return sys.getsizeof(obj)
+        step = max(1, len(obj) // sample)
+        picked = obj[::step]
+        per_item = sum(approx_sizeof(x, sample) for x in picked) / len(picked)
+        return sys.getsizeof(obj) + int(per_item * len(obj))
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(approx_sizeof(k) + approx_sizeof(v) for k, v in obj.items())
+    if hasattr(obj, "__dict__"):
+        return sys.getsizeof(obj) + approx_sizeof(vars(obj))
+    return sys.getsizeof(obj)
+
+
+class ContentCache:
+    """
+    Cache LRU indirizzata per contenuto: la chiave è lo sha256 dei bytes più
+    le opzioni del parser, il limite è in byte stimati. Condivisa tra sessioni:
+    lo stesso file viene elaborato una sola volta per server.
+    """
+
+    def __init__(self, max_bytes: int, max_entries: int = 64):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._inflight = {}  # key -> Lock, evita parse doppi in parallelo
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+
+    @staticmethod
+    def make_key(data: bytes, options: tuple = ()) -> str:
+        h = hashlib.sha256(data)
+        h.update(repr(options).encode())
+        return h.hexdigest()
+
+    def get_or_compute(self, data: bytes, options: tuple, compute, sizeof=approx_sizeof):
+        key = self.make_key(data, options)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            key_lock = self._inflight.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                # Un'altra sessione potrebbe averlo calcolato mentre aspettavamo
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key][0]
+                self.misses += 1
+            try:
+                value = compute()
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+            self._store(key, value, sizeof(value))
+            return value
+
+    def _store(self, key: str, value, size: int):
+        with self._lock:
+            if size > self.max_bytes:
+                return  # troppo grande: non tenerlo, non svuotare la cache per lui
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                _, (_, old_size) = self._entries.popitem(last=False)
+                self.bytes -= old_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+# Limite configurabile da env (MB); default pensato per un container piccolo
+PARSE_CACHE = ContentCache(max_bytes=int(os.environ.get("CASHEW_PARSE_CACHE_MB", "256")) * 1024 * 1024)
@@ -0,0 +1,187 @@
+"""
+Motore di regole payee/nota -> categoria Cashew.
+
+Le parole chiave di tutte le regole finiscono in un unico automa Aho-Corasick:
+il matching costa O(lunghezza del testo) indipendentemente dal numero di
+regole. Le regex sono unite in un'unica alternanza usata come prefiltro; solo
+sui testi che la superano si valutano le singole regex, nell'ordine delle regole.
+Se una regex non sopravvive all'unione (flag inline, backreference, gruppi con
+nome ripetuti) il prefiltro viene saltato e si valutano le regex una per una.
+A parità di testo vince sempre la prima regola della lista.
+"""
+import re
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from models import PayeeRule, WalletTransaction
+from resources import shared_resource
+
+FIELDS = ("payee", "note")
+# Costrutti che cambiano significato dentro un'alternanza: flag globali "(?i)",
+# backreference numeriche "\1" o per nome "(?P=x)", condizionali "(?(1)...)"
+NOT_COMBINABLE = re.compile(r"\(\?[aiLmsux]+\)|\\[1-9]|\(\?P=|\(\?\(")
+
+
+class AhoCorasick:
+    """Automa multi-pattern case-insensitive; restituisce l'indice minimo trovato"""
+
+    def __init__(self, patterns: List[Tuple[str, int]]):
+        self.goto = [{}]
+        self.fail = [0]
+        self.best = [None]  # indice di regola minimo che termina in (o tramite fail da) questo stato
+        for text, idx in patterns:
+            state = 0
+            for ch in text.lower():
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.best.append(None)
+                state = nxt
+            if self.best[state] is None or idx < self.best[state]:
+                self.best[state] = idx
+
+        # BFS: link di fallimento e propagazione del best
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0) if state else 0
+                inherited = self.best[self.fail[nxt]]
+                if inherited is not None and (self.best[nxt] is None or inherited < self.best[nxt]):
+                    self.best[nxt] = inherited
+
+    def first_match(self, text: str) -> Optional[int]:
+        goto, fail, best = self.goto, self.fail, self.best
+        state, found = 0, None
+        for ch in text.lower():
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            b = best[state]
+            if b is not None and (found is None or b < found):
+                found = b
+                if found == 0:
+                    break
+        return found
+
+
+# (pattern, is_regex, field): la parte di PayeeRule che serve al matching, hashable
+RuleSpec = Tuple[str, bool, str]
+
+
+def combined_prefilter(patterns: List[str]) -> Optional[re.Pattern]:
+    """Alternanza di tutte le regex, o None se non si possono unire senza cambiarne il significato"""
+    if not patterns or any(NOT_COMBINABLE.search(p) for p in patterns):
+        return None
+    try:
+        return re.compile("|".join(f"(?:{p})" for p in patterns), re.I)
+    except re.error:
+        return None
+
+
+class RuleMatcher:
+    """Regole compilate: un automa per campo per le keyword, un prefiltro per le regex"""
+
+    def __init__(self, specs: Tuple[RuleSpec, ...]):
+        self.keywords = {}
+        self.regexes = {}
+        self.prefilter = {}
+        for field in FIELDS:
+            active = [(i, pattern, is_regex) for i, (pattern, is_regex, f) in enumerate(specs)
+                      if pattern and f in (field, "any")]
+            self.keywords[field] = AhoCorasick([(p, i) for i, p, is_regex in active if not is_regex])
+            self.regexes[field] = [(i, re.compile(p, re.I)) for i, p, is_regex in active if is_regex]
+            # None: nessun prefiltro, le regex (se ci sono) si valutano sempre
+            self.prefilter[field] = combined_prefilter([p for _, p, is_regex in active if is_regex])
+
+    def match_text(self, field: str, text: str, limit: Optional[int] = None) -> Optional[int]:
+        if not text:
+            return limit
+        found = self.keywords[field].first_match(text)
+        if limit is not None and (found is None or limit < found):
+            found = limit
+        pre = self.prefilter[field]
+        if self.regexes[field] and (pre is None or pre.search(text)):
+            for idx, rx in self.regexes[field]:
+                if found is not None and idx >= found:
+                    break
+                if rx.search(text):
+                    found = idx
+                    break
+        return found
+
+    def match(self, payee: str, note: str) -> Optional[int]:
+        """Indice della prima regola (in ordine di lista) che corrisponde"""
+        return self.match_text("note", note, self.match_text("payee", payee))
+
+
+def validate_rules(rules: List[PayeeRule]) -> Tuple[List[PayeeRule], List[str]]:
+    """Scarta le regole vuote o con regex non valide, restituendo anche gli errori"""
+    valid, errors = [], []
+    for r in rules:
+        if not r.pattern.strip():
+            continue
+        if r.is_regex:
+            try:
+                re.compile(r.pattern)
+            except re.error as e:
+                errors.append(f"Regex non valida '{r.pattern}': {e}")
+                continue
+        valid.append(r)
+    # Le regex valide da sole devono anche compilare insieme (flag, gruppi con nome):
+    # meglio un errore qui che un'eccezione negli step successivi
+    try:
+        compile_rules(tuple((r.pattern, r.is_regex, r.field) for r in valid))
+    except re.error as e:
+        errors.append(f"Regex non utilizzabili insieme: {e}")
+        valid = [r for r in valid if not r.is_regex]
+    return valid, errors
+
+
+@shared_resource(maxsize=32)
+def compile_rules(specs: Tuple[RuleSpec, ...]) -> RuleMatcher:
+    """Compila (una volta per processo) un insieme di regole"""
+    return RuleMatcher(specs)
+
+
+def apply_rules(transactions: List[WalletTransaction], rules: List[PayeeRule]) -> List[Optional[int]]:
+    """
+    Per ogni transazione l'indice della regola che la categorizza (o None).
+    Le coppie payee/nota ripetute vengono valutate una sola volta.
+    """
+    if not rules:
+        return [None] * len(transactions)
+    matcher = compile_rules(tuple((r.pattern, r.is_regex, r.field) for r in rules))
+    memo: Dict[Tuple[str, str], Optional[int]] = {}
+    result = []
+    for t in transactions:
+        key = (t.payee or "", t.note or "")
+        if key not in memo:
+            memo[key] = matcher.match(*key)
+        result.append(memo[key])
+    return result
+
+
+def associated_titles(rules: List[PayeeRule], transactions: List[WalletTransaction],
+                      matches: List[Optional[int]]) -> List[Tuple[str, int, bool]]:
+    """
+    Titoli da scrivere in associated_titles perché Cashew continui a
+    categorizzare da solo: (titolo, indice regola, match esatto).
+    Le keyword diventano titoli "contiene"; le regex, che Cashew non conosce,
+    diventano i payee distinti che hanno effettivamente intercettato.
+    """
+    titles = {}
+    for i, r in enumerate(rules):
+        if not r.is_regex and r.pattern.strip():
+            titles.setdefault(r.pattern.strip().lower(), (r.pattern.strip(), i, False))
+    for t, idx in zip(transactions, matches):
+        if idx is not None and rules[idx].is_regex and t.payee:
+            titles.setdefault(t.payee.strip().lower(), (t.payee.strip(), idx, True))
+    return list(titles.values())
@@ -0,0 +1,188 @@
+"""
+Contabilità della memoria per sessione.
+
+Ogni sessione Streamlit registra qui i suoi artefatti grandi (transazioni,
+DB costruito, bytes di export). Quando la memoria stimata supera il budget
+(CASHEW_SESSION_BUDGET_MB) gli artefatti più grandi vengono spostati su
+disco: i bytes in un file temporaneo, i CashewDatabase con move_to_disk().
+Restano utilizzabili, solo più lenti da rileggere.
+
+L'oggetto SessionArtifacts vive in st.session_state: quando la sessione
+viene chiusa e raccolta dal GC, i file su disco vengono cancellati e la
+sessione sparisce dal report.
+"""
+import os
+import tempfile
+import threading
+import weakref
+from typing import Dict, Optional
+
+from resources import approx_sizeof
+
+MB = 1024 * 1024
+SESSION_BUDGET_BYTES = int(os.environ.get("CASHEW_SESSION_BUDGET_MB", "512")) * MB
+SPILL_DIR = os.environ.get("CASHEW_SPILL_DIR") or tempfile.gettempdir()
+
+_registry = weakref.WeakValueDictionary()  # session_id -> SessionArtifacts
+_registry_lock = threading.Lock()
+
+
+def _remove_files(paths: set):
+    for path in list(paths):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    paths.clear()
+
+
+class _Artifact:
+    __slots__ = ("value", "size", "path", "spillable")
+
+    def __init__(self, value, size: int, spillable: bool):
+        self.value = value
+        self.size = size
+        self.path = None
+        self.spillable = spillable
+
+
+def _sizeof(value) -> int:
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if hasattr(value, "memory_bytes"):
+        return value.memory_bytes()
+    return approx_sizeof(value)
+
+
+class SessionArtifacts:
+    """Artefatti grandi di una sessione, con budget di memoria e spill su disco"""
+
+    def __init__(self, session_id: str, budget_bytes: int = SESSION_BUDGET_BYTES, spill_dir: str = SPILL_DIR):
+        self.session_id = session_id
+        self.budget_bytes = budget_bytes
+        self.spill_dir = spill_dir
+        self.spills = 0
+        self._items: Dict[str, _Artifact] = {}
+        self._paths = set()
+        self._lock = threading.RLock()
+        weakref.finalize(self, _remove_files, self._paths)
+        with _registry_lock:
+            _registry[session_id] = self
+
+    def put(self, key: str, value, spillable: bool = True):
+        """Registra (o sostituisce) un artefatto e applica il budget"""
+        with self._lock:
+            self._discard(key)
+            self._items[key] = _Artifact(value, _sizeof(value), spillable)
+            self._enforce_budget()
+
+    def track(self, key: str, value):
+        """Solo contabilità: oggetti che devono restare in memoria (es. transazioni)"""
+        self.put(key, value, spillable=False)
+
+    def refresh(self, key: str):
+        """Ricalcola la dimensione di un artefatto modificato sul posto (es. DB aggiornato)"""
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item.value is not None:
+                item.size = _sizeof(item.value)
+                self._enforce_budget()
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return default
+            if item.value is None:  # bytes spostati su disco
+                with open(item.path, "rb") as f:
+                    return f.read()
+            return item.value
+
+    def has(self, key: str) -> bool:
+        with self._lock:
+            return key in self._items
+
+    def drop(self, key: str):
+        with self._lock:
+            self._discard(key)
+
+    def _discard(self, key: str):
+        item = self._items.pop(key, None)
+        if item is not None and item.path is not None:
+            self._paths.discard(item.path)
+            if item.value is not None and hasattr(item.value, "conn"):
+                item.value.conn.close()
+            try:
+                os.remove(item.path)
+            except OSError:
+                pass
+
+    def _in_memory(self):
+        return [(k, it) for k, it in self._items.items() if it.path is None]
+
+    def memory_bytes(self) -> int:
+        with self._lock:
+            return sum(it.size for _, it in self._in_memory())
+
+    def disk_bytes(self) -> int:
+        with self._lock:
+            return sum(os.path.getsize(it.path) for it in self._items.values()
+                       if it.path is not None and os.path.exists(it.path))
+
+    def _enforce_budget(self):
+        # Sposta su disco gli artefatti più grandi finché si rientra nel budget
+        candidates = sorted((it for _, it in self._in_memory() if it.spillable),
+                            key=lambda it: it.size, reverse=True)
+        for item in candidates:
+            if self.memory_bytes() <= self.budget_bytes:
+                break
+            self._spill(item)
+
+    def _spill(self, item: _Artifact):
+        fd, path = tempfile.mkstemp(prefix=f"cashew-{self.session_id[:8]}-", dir=self.spill_dir)
+        os.close(fd)
+        if isinstance(item.value, (bytes, bytearray)):
+            with open(path, "wb") as f:
+                f.write(item.value)
+            item.value = None
+        elif hasattr(item.value, "move_to_disk"):
+            item.value.move_to_disk(path)
+        else:
+            os.remove(path)
+            return
+        item.path = path
+        self._paths.add(path)
+        self.spills += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "memory_bytes": self.memory_bytes(),
+                "disk_bytes": self.disk_bytes(),
+                "budget_bytes": self.budget_bytes,
+                "spills": self.spills,
+                "artifacts": {k: {"bytes": it.size, "on_disk": it.path is not None}
+                              for k, it in self._items.items()},
+            }
+
+    def release(self):
+        """Libera tutto (nuova migrazione)"""
+        with self._lock:
+            for key in list(self._items):
+                self._discard(key)
+
+
+def get_session_artifacts(session_id: str) -> Optional[SessionArtifacts]:
+    with _registry_lock:
+        return _registry.get(session_id)
+
+
+def memory_report() -> dict:
+    """Memoria per sessione e totali del processo, per il monitoraggio"""
+    with _registry_lock:
+        sessions = {sid: art.stats() for sid, art in list(_registry.items())}
+    return {
+        "sessions": sessions,
+        "total_memory_bytes": sum(s["memory_bytes"] for s in sessions.values()),
+        "total_disk_bytes": sum(s["disk_bytes"] for s in sessions.values()),
+    }
@@ -0,0 +1,117 @@
+"""
+Build parallela a shard del DB Cashew.
+
+Con molte transazioni la costruzione è quasi tutta lavoro Python per riga
+(parsing della data, validazione di ProcessedTransaction, insert) legato a
+un solo core. In modalità shard il processo principale fa solo il lavoro
+globale (abbinamento dei trasferimenti, UUID di tutte le transazioni, FK di
+coppia e di categoria), poi divide le righe per conto o per intervallo di
+date: ogni shard viene costruito in un file SQLite da un processo separato
+e i file vengono uniti nel DB finale con ATTACH + INSERT ... SELECT.
+
+Gli id sono assegnati prima della divisione, quindi paired_transaction_fk
+tra transazioni finite in shard diversi resta valido dopo l'unione.
+"""
+import multiprocessing as mp
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+
+from database import CashewDatabase
+from logic import get_ts
+from models import ProcessedTransaction
+from session_memory import SPILL_DIR
+
+BUILD_SHARDS = int(os.environ.get("CASHEW_BUILD_SHARDS", "1"))
+SHARD_MIN_ROWS = 50_000  # sotto questa soglia avvio dei processi e unione costano più del guadagno
+PARTITIONS = ("wallet", "time")
+
+
+class TxRow(NamedTuple):
+    """Transazione con id e FK già risolti, prima di date_ms e validazione"""
+    id: str
+    paired_id: Optional[str]
+    date_str: str
+    amount_minor: int
+    decimals: int
+    title: str
+    note: str
+    wallet_fk: str
+    category_fk: str
+    sub_category_fk: Optional[str]
+    main_category_name: str
+
+
+def processed_from_rows(rows: List[TxRow]) -> List[ProcessedTransaction]:
+    return [
+        ProcessedTransaction(
+            id=r.id, date_ms=get_ts(r.date_str), amount_minor=r.amount_minor, decimals=r.decimals,
+            title=r.title, note=r.note, wallet_fk=r.wallet_fk, category_fk=r.category_fk,
+            sub_category_fk=r.sub_category_fk, main_category_name=r.main_category_name,
+            is_income=r.amount_minor > 0, paired_id=r.paired_id,
+        )
+        for r in rows
+    ]
+
+
+def partition(rows: List[TxRow], shards: int, by: str = "wallet") -> List[List[int]]:
+    """
+    Indici delle righe per shard. "wallet": conti interi, assegnati al bin
+    meno pieno partendo dal più grande; "time": intervalli di date contigui
+    di pari dimensione (utile con un solo conto dominante).
+    """
+    if by == "wallet":
+        groups = {}
+        for i, r in enumerate(rows):
+            groups.setdefault(r.wallet_fk, []).append(i)
+        bins = [[] for _ in range(shards)]
+        for idx in sorted(groups.values(), key=len, reverse=True):
+            min(bins, key=len).extend(idx)
+    elif by == "time":
+        order = sorted(range(len(rows)), key=lambda i: rows[i].date_str)
+        size = -(-len(order) // shards)
+        bins = [order[i:i + size] for i in range(0, len(order), size)]
+    else:
+        raise ValueError(f"Partizionamento sconosciuto: {by} (ammessi: {', '.join(PARTITIONS)})")
+    return [b for b in bins if b]
+
+
+def build_shard(columns: List[list], path: str) -> List[int]:
+    """
+    Eseguita in un processo worker: scrive lo shard su file e restituisce
+    date_ms. Le righe arrivano per colonne (una lista per campo di TxRow):
+    serializzarle così costa molto meno che una tupla per riga.
+    """
+    rows = list(map(TxRow._make, zip(*columns)))
+    db = CashewDatabase(path)
+    db.conn.commit()
+    # File temporaneo, letto una volta sola: niente journal né fsync
+    db.conn.execute("PRAGMA journal_mode = OFF")
+    db.conn.execute("PRAGMA synchronous = OFF")
+    processed = processed_from_rows(rows)
+    db.add_transactions(processed)
+    db.conn.commit()
+    db.conn.close()
+    return [p.date_ms for p in processed]
+
+
+def build_sharded(db: CashewDatabase, rows: List[TxRow], shards: int, by: str = "wallet") -> np.ndarray:
+    """Inserisce `rows` in `db` costruendo gli shard in parallelo; restituisce date_ms per riga"""
+    parts = partition(rows, shards, by)
+    date_ms = np.empty(len(rows), dtype=np.int64)
+    # Pool per build, chiuso all'uscita: i worker non sopravvivono alla build né
+    # restano attivi tra rerun e sessioni. Avviarli costa meno di un secondo,
+    # poco rispetto a una build da almeno SHARD_MIN_ROWS righe.
+    # spawn: il processo Streamlit ha thread attivi, fork non è sicuro
+    with ProcessPoolExecutor(len(parts), mp_context=mp.get_context("spawn")) as pool, \
+            tempfile.TemporaryDirectory(prefix="cashew-shards-", dir=SPILL_DIR) as tmp:
+        paths = [os.path.join(tmp, f"shard{i}.sqlite") for i in range(len(parts))]
+        futures = [pool.submit(build_shard, [list(c) for c in zip(*(rows[i] for i in part))], path)
+                   for part, path in zip(parts, paths)]
+        for part, future in zip(parts, futures):
+            date_ms[part] = future.result()
+        db.merge_transactions(paths)
+    return date_ms
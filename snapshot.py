@@ -0,0 +1,144 @@
+"""
+Salvataggio e ripresa di una migrazione.
+
+Lo snapshot è un singolo file Arrow IPC: le transazioni sono colonne
+(account/categoria/valuta con dictionary encoding, quindi compatte) e la
+configurazione (conti, struttura Cashew, mapping, regole) è JSON nei metadati dello
+schema. Gli importi sono interi in unità minori (amount_minor), come nel
+resto della pipeline; gli snapshot della versione 1 (importi float) vengono
+ancora letti e convertiti. Il file non è compresso di proposito: da disco viene letto con
+memory-map e dai bytes caricati senza copie, e resta leggibile da qualsiasi
+tool batch/headless con pyarrow (vedi read_snapshot_table).
+"""
+import json
+from typing import Dict, List, Tuple
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from models import WalletTransaction, AccountConfig, CashewConfig, PayeeRule, currency_decimals, to_minor
+
+SNAPSHOT_VERSION = 2
+SUPPORTED_VERSIONS = (1, 2)
+CONFIG_KEY = b"cashew_migrator.config"
+
+SCHEMA = pa.schema([
+    ("account", pa.dictionary(pa.int32(), pa.string())),
+    ("category", pa.dictionary(pa.int32(), pa.string())),
+    ("amount_minor", pa.int64()),
+    ("currency", pa.dictionary(pa.int32(), pa.string())),
+    ("note", pa.string()),
+    ("payee", pa.string()),
+    ("date", pa.string()),
+    ("is_transfer", pa.bool_()),
+])
+
+
+def _dict_column(values: list, field_type) -> pa.Array:
+    return pa.array(values, type=pa.string()).dictionary_encode().cast(field_type)
+
+
+def transactions_to_table(transactions: List[WalletTransaction]) -> pa.Table:
+    """Converte le transazioni in una tabella Arrow colonnare"""
+    return pa.Table.from_arrays([
+        _dict_column([t.account for t in transactions], SCHEMA.field("account").type),
+        _dict_column([t.category for t in transactions], SCHEMA.field("category").type),
+        pa.array([t.amount_minor for t in transactions], type=pa.int64()),
+        _dict_column([t.currency for t in transactions], SCHEMA.field("currency").type),
+        pa.array([t.note or "" for t in transactions], type=pa.string()),
+        pa.array([t.payee or "" for t in transactions], type=pa.string()),
+        pa.array([t.date_str for t in transactions], type=pa.string()),
+        pa.array([t.is_transfer for t in transactions], type=pa.bool_()),
+    ], schema=SCHEMA)
+
+
+def _column_values(col: pa.ChunkedArray) -> list:
+    """Colonna -> lista Python passando da numpy (to_pylist è ~50x più lento)"""
+    if pa.types.is_dictionary(col.type):
+        # Decodifica a mano: ogni valore distinto diventa un solo oggetto str condiviso
+        arr = col.combine_chunks()
+        dictionary = arr.dictionary.to_pylist()
+        return [dictionary[i] for i in arr.indices.to_numpy().tolist()]
+    return col.to_numpy().tolist()
+
+
+def table_to_transactions(table: pa.Table) -> List[WalletTransaction]:
+    """
+    Ricostruisce i modelli senza rivalidarli: i dati dello snapshot sono già
+    normalizzati, model_construct evita il costo della validazione pydantic.
+    """
+    cols = {name: _column_values(table.column(name)) for name in table.column_names}
+    if "amount_minor" not in cols:  # snapshot v1: importi float
+        cols["amount_minor"] = [to_minor(a, currency_decimals(c)) for a, c in zip(cols["amount"], cols["currency"])]
+    return [
+        WalletTransaction.model_construct(
+            account=account, category=category, amount_minor=amount_minor, currency=currency,
+            note=note, payee=payee, date_str=date_str, is_transfer=is_transfer,
+            temp_id=None, paired_with_idx=None,
+        )
+        for account, category, amount_minor, currency, note, payee, date_str, is_transfer in zip(
+            cols["account"], cols["category"], cols["amount_minor"], cols["currency"],
+            cols["note"], cols["payee"], cols["date"], cols["is_transfer"],
+        )
+    ]
+
+
+def save_snapshot(transactions: List[WalletTransaction], accounts: Dict[str, AccountConfig],
+                  cashew_struct: Dict, mapping: Dict[str, CashewConfig],
+                  output_format: str = "SQL", step: int = 1,
+                  rules: List[PayeeRule] = ()) -> bytes:
+    """Serializza lo stato della migrazione in un file Arrow IPC"""
+    config = {
+        "version": SNAPSHOT_VERSION,
+        "step": step,
+        "output_format": output_format,
+        "accounts": {k: v.model_dump() for k, v in accounts.items()},
+        "cashew_struct": cashew_struct,
+        "mapping": {k: v.model_dump() for k, v in mapping.items()},
+        "rules": [r.model_dump() for r in rules],
+    }
+    table = transactions_to_table(transactions)
+    table = table.replace_schema_metadata({CONFIG_KEY: json.dumps(config).encode()})
+
+    sink = pa.BufferOutputStream()
+    with ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def read_snapshot_table(source) -> Tuple[pa.Table, dict]:
+    """
+    Legge lo snapshot come tabella Arrow + config. `source` può essere un
+    percorso (letto in memory-map) oppure bytes/buffer (letto senza copie).
+    Punto d'ingresso per script batch che vogliono i dati senza Streamlit.
+    """
+    if isinstance(source, str):
+        buf = pa.memory_map(source, "r")
+    else:
+        buf = pa.py_buffer(source)
+    try:
+        table = ipc.open_file(buf).read_all()
+    except pa.ArrowInvalid as e:
+        raise ValueError(f"File di salvataggio non valido: {e}")
+
+    raw = (table.schema.metadata or {}).get(CONFIG_KEY)
+    if raw is None:
+        raise ValueError("File di salvataggio non valido: configurazione mancante.")
+    config = json.loads(raw)
+    if config.get("version") not in SUPPORTED_VERSIONS:
+        raise ValueError(f"Versione di salvataggio non supportata: {config.get('version')}")
+    return table, config
+
+
+def load_snapshot(source) -> dict:
+    """Ricostruisce lo stato della sessione da uno snapshot"""
+    table, config = read_snapshot_table(source)
+    return {
+        "step": config["step"],
+        "output_format": config["output_format"],
+        "transactions": table_to_transactions(table),
+        "accounts": {k: AccountConfig(**v) for k, v in config["accounts"].items()},
+        "cashew_struct": config["cashew_struct"],
+        "mapping": {k: CashewConfig(**v) for k, v in config["mapping"].items()},
+        "rules": [PayeeRule(**r) for r in config.get("rules", [])],
+    }
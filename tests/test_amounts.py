@@ -0,0 +1,30 @@
+import unittest
+from models import WalletTransaction, ProcessedTransaction, to_minor, from_minor
+
+def _tx(amount, currency="EUR"):
+    return WalletTransaction(account="A", category="X", amount=amount, currency=currency,
+                             date="2023-01-01 10:00:00")
+
+class TestAmounts(unittest.TestCase):
+    def test_parse_formats_to_minor_units(self):
+        self.assertEqual(_tx("-1.234,56").amount_minor, -123456)
+        self.assertEqual(_tx("1,234.56").amount_minor, 123456)
+        self.assertEqual(_tx(0.1).amount_minor, 10)
+        self.assertEqual(_tx("12", currency="JPY").amount_minor, 12)
+        self.assertEqual(_tx("1,5", currency="KWD").amount_minor, 1500)
+        self.assertAlmostEqual(_tx("-12,50").amount, -12.5)
+
+    def test_sums_are_exact(self):
+        # 0.1 sommato 10 volte in float non fa 1.0; in unità minori sì
+        self.assertNotEqual(sum([0.1] * 10), 1.0)
+        self.assertEqual(sum(_tx(0.1).amount_minor for _ in range(10)), to_minor("1"))
+        self.assertEqual(from_minor(100, 2), 1)
+
+    def test_processed_transaction_accepts_amount(self):
+        pt = ProcessedTransaction(id="t", date_ms=0, amount=-10.0, title="T", note="",
+                                  wallet_fk="w", category_fk="c", is_income=False)
+        self.assertEqual(pt.amount_minor, -1000)
+        self.assertEqual(pt.model_dump()["amount"], -10.0)
+
+if __name__ == '__main__':
+    unittest.main()
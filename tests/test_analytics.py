@@ -0,0 +1,39 @@
+import datetime
+import unittest
+from analytics import monthly_category_stats, suggest_limits, write_budget_suggestions
+from database import CashewDatabase
+from models import AccountConfig
+
+def ms(y, m, d=15):
+    return int(datetime.datetime(y, m, d).timestamp() * 1000)
+
+class TestAnalytics(unittest.TestCase):
+    def test_monthly_stats_count_empty_months_and_skip_transfers(self):
+        stats = monthly_category_stats(
+            [ms(2023, 1), ms(2023, 1), ms(2023, 3), ms(2023, 2), ms(2023, 2)],
+            [-1000, -2000, -6000, 50000, -99900],
+            ["Cibo", "Cibo", "Cibo", "Reddito", "Cibo"],
+            exclude=[False, False, False, False, True],
+        )
+        self.assertEqual(list(stats.index), ["Cibo"])
+        row = stats.loc["Cibo"]
+        self.assertEqual(row["mesi"], 3)  # gennaio, febbraio (a zero), marzo
+        self.assertAlmostEqual(row["totale"], 90.0)
+        self.assertAlmostEqual(row["media"], 30.0)
+        self.assertAlmostEqual(row["mediana"], 30.0)
+
+    def test_write_budget_suggestions(self):
+        db = CashewDatabase()
+        db.add_wallet("w1", AccountConfig(name_cashew="Banca"))
+        db.add_category("c1", "Cibo", "#111", "food.png")
+        stats = monthly_category_stats([ms(2023, 1), ms(2023, 2)], [-1200, -3100], ["Cibo", "Cibo"])
+        limits = suggest_limits(stats, "mediana")
+        self.assertEqual(limits, {"Cibo": 25.0})
+        written = write_budget_suggestions(db, limits, {"Cibo": "c1"}, "b1", "w1", today=datetime.date(2024, 5, 3))
+        self.assertEqual(written, 1)
+        self.assertEqual(db.conn.execute("SELECT amount, reoccurrence FROM budgets").fetchone(), (25.0, 3))
+        self.assertEqual(db.conn.execute("SELECT category_fk, amount FROM category_budget_limits").fetchone(), ("c1", 25.0))
+        self.assertEqual(db.conn.execute("PRAGMA foreign_key_check").fetchall(), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+import copy
+import multiprocessing
+import os
+import tempfile
+import unittest
+from unittest import mock
+import builder as builder_module
+from builder import MigrationBuilder
+from models import AccountConfig, CashewConfig, PayeeRule, WalletTransaction
+
+STRUCT = {
+    "Cibo": {"color": "#111", "icon": "food.png", "subs": ["Bar", "Spesa"]},
+    "Casa": {"color": "#222", "icon": "home.png", "subs": []},
+    "Altro": {"color": "#333", "icon": "other.png", "subs": []},
+}
+
+def _tx(cat, amount, payee="", transfer=False, account="Banca", day=1):
+    return WalletTransaction(account=account, category=cat, amount=amount, payee=payee,
+                             date=f"2023-01-{day:02d} 10:00:00", is_transfer=transfer)
+
+def _content(db):
+    """Contenuto confrontabile, indipendente dagli uuid"""
+    return sorted(db.conn.execute("""
+        SELECT t.name, t.amount, c.name, s.name FROM transactions t
+        LEFT JOIN categories c ON c.category_pk = t.category_fk
+        LEFT JOIN categories s ON s.category_pk = t.sub_category_fk
+    """).fetchall(), key=repr)
+
+class TestBuilder(unittest.TestCase):
+    def setUp(self):
+        self.ts = [_tx("Food", -10.0), _tx("Food", -5.0, payee="Esselunga"), _tx("Rent", -700.0),
+                   _tx("Misc", -3.0, payee="Conad"), _tx("Transfer", -50.0, transfer=True),
+                   _tx("Transfer", 50.0, transfer=True, account="Risparmi")]
+        self.accounts = {"Banca": AccountConfig(name_cashew="Banca"), "Risparmi": AccountConfig(name_cashew="Risparmi")}
+        self.struct = copy.deepcopy(STRUCT)
+        self.mapping = {"Food": CashewConfig(main_category="Cibo", sub_category="Bar"),
+                        "Rent": CashewConfig(main_category="Casa")}
+        self.rules = [PayeeRule(pattern="conad", main_category="Cibo", sub_category="Spesa")]
+        self.payees = {"Esselunga": "Esselunga", "Conad": "Conad"}
+
+    def _sync(self, builder):
+        return builder.sync(self.ts, self.accounts, self.struct, self.mapping, self.rules, self.payees)
+
+    def _rebuilt(self):
+        fresh = MigrationBuilder()
+        self._sync(fresh)
+        return fresh
+
+    def test_migration_with_transfers_passes_integrity_checks(self):
+        checks = self._rebuilt().verify()
+        self.assertTrue(all(c.passed for c in checks), [c for c in checks if not c.passed])
+
+    def test_balances_use_each_transaction_currency(self):
+        from logic import account_currencies
+        ts = [WalletTransaction(account="Tokyo", category="Food", currency="JPY", amount=-1500,
+                                date="2023-01-01 10:00:00"),
+              WalletTransaction(account="Misto", category="Food", currency="JPY", amount=-300,
+                                date="2023-01-02 10:00:00"),
+              _tx("Food", -2.5, account="Misto")]
+        accounts = {acc: AccountConfig(name_cashew=acc, currency=cur) for acc, cur in account_currencies(ts).items()}
+        self.assertEqual(accounts["Tokyo"].currency, "JPY")
+        b = MigrationBuilder()
+        b.sync(ts, accounts, self.struct, self.mapping, [], {})
+        balance = next(c for c in b.verify() if c.name.startswith("Saldi"))
+        self.assertTrue(balance.passed, balance.details)
+
+    def test_mapping_change_is_a_delta_on_affected_rows(self):
+        b = MigrationBuilder()
+        self.assertEqual(self._sync(b), "full")
+        self.assertEqual(self._sync(b), "none")
+        self.mapping["Food"] = CashewConfig(main_category="Casa")
+        self.assertEqual(self._sync(b), "delta")
+        self.assertEqual(b.rows_touched, 2)
+        self.assertEqual(b.categories_touched, 0)
+        self.assertEqual(_content(b.db), _content(self._rebuilt().db))
+        self.assertEqual(sorted(b.main_category_names()), sorted(self._rebuilt().main_category_names()))
+
+    def test_structure_change_touches_categories_only(self):
+        b = MigrationBuilder()
+        self._sync(b)
+        self.struct["Casa"]["color"] = "#999"
+        self.struct["Svago"] = {"color": "#444", "icon": "fun.png", "subs": ["Cinema"]}
+        self.assertEqual(self._sync(b), "delta")
+        self.assertEqual((b.rows_touched, b.categories_touched), (0, 3))
+        self.assertEqual(b.db.conn.execute("SELECT colour FROM categories WHERE name = 'Casa'").fetchone(), ("#999",))
+
+        # Rimuovere la sottocategoria mappata riassegna solo le sue transazioni
+        self.struct["Cibo"]["subs"].remove("Bar")
+        self._sync(b)
+        self.assertEqual((b.rows_touched, b.categories_touched), (2, 1))
+        self.assertEqual(_content(b.db), _content(self._rebuilt().db))
+        self.assertEqual(b.db.conn.execute("PRAGMA foreign_key_check").fetchall(),
+                         self._rebuilt().db.conn.execute("PRAGMA foreign_key_check").fetchall())
+
+    def test_rules_or_accounts_change_rebuilds(self):
+        b = MigrationBuilder()
+        self._sync(b)
+        self.rules = []
+        self.assertEqual(self._sync(b), "full")
+        self.accounts["Banca"] = AccountConfig(name_cashew="Banca", currency="USD")
+        self.assertEqual(self._sync(b), "full")
+
+    def test_source_index_survives_spill_to_disk(self):
+        b = MigrationBuilder()
+        self._sync(b)
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            b.db.move_to_disk(path)
+            self.mapping["Rent"] = CashewConfig(main_category="Altro")
+            self._sync(b)
+            self.assertEqual(b.rows_touched, 1)
+            self.assertEqual(_content(b.db), _content(self._rebuilt().db))
+        finally:
+            b.db.conn.close()
+            os.remove(path)
+
+class TestShardedBuild(unittest.TestCase):
+    setUp, _sync, _rebuilt = TestBuilder.setUp, TestBuilder._sync, TestBuilder._rebuilt
+
+    def _pairs(self, db):
+        return db.conn.execute('''
+            SELECT w1.name, w2.name FROM transactions t
+            JOIN transactions p ON p.transaction_pk = t.paired_transaction_fk
+                               AND p.paired_transaction_fk = t.transaction_pk
+            JOIN wallets w1 ON w1.wallet_pk = t.wallet_fk
+            JOIN wallets w2 ON w2.wallet_pk = p.wallet_fk
+            ORDER BY w1.name''').fetchall()
+
+    def test_sharded_build_matches_serial(self):
+        serial = self._rebuilt()
+        for by in ("wallet", "time"):
+            with mock.patch.object(builder_module, "SHARD_MIN_ROWS", 0):
+                sharded = MigrationBuilder(shards=2, partition=by)
+                self._sync(sharded)
+            self.assertEqual(sharded.shards_used, 2)
+            self.assertEqual(_content(sharded.db), _content(serial.db))
+            self.assertEqual(sorted(sharded.date_ms), sorted(serial.date_ms))
+            # Per conto i due lati del trasferimento finiscono in shard diversi
+            self.assertEqual(self._pairs(sharded.db), [("Banca", "Risparmi"), ("Risparmi", "Banca")])
+            pair_check = next(c for c in sharded.verify() if c.name.startswith("Trasferimenti"))
+            self.assertTrue(pair_check.passed)
+            # I worker vengono chiusi a fine build, non restano tra rerun e sessioni
+            self.assertEqual(multiprocessing.active_children(), [])
+
+    def test_delta_after_sharded_build(self):
+        with mock.patch.object(builder_module, "SHARD_MIN_ROWS", 0):
+            sharded = MigrationBuilder(shards=2)
+            self._sync(sharded)
+        self.mapping["Food"] = CashewConfig(main_category="Casa")
+        self.assertEqual(self._sync(sharded), "delta")
+        self.assertEqual(_content(sharded.db), _content(self._rebuilt().db))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import bz2
+import gzip
+import io
+import lzma
+import unittest
+import zipfile
+from compression import detect_compression, open_source_streams
+from logic import parse_csv_to_models, parse_upload
+
+CSV = (
+    "account;category;currency;amount;date;transfer;note;payee\n"
+    "Banca;Cibo;EUR;-12,50;2023-01-01 10:00:00;false;pranzo;Bar\n"
+    "Banca;Stipendio;EUR;1500;2023-01-02 10:00:00;false;;\n"
+).encode()
+
+class OneWayStream(io.RawIOBase):
+    """Stream non riavvolgibile, come una decompressione"""
+    def __init__(self, data):
+        self._buf = io.BytesIO(data)
+    def readable(self):
+        return True
+    def seekable(self):
+        return False
+    def readinto(self, b):
+        return self._buf.readinto(b)
+
+def _zip(members):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return buf.getvalue()
+
+class TestCompression(unittest.TestCase):
+    def test_detect_by_magic_bytes(self):
+        self.assertEqual(detect_compression(gzip.compress(CSV)), "gzip")
+        self.assertEqual(detect_compression(lzma.compress(CSV)), "xz")
+        self.assertEqual(detect_compression(bz2.compress(CSV)), "bz2")
+        self.assertEqual(detect_compression(_zip({"a.csv": CSV})), "zip")
+        self.assertIsNone(detect_compression(CSV))
+
+    def test_compressed_uploads_parse_like_plain(self):
+        expected = [t.model_dump() for t in parse_upload(io.BytesIO(CSV))]
+        self.assertEqual(len(expected), 2)
+        for data in (gzip.compress(CSV), lzma.compress(CSV), bz2.compress(CSV)):
+            self.assertEqual([t.model_dump() for t in parse_upload(io.BytesIO(data))], expected)
+
+    def test_zip_with_several_csv(self):
+        data = _zip({"b.csv": CSV, "a.csv": CSV, "__MACOSX/._a.csv": b"junk", "leggimi.md": b"x"})
+        self.assertEqual([name for name, _ in open_source_streams(io.BytesIO(data))], ["a.csv", "b.csv"])
+        self.assertEqual(len(parse_upload(io.BytesIO(data))), 4)
+
+    def test_non_seekable_stream_and_comma_separator(self):
+        comma = CSV.replace(b";", b",").replace(b"-12,50", b"-12.50")
+        ts = parse_csv_to_models(io.BufferedReader(OneWayStream(comma)))
+        self.assertEqual([t.amount_minor for t in ts], [-1250, 150000])
+        ts = parse_upload(io.BufferedReader(OneWayStream(gzip.compress(CSV))))
+        self.assertEqual(len(ts), 2)
+
+if __name__ == '__main__':
+    unittest.main()
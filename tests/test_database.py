@@ -0,0 +1,97 @@
+import sqlite3
+import tempfile
+import unittest
+from database import CashewDatabase, RESTORE_INDEXES, TRANSFER_NAME, schema_differences
+from models import AccountConfig, ProcessedTransaction
+
+class TestVerify(unittest.TestCase):
+    def setUp(self):
+        self.db = CashewDatabase()
+        self.db.add_wallet("w1", AccountConfig(name_cashew="Banca"))
+        self.db.add_category("c1", "Cibo", "#111", "food.png")
+        self.db.add_category("s1", "Bar", None, None, parent_pk="c1")
+
+    def _tx(self, pk, amount, **kw):
+        data = dict(id=pk, date_ms=1700000000000, amount=amount, title="T", note="",
+                    wallet_fk="w1", category_fk="c1", is_income=amount > 0)
+        data.update(kw)
+        self.db.add_transaction(ProcessedTransaction(**data))
+
+    def test_clean_database_passes(self):
+        self._tx("t1", -10.0, sub_category_fk="s1", paired_id="t2")
+        self._tx("t2", 10.0, paired_id="t1")
+        checks = self.db.verify({"w1": 0})
+        self.assertTrue(all(c.passed for c in checks), [c for c in checks if not c.passed])
+
+    def test_transfer_system_category_is_not_an_orphan(self):
+        self._tx("t1", -10.0, category_fk="0", paired_id="t2", title=TRANSFER_NAME)
+        self._tx("t2", 10.0, category_fk="0", paired_id="t1", title=TRANSFER_NAME)
+        checks = self.db.verify({"w1": 0})
+        self.assertTrue(all(c.passed for c in checks), [c for c in checks if not c.passed])
+        # L'esenzione vale solo per i trasferimenti: "0" come ripiego di una categoria
+        # mancante, o come sottocategoria, resta un orfano
+        self._tx("t3", -1.0, category_fk="missing")
+        self._tx("t4", -1.0, category_fk="0")
+        self._tx("t5", -1.0, sub_category_fk="0")
+        failed = {c.name: c for c in self.db.verify() if not c.passed}
+        self.assertEqual(failed["Foreign key"].issues, 3)
+        self.assertEqual(sorted(failed["Transazioni con category_fk orfano"].details),
+                         ["'0': 1 righe", "'missing': 1 righe"])
+        self.assertEqual(failed["Transazioni con sub_category_fk orfano"].issues, 1)
+
+    def test_detects_orphans_pairs_and_balances(self):
+        self._tx("t1", -10.0, category_fk="missing", paired_id="t2")
+        self._tx("t2", 10.0)
+        failed = {c.name: c for c in self.db.verify({"w1": 500}) if not c.passed}
+        self.assertEqual(failed["Transazioni con category_fk orfano"].issues, 1)
+        self.assertEqual(failed["Trasferimenti non simmetrici (paired_transaction_fk)"].issues, 1)
+        self.assertIn("Saldi per conto vs CSV sorgente", failed)
+        self.assertIn("Foreign key", failed)
+
+class TestRestoreExport(unittest.TestCase):
+    def setUp(self):
+        self.db = CashewDatabase()
+        self.db.add_wallet("w1", AccountConfig(name_cashew="Banca"))
+        self.db.add_category("c1", "Cibo", "#111", "food.png")
+        for i in range(50):
+            self.db.add_transaction(ProcessedTransaction(
+                id=f"t{i}", date_ms=1700000000000 + i, amount=-1.0, title="T", note="",
+                wallet_fk="w1", category_fk="c1", is_income=False))
+        # Righe cancellate: pagine libere che il VACUUM deve eliminare
+        self.db.cursor.execute("DELETE FROM transactions WHERE transaction_pk > 't2'")
+
+    def _open(self, data):
+        tmp = tempfile.NamedTemporaryFile(suffix=".sqlite")
+        self.addCleanup(tmp.close)
+        tmp.write(data)
+        tmp.flush()
+        conn = sqlite3.connect(tmp.name)
+        self.addCleanup(conn.close)
+        return conn
+
+    def test_finalized_file_matches_reference(self):
+        data, report = self.db.get_restore_sqlite()
+        conn = self._open(data)
+        self.assertEqual(report.schema_issues, [])
+        self.assertEqual(schema_differences(conn), [])
+        self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], 46)
+        self.assertEqual(conn.execute("PRAGMA page_size").fetchone()[0], 4096)
+        self.assertEqual(conn.execute("PRAGMA freelist_count").fetchone()[0], 0)
+        self.assertEqual(report.size_after, len(data))
+        indexes = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertTrue({name for name, _ in RESTORE_INDEXES} <= indexes)
+        self.assertTrue(conn.execute("SELECT COUNT(*) FROM sqlite_stat1").fetchone()[0] > 0)
+        count = "SELECT COUNT(*) FROM transactions"
+        self.assertEqual(conn.execute(count).fetchone(), self.db.conn.execute(count).fetchone())
+
+    def test_working_db_is_untouched(self):
+        self.db.get_restore_sqlite()
+        self.assertIsNone(self.db.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name LIKE 'migrator_%'").fetchone())
+
+    def test_unexpected_index_is_reported(self):
+        self.db.cursor.execute("CREATE INDEX extra_idx ON transactions (name)")
+        self.assertEqual(schema_differences(self.db.conn), ["Indice non previsto: extra_idx"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,18 @@
+import unittest
+from payees import cluster_payees, normalize_payee
+
+class TestPayees(unittest.TestCase):
+    def test_normalize(self):
+        self.assertEqual(normalize_payee("ESSELUNGA S.p.A. 0231"), "esselunga")
+        self.assertEqual(normalize_payee("Caffè Nero"), "caffe nero")
+
+    def test_variants_share_most_frequent_spelling(self):
+        payees = ["Amazon.it"] * 3 + ["AMAZON EU SARL", "AMZN Mktp", "Esselunga", "ESSELUNGA SPA", "", "Eni", "Enel"]
+        mapping = cluster_payees(payees)
+        self.assertEqual({mapping[p] for p in ["Amazon.it", "AMAZON EU SARL", "AMZN Mktp"]}, {"Amazon.it"})
+        self.assertEqual(mapping["ESSELUNGA SPA"], "Esselunga")
+        self.assertEqual((mapping["Eni"], mapping["Enel"]), ("Eni", "Enel"))
+        self.assertNotIn("", mapping)
+
+if __name__ == '__main__':
+    unittest.main()
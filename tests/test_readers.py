@@ -0,0 +1,140 @@
+import io
+import unittest
+from logic import detect_transfers, parse_upload
+from readers import DETECT_BYTES, detect_reader
+from readers.base import BATCH_SIZE
+from readers.qif import parse_qif_date
+from benchmarks.synthetic import bank_csv_bytes, ofx_bytes, qif_bytes, wallet_csv_bytes
+
+OFX = b"""OFXHEADER:100
+DATA:OFXSGML
+CHARSET:1252
+
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><CURDEF>EUR
+<BANKACCTFROM><BANKID>1<ACCTID>IT60X123<ACCTTYPE>CHECKING</BANKACCTFROM>
+<BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20231231120000.000[-5:EST]<TRNAMT>-12.50<FITID>1<NAME>Caff\xe8 Bar<MEMO>colazione</STMTTRN>
+<STMTTRN><TRNTYPE>XFER<DTPOSTED>20240102<TRNAMT>100<FITID>2<NAME>Giroconto</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+OFX_XML = b"""<?xml version="1.0" encoding="UTF-8"?>
+<?OFX OFXHEADER="200" VERSION="220"?>
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><CURDEF>USD</CURDEF>
+<BANKACCTFROM><ACCTID>9876</ACCTID></BANKACCTFROM><BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT</TRNTYPE><DTPOSTED>20230105</DTPOSTED><TRNAMT>-3.20</TRNAMT><NAME>Caf\xc3\xa8</NAME></STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+QIF = b"""!Account
+NConto Casa
+TBank
+^
+!Type:Bank
+D12/31'23
+T-1,234.56
+PEsselunga
+MSpesa
+LFood:Groceries
+SFood
+$-1,000.00
+SHome
+$-234.56
+^
+D1/ 2'24
+T100.00
+L[Risparmi]
+^
+"""
+
+BANK = """Estratto conto;;;;
+Intestatario: Mario;;;;
+Data operazione;Valuta;Descrizione;Dare;Avere
+31/12/2023;31/12/2023;POS Caffè;12,50;
+02/01/2024;02/01/2024;Stipendio;;1.500,00
+""".encode("cp1252")
+
+
+def _summary(ts):
+    return [(t.account, t.category, t.amount_minor, t.date_str, t.payee, t.note, t.is_transfer) for t in ts]
+
+
+class TestReaders(unittest.TestCase):
+    def test_detection_from_prefix(self):
+        for data, name in ((OFX, "ofx"), (OFX_XML, "ofx"), (QIF, "qif"), (BANK, "bank_csv"),
+                           (wallet_csv_bytes(3), "wallet_csv")):
+            self.assertEqual(detect_reader(data[:DETECT_BYTES]).name, name)
+        self.assertIsNone(detect_reader(b"just some text\nwithout a header\n"))
+        with self.assertRaises(ValueError):
+            parse_upload(io.BytesIO(b"just some text\n"))
+
+    def test_ofx_sgml_and_xml(self):
+        self.assertEqual(_summary(parse_upload(io.BytesIO(OFX))), [
+            ("IT60X123", "Uncategorized", -1250, "2023-12-31 12:00:00", "Caffè Bar", "colazione", False),
+            ("IT60X123", "Transfer", 10000, "2024-01-02 00:00:00", "Giroconto", "", True),
+        ])
+        (t,) = parse_upload(io.BytesIO(OFX_XML))
+        self.assertEqual((t.account, t.currency, t.amount_minor, t.payee), ("9876", "USD", -320, "Cafè"))
+
+    def test_ofx_transfer_destination_does_not_change_account(self):
+        xfer = OFX.replace(b"<NAME>Giroconto</STMTTRN>",
+                           b"<NAME>Giroconto<BANKACCTTO><BANKID>1<ACCTID>SAV002<ACCTTYPE>SAVINGS</BANKACCTTO></STMTTRN>"
+                           b"\n<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240103<TRNAMT>-1<NAME>Edicola</STMTTRN>")
+        self.assertEqual([t.account for t in parse_upload(io.BytesIO(xfer))], ["IT60X123"] * 3)
+
+    def test_qif_uses_total_and_detects_transfers(self):
+        self.assertEqual(_summary(parse_upload(io.BytesIO(QIF))), [
+            ("Conto Casa", "Food:Groceries", -123456, "2023-12-31 00:00:00", "Esselunga", "Spesa", False),
+            ("Conto Casa", "Transfer", 10000, "2024-01-02 00:00:00", "", "", True),
+        ])
+        self.assertEqual(parse_qif_date("31.12.2023"), "2023-12-31 00:00:00")
+        self.assertEqual(parse_qif_date("2023-02-30"), "")
+
+    def test_bank_csv_with_preamble_and_debit_credit(self):
+        self.assertEqual(_summary(parse_upload(io.BytesIO(BANK))), [
+            ("Conto importato", "Uncategorized", -1250, "2023-12-31 00:00:00", "", "POS Caffè", False),
+            ("Conto importato", "Uncategorized", 150000, "2024-01-02 00:00:00", "", "Stipendio", False),
+        ])
+
+    def test_synthetic_files_stream_in_batches(self):
+        for make in (ofx_bytes, qif_bytes, bank_csv_bytes):
+            ts = parse_upload(io.BytesIO(make(BATCH_SIZE + 5)))
+            self.assertEqual(len(ts), BATCH_SIZE + 5, make.__name__)
+        # I trasferimenti QIF/OFX entrano nel pairing come quelli di Wallet
+        ts = detect_transfers(parse_upload(io.BytesIO(OFX)) + [
+            t.model_copy(update={"account": "Risparmi", "amount_minor": -10000})
+            for t in parse_upload(io.BytesIO(OFX)) if t.is_transfer
+        ])
+        self.assertEqual(ts[1].paired_with_idx, 2)
+
+    def _rejects(self, data):
+        rejects = []
+        ts = parse_upload(io.BytesIO(data), rejects)
+        return ts, [(r.row, r.column, r.reason) for r in rejects]
+
+    def test_ofx_bad_rows_are_rejected(self):
+        bad = OFX.replace(b"<TRNAMT>-12.50", b"<TRNAMT>n/d").replace(b"20240102", b"2024")
+        ts, rejects = self._rejects(bad)
+        self.assertEqual(ts, [])
+        self.assertEqual(rejects, [(1, "amount", "importo non numerico"), (2, "date", "data mancante o non valida")])
+
+    def test_qif_bad_rows_are_rejected(self):
+        ts, rejects = self._rejects(QIF.replace(b"D1/ 2'24", b"D31/31/24"))
+        self.assertEqual(len(ts), 1)
+        self.assertEqual(rejects, [(16, "date", "data mancante o non valida")])
+        ts, rejects = self._rejects(QIF.replace(b"T100.00", b"Tcento"))
+        self.assertEqual(rejects, [(16, "amount", "importo non numerico")])
+
+    def test_bank_csv_bad_rows_are_rejected(self):
+        bad = BANK + "totale;;;abc;\n;;Saldo finale;;\n".encode("cp1252")
+        ts, rejects = self._rejects(bad)
+        self.assertEqual(len(ts), 2)
+        self.assertEqual(rejects, [(6, "date", "data mancante o non valida"),
+                                   (7, "date", "data mancante o non valida")])
+        ts, rejects = self._rejects(BANK.replace(b"12,50", b"dodici"))
+        self.assertEqual(len(ts), 1)
+        self.assertEqual(rejects, [(4, "amount", "importo non numerico")])
+
+
+if __name__ == '__main__':
+    unittest.main()
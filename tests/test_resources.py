@@ -0,0 +1,42 @@
+import unittest
+from logic import parse_upload_cached
+from resources import ContentCache, PARSE_CACHE
+
+CSV = (
+    "account;category;currency;amount;date;transfer;note;payee\n"
+    "Banca;Cibo;EUR;-12,50;2023-01-01 10:00:00;false;pranzo;Bar\n"
+    "Banca;Stipendio;EUR;1500;2023-01-02 10:00:00;false;;\n"
+).encode()
+
+class TestContentCache(unittest.TestCase):
+    def test_same_content_parsed_once(self):
+        cache = ContentCache(max_bytes=1024 * 1024)
+        calls = []
+        compute = lambda: calls.append(1) or ("parsed",)
+        cache.get_or_compute(b"abc", ("opt",), compute)
+        cache.get_or_compute(b"abc", ("opt",), compute)
+        cache.get_or_compute(b"abc", ("other",), compute)
+        self.assertEqual(len(calls), 2)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+
+    def test_lru_eviction_by_size(self):
+        cache = ContentCache(max_bytes=100)
+        for i in range(3):
+            cache.get_or_compute(str(i).encode(), (), lambda: i, sizeof=lambda v: 40)
+        stats = cache.stats()
+        self.assertEqual(stats["entries"], 2)
+        self.assertEqual(stats["evictions"], 1)
+        self.assertLessEqual(stats["bytes"], 100)
+
+    def test_parse_upload_returns_independent_copies(self):
+        PARSE_CACHE.clear()
+        first = parse_upload_cached(CSV)
+        first[0].paired_with_idx = 1
+        second = parse_upload_cached(CSV)
+        self.assertEqual(len(second), 2)
+        self.assertIsNone(second[0].paired_with_idx)
+        self.assertEqual(PARSE_CACHE.stats()["hits"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+from models import PayeeRule, WalletTransaction
+from rules import AhoCorasick, RuleMatcher, apply_rules, associated_titles, validate_rules
+
+def tx(payee="", note=""):
+    return WalletTransaction(account="A", category="X", amount=-1.0, note=note, payee=payee,
+                             date="2023-01-01 10:00:00")
+
+class TestRules(unittest.TestCase):
+    def test_automaton_returns_lowest_rule_index(self):
+        ac = AhoCorasick([("he", 1), ("she", 0), ("hers", 2), ("his", 3)])
+        self.assertEqual(ac.first_match("USHERS"), 0)
+        self.assertEqual(ac.first_match("this"), 3)
+        self.assertIsNone(ac.first_match("nothing here"[:7]))
+
+    def test_first_rule_wins_across_fields_and_kinds(self):
+        rules = [
+            PayeeRule(pattern=r"amzn|amazon", is_regex=True, field="payee", main_category="Shopping"),
+            PayeeRule(pattern="conad", field="any", main_category="Alimentari", sub_category="Supermercato"),
+            PayeeRule(pattern="cena", field="note", main_category="Ristorazione"),
+        ]
+        ts = [tx(payee="AMZN Mktp"), tx(payee="Conad City", note="cena"), tx(note="Cena fuori"),
+              tx(payee="cena"), tx(payee="Esselunga")]
+        self.assertEqual(apply_rules(ts, rules), [0, 1, 2, None, None])
+
+    def test_associated_titles(self):
+        rules = [
+            PayeeRule(pattern="Conad", main_category="Alimentari"),
+            PayeeRule(pattern=r"^amz", is_regex=True, field="payee", main_category="Shopping"),
+        ]
+        ts = [tx(payee="AMZN Mktp"), tx(payee="amzn mktp"), tx(payee="Conad")]
+        titles = associated_titles(rules, ts, apply_rules(ts, rules))
+        self.assertEqual(titles, [("Conad", 0, False), ("AMZN Mktp", 1, True)])
+
+    def test_invalid_regex_is_reported(self):
+        rules, errors = validate_rules([PayeeRule(pattern="(", is_regex=True, main_category="X"),
+                                        PayeeRule(pattern="  ", main_category="X")])
+        self.assertEqual(rules, [])
+        self.assertEqual(len(errors), 1)
+
+    def test_inline_flags_do_not_break_combined_regexes(self):
+        rules, errors = validate_rules([
+            PayeeRule(pattern=r"^amz", is_regex=True, main_category="Shopping"),
+            PayeeRule(pattern=r"(?i)bar\b", is_regex=True, main_category="Ristorazione"),
+            PayeeRule(pattern=r"(?P<x>a)(?P=x)", is_regex=True, main_category="X"),
+            PayeeRule(pattern=r"(?P<x>z)z", is_regex=True, main_category="Y"),
+        ])
+        self.assertEqual((len(rules), errors), (4, []))
+        self.assertIsNone(RuleMatcher(tuple((r.pattern, True, r.field) for r in rules)).prefilter["payee"])
+        ts = [tx(payee="AMZN Mktp"), tx(payee="BAR Centrale"), tx(payee="xaa"), tx(payee="zz"), tx(payee="Conad")]
+        self.assertEqual(apply_rules(ts, rules), [0, 1, 2, 3, None])
+
+    def test_backreference_rule_is_not_skipped(self):
+        rules = [PayeeRule(pattern=r"^x", is_regex=True, main_category="X"),
+                 PayeeRule(pattern=r"(\w)\1{2}", is_regex=True, main_category="Triple")]
+        self.assertEqual(apply_rules([tx(payee="Caffè 777"), tx(payee="xyz"), tx(payee="abc")], rules),
+                         [1, 0, None])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import gc
+import os
+import tempfile
+import unittest
+from database import CashewDatabase
+from models import AccountConfig
+from session_memory import SessionArtifacts, memory_report
+
+class TestSessionArtifacts(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def test_spills_largest_artifact_over_budget(self):
+        art = SessionArtifacts("s-spill", budget_bytes=1500, spill_dir=self.dir)
+        art.put("small", b"x" * 500)
+        art.put("big", b"y" * 1200)
+        stats = art.stats()
+        self.assertTrue(stats["artifacts"]["big"]["on_disk"])
+        self.assertFalse(stats["artifacts"]["small"]["on_disk"])
+        self.assertLessEqual(stats["memory_bytes"], 1500)
+        self.assertEqual(art.get("big"), b"y" * 1200)
+        self.assertIn("s-spill", memory_report()["sessions"])
+
+    def test_database_moved_to_disk_stays_usable(self):
+        db = CashewDatabase()
+        db.add_wallet("w1", AccountConfig(name_cashew="Banca"))
+        art = SessionArtifacts("s-db", budget_bytes=0, spill_dir=self.dir)
+        art.put("db", db)
+        self.assertIsNotNone(db.path)
+        self.assertEqual(db.memory_bytes(), 0)
+        self.assertEqual(db.conn.execute("SELECT name FROM wallets").fetchone(), ("Banca",))
+        art.release()
+        self.assertFalse(os.path.exists(db.path))
+
+    def test_files_removed_when_session_is_collected(self):
+        art = SessionArtifacts("s-gc", budget_bytes=0, spill_dir=self.dir)
+        art.put("export", b"z" * 100)
+        del art
+        gc.collect()
+        self.assertEqual(os.listdir(self.dir), [])
+        self.assertNotIn("s-gc", memory_report()["sessions"])
+
+if __name__ == '__main__':
+    unittest.main()
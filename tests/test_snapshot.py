@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from models import WalletTransaction, AccountConfig, CashewConfig
+from snapshot import save_snapshot, load_snapshot, read_snapshot_table
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.ts = [
+            WalletTransaction(account="AccA", category="Cibo", amount=-12.5, currency="EUR",
+                              note="pranzo", payee="Bar", date="2023-01-01 10:00:00"),
+            WalletTransaction(account="AccB", category="Transfer", amount=100.0, currency="EUR",
+                              date="2023-01-02 10:00:00", is_transfer=True),
+        ]
+        self.struct = {"Alimentari": {"subs": ["Bar"], "color": "#4CAF50", "icon": "groceries.png"}}
+        self.mapping = {"Cibo": CashewConfig(main_category="Alimentari", sub_category="Bar")}
+        self.accounts = {"AccA": AccountConfig(name_cashew="Banca")}
+
+    def test_roundtrip_from_bytes(self):
+        data = save_snapshot(self.ts, self.accounts, self.struct, self.mapping, "CSV", step=3)
+        state = load_snapshot(data)
+        self.assertEqual(state["step"], 3)
+        self.assertEqual(state["output_format"], "CSV")
+        self.assertEqual(state["cashew_struct"], self.struct)
+        self.assertEqual(state["mapping"]["Cibo"].sub_category, "Bar")
+        self.assertEqual(state["accounts"]["AccA"].name_cashew, "Banca")
+        self.assertEqual([t.model_dump() for t in state["transactions"]],
+                         [t.model_dump() for t in self.ts])
+
+    def test_memory_mapped_table(self):
+        data = save_snapshot(self.ts, self.accounts, self.struct, self.mapping)
+        with tempfile.NamedTemporaryFile(suffix=".arrow", delete=False) as f:
+            f.write(data)
+        try:
+            table, config = read_snapshot_table(f.name)
+            self.assertEqual(table.num_rows, 2)
+            self.assertEqual(table.column("amount_minor").to_pylist(), [-1250, 10000])
+            self.assertIn("Alimentari", config["cashew_struct"])
+        finally:
+            os.remove(f.name)
+
+    def test_invalid_file(self):
+        with self.assertRaises(ValueError):
+            load_snapshot(b"not an arrow file")
+
+    def test_save_button_callable_without_session(self):
+        # Streamlit esegue il callable del download in un thread senza sessione
+        from ui import save_resume
+        fake_st = mock.MagicMock()
+        fake_st.session_state = SimpleNamespace(
+            transactions=self.ts, accounts=self.accounts, cashew_struct=self.struct,
+            mapping=self.mapping, output_format="CSV", rules=[],
+        )
+        with mock.patch.object(save_resume, "st", fake_st):
+            save_resume.render_save_button(4)
+            fake_st.session_state = SimpleNamespace()
+        build = fake_st.download_button.call_args.args[1]
+        state = load_snapshot(build())
+        self.assertEqual(state["step"], 4)
+        self.assertEqual(state["output_format"], "CSV")
+        self.assertEqual(len(state["transactions"]), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import io
+import unittest
+from logic import detect_transfers, parse_csv_to_models, parse_upload, parse_upload_cached
+from models import WalletTransaction
+from benchmarks.synthetic import dirty_wallet_csv_bytes
+
+CSV = """account;category;currency;amount;note;date;transfer;payee
+Banca;Cibo;EUR;-12,50;;2024-01-05 10:00:00;false;Bar
+;Cibo;EUR;-1,00;;2024-01-05 10:00:00;false;
+Banca;;EUR;-1,00;;2024-01-05 10:00:00;false;
+Banca;Cibo;EUR;n/d;;2024-01-05 10:00:00;false;
+Banca;Cibo;EUR;-1,00;;05/01/2024;false;
+Banca;Cibo;;-1,00;;2024-01-05 10:00:00;false;
+Banca;Cibo;JPY;1.234,00;x;2024-01-06 10:00:00;true;
+Banca;Cibo;USD;"1,234.565";;2024-01-07 10:00:00;false;
+""".encode()
+
+
+class TestValidation(unittest.TestCase):
+    def test_bad_rows_are_reported_not_dropped(self):
+        rejects = []
+        ts = parse_csv_to_models(io.BytesIO(CSV), rejects)
+        self.assertEqual([(r.row, r.column) for r in rejects],
+                         [(3, "account"), (4, "category"), (5, "amount"), (6, "date"), (7, "currency")])
+        self.assertEqual(rejects[2].reason, "importo non numerico")
+        self.assertEqual(len(ts), 3)
+
+    def test_valid_rows_match_model_validation(self):
+        ts = parse_csv_to_models(io.BytesIO(CSV))
+        expected = [
+            WalletTransaction(account="Banca", category="Cibo", currency="EUR", amount="-12,50",
+                              note="", payee="Bar", date="2024-01-05 10:00:00"),
+            WalletTransaction(account="Banca", category="Cibo", currency="JPY", amount="1.234,00",
+                              note="x", payee="", date="2024-01-06 10:00:00", is_transfer=True),
+            WalletTransaction(account="Banca", category="Cibo", currency="USD", amount="1,234.565",
+                              note="", payee="", date="2024-01-07 10:00:00"),
+        ]
+        self.assertEqual([t.model_dump() for t in ts], [t.model_dump() for t in expected])
+        self.assertEqual(ts[2].amount_minor, 123457)  # arrotondamento half-up come to_minor
+
+    def test_constructed_models_stay_mutable(self):
+        ts = detect_transfers(parse_csv_to_models(io.BytesIO(CSV)))
+        ts[0].temp_id = "x"
+        self.assertEqual(ts[0].temp_id, "x")
+
+    def test_every_row_is_accounted_for(self):
+        rejects = []
+        ts = parse_upload(io.BytesIO(dirty_wallet_csv_bytes(2000, 0.1)), rejects)
+        self.assertEqual(len(ts) + len({r.row for r in rejects}), 2000)
+        self.assertGreater(len(rejects), 100)
+
+    def test_cached_parse_returns_rejects(self):
+        data = dirty_wallet_csv_bytes(300, 0.2, seed=7)
+        first, second = [], []
+        parse_upload_cached(data, first)
+        parse_upload_cached(data, second)
+        self.assertTrue(first)
+        self.assertEqual(first, second)
+
+if __name__ == '__main__':
+    unittest.main()
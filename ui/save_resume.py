@@ -0,0 +1,41 @@
+import functools
+
+import streamlit as st
+
+def _build_snapshot(*args) -> bytes:
+    from snapshot import save_snapshot
+    return save_snapshot(*args)
+
+def render_save_button(step: int):
+    """Bottone per scaricare lo stato attuale e riprenderlo più tardi"""
+    # data come callable: lo snapshot viene generato solo al click, non a ogni rerun.
+    # Streamlit lo esegue dopo, in un thread senza contesto di sessione: lo stato
+    # va letto adesso e passato come argomenti, non riletto da st.session_state
+    state = st.session_state
+    snapshot = functools.partial(
+        _build_snapshot, state.transactions, state.accounts, state.cashew_struct,
+        state.mapping, state.output_format, step, state.rules,
+    )
+    st.download_button(
+        "💾 Salva migrazione", snapshot, "cashew_migrazione.arrow",
+        "application/vnd.apache.arrow.file", key=f"save_snapshot_{step}",
+        use_container_width=True, help="Riprendi più tardi senza ricaricare e rianalizzare il CSV",
+    )
+
+def render_resume_uploader():
+    """Caricamento di uno snapshot salvato: ripristina lo stato e salta allo step salvato"""
+    saved = st.file_uploader("Riprendi migrazione", type=['arrow'], key="resume_upload", label_visibility="collapsed")
+    if saved and st.session_state.get('resume_id') != saved.file_id:
+        from snapshot import load_snapshot
+        try:
+            with st.spinner("Ripristino in corso..."):
+                state = load_snapshot(saved.getbuffer())
+        except ValueError as e:
+            st.error(str(e))
+            return
+        for key, value in state.items():
+            st.session_state[key] = value
+        st.session_state.resume_id = saved.file_id
+        st.session_state.payee_map = None
+        st.session_state.selected_cat_editor = next(iter(state['cashew_struct']), "")
+        st.rerun()
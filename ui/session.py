@@ -0,0 +1,24 @@
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from session_memory import SessionArtifacts
+
+def session_artifacts() -> SessionArtifacts:
+    """Artefatti grandi della sessione corrente (con budget di memoria)"""
+    if 'artifacts' not in st.session_state:
+        ctx = get_script_run_ctx()
+        st.session_state.artifacts = SessionArtifacts(ctx.session_id if ctx else "local")
+    return st.session_state.artifacts
+
+def render_memory_monitor():
+    """Pannello di monitoraggio (memoria per sessione, cache condivise)"""
+    from resources import PARSE_CACHE, resources_stats
+    from session_memory import memory_report
+
+    report = memory_report()
+    with st.sidebar.expander("🖥️ Memoria", expanded=False):
+        st.metric("Sessioni attive", len(report["sessions"]))
+        c1, c2 = st.columns(2)
+        c1.metric("RAM sessioni", f"{report['total_memory_bytes'] / 1024 / 1024:.1f} MB")
+        c2.metric("Su disco", f"{report['total_disk_bytes'] / 1024 / 1024:.1f} MB")
+        st.json({"sessioni": report["sessions"], "cache_parsing": PARSE_CACHE.stats(),
+                 "risorse_condivise": resources_stats()}, expanded=False)
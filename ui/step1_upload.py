@@ -1,6 +1,5 @@
 import streamlit as st
-from logic import parse_csv_to_models
-from models import AccountConfig
+from ui.save_resume import render_resume_uploader
 
 def render_step1():
     col_left, col_right = st.columns([1, 1], gap="large")
@@ -31,30 +30,60 @@ def render_step1():
             else:
                 st.warning("⚠️ **Attenzione:** Il CSV non include colori o icone.", icon="⚠️")
 
+        with st.container(border=True):
+            st.markdown("### Riprendi Migrazione")
+            st.caption("Hai salvato una migrazione? Carica il file `.arrow` per continuare da dove eri rimasto.")
+            render_resume_uploader()
+
     with col_right:
         with st.container(border=True):
             st.markdown("### 2. Carica Export")
-            st.caption("Trascina qui il file `wallet-export.csv` originale.")
+            st.caption("Trascina qui il file `wallet-export.csv` originale, anche compresso (`.gz`, `.zip`, `.xz`). "
+                       "Sono supportati anche estratti conto OFX/QFX, QIF e CSV bancari.")
 
-            uploaded = st.file_uploader("", type=['csv'], label_visibility="collapsed")
+            uploaded = st.file_uploader("", type=['csv', 'txt', 'ofx', 'qfx', 'qif', 'gz', 'zip', 'xz', 'bz2'], label_visibility="collapsed")
 
             if uploaded:
+                # Import differito: pandas/pydantic servono solo con un file caricato
+                from logic import parse_upload_cached
+                from models import AccountConfig
+                from resources import PARSE_CACHE
                 try:
-                    with st.spinner("Analisi in corso..."):
-                        ts = parse_csv_to_models(uploaded)
-                        st.session_state.transactions = ts
+                    # Rerun con lo stesso file (bottoni formato, Prosegui): niente da rifare
+                    if st.session_state.get('upload_id') != uploaded.file_id:
+                        with st.spinner("Analisi in corso..."):
+                            rejects = []
+                            st.session_state.transactions = parse_upload_cached(uploaded.getvalue(), rejects)
+                            st.session_state.rejects = rejects
+                            st.session_state.upload_id = uploaded.file_id
+                            st.session_state.payee_map = None
 
-                        # Setup accounts
-                        unique_accs = {t.account for t in ts}
-                        for acc in unique_accs:
-                            if acc not in st.session_state.accounts:
-                                st.session_state.accounts[acc] = AccountConfig(name_cashew=acc)
+                    ts = st.session_state.transactions
+                    # Setup accounts
+                    from logic import account_currencies
+                    currencies = account_currencies(ts)
+                    unique_accs = set(currencies)
+                    for acc, currency in currencies.items():
+                        if acc not in st.session_state.accounts:
+                            st.session_state.accounts[acc] = AccountConfig(name_cashew=acc, currency=currency)
 
                     st.markdown("---")
                     st.markdown(f"**Risultato Analisi:**")
-                    c1, c2 = st.columns(2)
+                    rejects = st.session_state.rejects
+                    c1, c2, c3 = st.columns(3)
                     c1.metric("Transazioni", len(ts))
                     c2.metric("Conti", len(unique_accs))
+                    c3.metric("Righe scartate", len({(r.source, r.row) for r in rejects}))
+                    if rejects:
+                        from validation import rejects_frame
+                        table = rejects_frame(rejects)
+                        with st.expander(f"⚠️ {len(table)} problemi nelle righe scartate"):
+                            st.dataframe(table.head(1000), hide_index=True, use_container_width=True)
+                            st.download_button("Scarica scarti (CSV)", table.to_csv(index=False).encode(),
+                                               "scarti.csv", "text/csv", use_container_width=True)
+                    cache = PARSE_CACHE.stats()
+                    st.caption(f"Cache parsing: {cache['hits']} hit · {cache['misses']} miss · "
+                               f"{cache['bytes'] / 1024 / 1024:.1f}/{cache['max_bytes'] / 1024 / 1024:.0f} MB")
 
                     st.markdown("<br>", unsafe_allow_html=True)
                     if st.button("Prosegui alla Configurazione ➔", type="primary", use_container_width=True):
@@ -1,6 +1,6 @@
 import streamlit as st
 import pandas as pd
-from logic import DEFAULT_CASHEW_STRUCTURE
+from defaults import DEFAULT_CASHEW_STRUCTURE
 
 def render_step2():
     st.markdown("### 📂 Gestione Categorie")
@@ -1,6 +1,54 @@
 import streamlit as st
+import pandas as pd
 from logic import ai_suggest_mapping
-from models import CashewConfig
+from models import CashewConfig, PayeeRule
+from rules import apply_rules, validate_rules
+from ui.save_resume import render_save_button
+
+FIELD_LABELS = {"any": "Payee o Nota", "payee": "Payee", "note": "Nota"}
+
+def render_rules_editor(cashew_mains):
+    """Regole payee/nota: hanno priorità sul mapping e finiscono in associated_titles"""
+    with st.expander(f"📏 Regole Payee/Nota ({len(st.session_state.rules)})"):
+        st.caption("Parole chiave o regex che assegnano la categoria in base a payee o nota. "
+                   "Vince la prima regola della lista. Le regole vengono salvate anche in Cashew "
+                   "per la categorizzazione automatica futura.")
+        all_subs = sorted({s for d in st.session_state.cashew_struct.values() for s in d['subs']})
+        df_rules = pd.DataFrame(
+            [[r.pattern, r.is_regex, FIELD_LABELS.get(r.field, r.field), r.main_category, r.sub_category]
+             for r in st.session_state.rules],
+            columns=["Pattern", "Regex", "Campo", "Categoria", "Sottocategoria"],
+        )
+        edited = st.data_editor(
+            df_rules, num_rows="dynamic", use_container_width=True, hide_index=True, key="rules_editor",
+            column_config={
+                "Pattern": st.column_config.TextColumn("Pattern", required=True),
+                "Regex": st.column_config.CheckboxColumn("Regex", default=False),
+                "Campo": st.column_config.SelectboxColumn("Campo", options=list(FIELD_LABELS.values()), default="Payee o Nota"),
+                "Categoria": st.column_config.SelectboxColumn("Categoria", options=cashew_mains, required=True),
+                "Sottocategoria": st.column_config.SelectboxColumn("Sottocategoria", options=[""] + all_subs, default=""),
+            },
+        )
+
+        label_to_field = {v: k for k, v in FIELD_LABELS.items()}
+        rules = []
+        for row in edited.itertuples(index=False):
+            pattern, is_regex, field, main, sub = row
+            if not isinstance(pattern, str) or not pattern.strip() or main not in st.session_state.cashew_struct:
+                continue
+            # La sottocategoria deve appartenere alla categoria scelta
+            if sub not in st.session_state.cashew_struct[main]['subs']:
+                sub = ""
+            rules.append(PayeeRule(pattern=pattern.strip(), is_regex=bool(is_regex),
+                                   field=label_to_field.get(field, "any"), main_category=main, sub_category=sub))
+        rules, errors = validate_rules(rules)
+        for err in errors:
+            st.warning(err)
+        st.session_state.rules = rules
+
+        if rules:
+            hits = apply_rules(st.session_state.transactions, rules)
+            st.caption(f"{sum(h is not None for h in hits)} transazioni su {len(hits)} coperte dalle regole.")
 
 def render_step3():
     st.markdown("### 🤖 Mapping Intelligente")
@@ -69,11 +117,15 @@ def render_step3():
             )
             st.divider()
 
+    render_rules_editor(cashew_mains)
+
     st.markdown("<br>", unsafe_allow_html=True)
-    c_prev, c_next = st.columns([1, 4])
+    c_prev, c_save, c_next = st.columns([1, 1, 3])
     if c_prev.button("⬅ Indietro", use_container_width=True):
         st.session_state.step = 2
         st.rerun()
+    with c_save:
+        render_save_button(3)
     if c_next.button("Avanti: Esporta ➔", type="primary", use_container_width=True):
         st.session_state.step = 4
         st.rerun()
@@ -1,76 +1,42 @@
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
 import datetime
-from database import CashewDatabase
-from logic import detect_transfers, generate_uuid, get_ts
-from models import CashewConfig, ProcessedTransaction
+from builder import MigrationBuilder
+from payees import cluster_payees
+from analytics import suggest_limits, LIMIT_BASIS
+from ui.save_resume import render_save_button
+from ui.session import session_artifacts
 
 def render_step4():
     st.markdown("<h2 style='text-align: center;'>🎉 Tutto Pronto!</h2>", unsafe_allow_html=True)
     st.caption("<p style='text-align: center;'>I tuoi dati sono pronti per essere scaricati.</p>", unsafe_allow_html=True)
 
-    # Logic Execution (Simplified for UI responsiveness)
-    final_transactions = detect_transfers(st.session_state.transactions)
-    db = CashewDatabase()
-
-    # 1. Wallets
-    w_uuids = {}
-    for name, conf in st.session_state.accounts.items():
-        uid = generate_uuid()
-        w_uuids[name] = uid
-        db.add_wallet(uid, conf)
-
-    # 2. Categories
-    c_uuids = {}
-    for main, data in st.session_state.cashew_struct.items():
-        uid_m = generate_uuid()
-        c_uuids[(main, "")] = uid_m
-        db.add_category(uid_m, main, data['color'], data['icon'], None)
-        for sub in data['subs']:
-            uid_s = generate_uuid()
-            c_uuids[(main, sub)] = uid_s
-            db.add_category(uid_s, sub, None, None, uid_m)
-
-    # 3. Transactions
-    processed_list = []
-    for t in final_transactions:
-        map_conf = st.session_state.mapping.get(t.category, CashewConfig(main_category="Altro"))
-        w_fk = w_uuids.get(t.account, list(w_uuids.values())[0])
-
-        main_cat = map_conf.main_category
-        sub_cat = map_conf.sub_category
-
-        if t.is_transfer:
-            title = "Trasferimento"
-            c_fk = "0"
-            s_fk = None
-            main_cat = "Trasferimento"
-            sub_cat = None
-        else:
-            title = main_cat
-            main_uuid = c_uuids.get((main_cat, ""), "0")
-            c_fk = main_uuid
-            s_fk = c_uuids.get((main_cat, sub_cat)) if sub_cat else None
-
-        t_id = generate_uuid()
-        pt = ProcessedTransaction(
-            id=t_id, date_ms=get_ts(t.date_str), amount=t.amount, title=title,
-            note=f"{t.note} | {t.payee}" if t.payee else t.note,
-            wallet_fk=w_fk, category_fk=c_fk, sub_category_fk=s_fk,
-            main_category_name=main_cat, sub_category_name=sub_cat,
-            is_income=t.amount > 0, paired_id=None
-        )
-        t.temp_id = t_id
-        processed_list.append(pt)
-
-    # Pairing
-    for i, t in enumerate(final_transactions):
-        if hasattr(t, 'paired_with_idx') and t.paired_with_idx is not None:
-             if 0 <= t.paired_with_idx < len(processed_list):
-                 processed_list[i].paired_id = processed_list[t.paired_with_idx].id
-
-    for pt in processed_list: db.add_transaction(pt)
+    # Il DB resta in sessione: dopo la prima costruzione le modifiche di
+    # mapping/struttura diventano aggiornamenti incrementali (vedi builder.py)
+    art = session_artifacts()
+    art.track("transactions", st.session_state.transactions)
+    if st.session_state.get('payee_map') is None:
+        st.session_state.payee_map = cluster_payees(t.payee for t in st.session_state.transactions)
+    if st.session_state.get('builder') is None:
+        st.session_state.builder = MigrationBuilder()
+    builder = st.session_state.builder
+    kind = builder.sync(
+        st.session_state.transactions, st.session_state.accounts, st.session_state.cashew_struct,
+        st.session_state.mapping, st.session_state.rules, st.session_state.payee_map,
+    )
+    if kind == "full":
+        art.put("db", builder.db)
+
+    # Statistiche mensili per categoria (+ budget suggeriti, opzionali)
+    stats = builder.monthly_stats()
+    basis = st.session_state.get('budget_basis', "75° percentile")
+    builder.sync_budgets(suggest_limits(stats, LIMIT_BASIS[basis]) if st.session_state.get('suggest_budgets', False) else None)
+    if kind != "full":
+        art.refresh("db")
+
+    # Verifica integrità: saldi attesi per conto calcolati dal CSV sorgente (interi, esatti)
+    checks = builder.verify()
+    db = builder.db
 
     # --- UI ---
     col1, col2 = st.columns(2, gap="large")
@@ -78,33 +44,89 @@ def render_step4():
     with col1:
         with st.container(border=True):
             st.markdown("### 📊 Anteprima")
-            df_viz = pd.DataFrame([p.dict() for p in processed_list])
-            if not df_viz.empty:
-                exp = df_viz[df_viz['amount'] < 0]
-                if not exp.empty:
-                    fig = go.Figure(data=[go.Pie(labels=exp['main_category_name'], values=exp['amount'].abs(), hole=.5)])
+            # Aggregazione su interi (unità minori), float solo per la visualizzazione
+            df_viz = pd.DataFrame({
+                'main_category_name': builder.main_category_names(),
+                'amount_minor': builder.amount_minor,
+                'decimals': builder.decimals,
+            })
+            exp = df_viz[df_viz['amount_minor'] < 0]
+            if not exp.empty:
+                by_cat = exp.groupby(['main_category_name', 'decimals'])['amount_minor'].sum().reset_index()
+                by_cat['amount'] = by_cat['amount_minor'].abs() / 10.0 ** by_cat['decimals']
+                by_cat = by_cat.groupby('main_category_name')['amount'].sum()
+                if not by_cat.empty:
+                    import plotly.graph_objects as go
+                    fig = go.Figure(data=[go.Pie(labels=by_cat.index, values=by_cat.values, hole=.5)])
                     fig.update_layout(margin=dict(t=0, b=0, l=0, r=0), height=300, paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', showlegend=False)
                     st.plotly_chart(fig, use_container_width=True)
-                    st.markdown(f"<div style='text-align:center'>Totale Uscite: <b>€ {exp['amount'].sum():,.2f}</b></div>", unsafe_allow_html=True)
+                    st.markdown(f"<div style='text-align:center'>Totale Uscite: <b>€ {-by_cat.sum():,.2f}</b></div>", unsafe_allow_html=True)
 
     with col2:
         with st.container(border=True):
             st.markdown("### 📥 Download")
-            st.write(f"Generate **{len(processed_list)}** transazioni.")
-
+            st.write(f"Generate **{len(builder.amount_minor)}** transazioni.")
+            if kind == "delta":
+                st.caption(f"Aggiornamento incrementale: {builder.rows_touched} transazioni, "
+                           f"{builder.categories_touched} categorie modificate.")
+
+            # I bytes dell'export passano dagli artefatti di sessione (budget + spill su disco)
+            # e vengono rigenerati solo se il DB è cambiato
+            export_key = (builder.version, st.session_state.output_format)
+            fresh = st.session_state.get('export_key') == export_key and art.has("export")
             if st.session_state.output_format == "SQL":
-                try: data = db.get_binary_sqlite(); fn = "cashew_backup.sqlite"; mime="application/x-sqlite3"
-                except: data = db.get_sql_dump().encode(); fn = "cashew.sql"; mime="text/x-sql"
-
-                st.download_button("SCARICA DATABASE", data, fn, mime, type="primary", use_container_width=True)
+                fn, mime = st.session_state.get('export_file', ("cashew_backup.sqlite", "application/x-sqlite3"))
+                if not fresh:
+                    st.session_state.export_report = None
+                    try:
+                        data, st.session_state.export_report = db.get_restore_sqlite()
+                        fn = "cashew_backup.sqlite"; mime="application/x-sqlite3"
+                    except: data = db.get_sql_dump().encode(); fn = "cashew.sql"; mime="text/x-sql"
+                    art.put("export", data)
+                    st.session_state.export_file = (fn, mime)
+
+                st.download_button("SCARICA DATABASE", lambda: art.get("export"), fn, mime, type="primary", use_container_width=True)
+                report = st.session_state.get('export_report')
+                if report is not None:
+                    st.caption(f"Ottimizzato per il ripristino: {report.size_before / 1024:,.0f} KB → "
+                               f"{report.size_after / 1024:,.0f} KB, indici in {report.index_ms:.0f} ms, "
+                               f"ANALYZE {report.analyze_ms:.0f} ms, VACUUM {report.vacuum_ms:.0f} ms.")
+                    if report.schema_issues:
+                        st.warning("Schema diverso dal backup Cashew di riferimento:\n\n- "
+                                   + "\n- ".join(report.schema_issues[:5]))
                 st.info("Importa in Cashew > Backup > Ripristina")
             else:
-                # CSV Export Logic (Simplified)
-                csv_df = pd.DataFrame([p.dict() for p in processed_list]) # Placeholder for full logic
-                csv_data = csv_df.to_csv(index=False)
-                st.download_button("SCARICA CSV", csv_data, "import.csv", "text/csv", type="primary", use_container_width=True)
+                if not fresh:
+                    art.put("export", builder.export_frame().to_csv(index=False).encode())
+                st.download_button("SCARICA CSV", lambda: art.get("export"), "import.csv", "text/csv", type="primary", use_container_width=True)
+            st.session_state.export_key = export_key
+
+            render_save_button(4)
+
+    with st.expander("📈 Spesa mensile per categoria"):
+        c_tog, c_basis = st.columns(2)
+        c_tog.toggle("Crea budget e limiti per categoria nel backup", key="suggest_budgets")
+        c_basis.selectbox("Limite basato su", list(LIMIT_BASIS), key="budget_basis",
+                          index=list(LIMIT_BASIS).index(basis), label_visibility="collapsed")
+        if stats.empty:
+            st.caption("Nessuna uscita da analizzare.")
+        else:
+            st.dataframe(stats.round(2), use_container_width=True)
+            limits = suggest_limits(stats, LIMIT_BASIS[basis])
+            st.caption(f"Budget mensile suggerito ({basis}): € {sum(limits.values()):,.0f} su {len(limits)} categorie.")
+
+    failed = [c for c in checks if not c.passed]
+    with st.expander(f"🔍 Verifica integrità: {len(checks) - len(failed)}/{len(checks)} controlli superati", expanded=bool(failed)):
+        for c in checks:
+            st.markdown(f"{'✅' if c.passed else '❌'} **{c.name}**" + ("" if c.passed else f" — {c.issues} problemi"))
+            for d in c.details:
+                st.caption(d)
 
     st.markdown("<br>", unsafe_allow_html=True)
     if st.button("🔄 Nuova Migrazione", use_container_width=True):
+        art.release()
+        st.session_state.builder = None
+        st.session_state.export_key = None
+        st.session_state.export_report = None
         st.session_state.step = 1
         st.rerun()
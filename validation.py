@@ -0,0 +1,187 @@
+"""
+Validazione vettoriale delle righe sorgente.
+
+Invece di costruire un modello per riga e scartare in silenzio quelle che
+sollevano eccezioni, ogni blocco letto da pandas viene controllato colonna
+per colonna con maschere booleane (campi obbligatori, importi, date). Le
+righe scartate finiscono in una tabella di scarti (file, riga, colonna,
+motivo) scaricabile dallo step 1; i modelli vengono creati con
+model_construct solo per le righe valide, già normalizzate.
+
+Le colonne sono stringhe Arrow (string[pyarrow]): le operazioni .str
+girano in C++ invece che in un ciclo Python per cella.
+"""
+import re
+from typing import List, NamedTuple, Optional, Tuple
+
+from models import WalletTransaction, currency_decimals, to_minor
+
+TEXT_DTYPE = "string[pyarrow]"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"  # lo stesso atteso da logic.get_ts
+AMOUNT_PATTERN = r"[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?"
+NON_ASCII = r"[^\x00-\x7f]"
+
+
+class Reject(NamedTuple):
+    """Riga scartata: `row` è la riga del file (l'intestazione è la riga 1)"""
+    source: str
+    row: int
+    column: str
+    reason: str
+
+
+def rejects_frame(rejects: List[Reject]):
+    import pandas as pd
+    return pd.DataFrame(rejects, columns=list(Reject._fields))
+
+
+def _text(values):
+    """Colonna come stringhe Arrow ("" per le celle vuote), fix dell'encoding solo dove serve"""
+    import numpy as np
+    import pandas as pd
+    from logic import fix_encoding
+
+    if pd.api.types.is_float_dtype(values):  # es. colonna numerica letta da un altro reader
+        values = values.map(repr).where(np.isfinite(values.to_numpy(dtype=float)))
+    s = values.astype(TEXT_DTYPE).fillna("")
+    broken = s.str.contains(NON_ASCII, regex=True).to_numpy(dtype=bool)
+    if broken.any():
+        s = s.copy()
+        s[broken] = s[broken].map(fix_encoding)
+    return s
+
+
+def normalize_amounts(values):
+    """
+    Importi come stringhe decimali con il punto ("-1234.50"), NA se non
+    interpretabili. Stesse regole di models.parse_amount (formato europeo o
+    US, simboli di valuta), ma su tutta la colonna.
+    """
+    s = _text(values).str.replace(r"[€$\s]", "", regex=True)
+    comma = s.str.rfind(",").to_numpy(dtype=int)
+    dot = s.str.rfind(".").to_numpy(dtype=int)
+    both = (comma >= 0) & (dot >= 0)
+    european = (both & (comma > dot)) | ((comma >= 0) & (dot < 0))
+    s = s.where(~(both & (comma > dot)), s.str.replace(".", "", regex=False))
+    s = s.where(~european, s.str.replace(",", ".", regex=False))
+    s = s.where(european, s.str.replace(",", "", regex=False))
+    return s.where(s.str.fullmatch(AMOUNT_PATTERN).to_numpy(dtype=bool))
+
+
+def normalize_amount(value) -> Optional[str]:
+    """Versione scalare di normalize_amounts, per i reader a record"""
+    s = re.sub(r"[€$\s]", "", str(value))
+    comma, dot = s.rfind(","), s.rfind(".")
+    if comma >= 0 and dot >= 0:
+        s = s.replace(".", "").replace(",", ".") if comma > dot else s.replace(",", "")
+    elif comma >= 0:
+        s = s.replace(",", ".")
+    return s if re.fullmatch(AMOUNT_PATTERN, s) else None
+
+
+def record_problem(rec: dict) -> Optional[Tuple[str, str]]:
+    """
+    (colonna, motivo) se un record normalizzato non è importabile. I reader
+    a record lasciano la data vuota quando non riescono a interpretarla:
+    senza questo controllo get_ts la trasformerebbe nell'ora corrente e
+    parse_amount un importo illeggibile in zero.
+    """
+    if not rec.get("date"):
+        return "date", "data mancante o non valida"
+    if normalize_amount(rec.get("amount", "")) is None:
+        return "amount", "importo non numerico"
+    return None
+
+
+def amounts_to_minor(normalized, decimals) -> List[int]:
+    """
+    Importi normalizzati -> unità minori. Se le cifre decimali non superano
+    quelle della valuta il float scalato è esatto dopo l'arrotondamento
+    all'intero; gli altri casi (arrotondamento, esponente) passano da to_minor.
+    """
+    import numpy as np
+
+    dec = decimals.to_numpy(dtype=np.int64)
+    dot = normalized.str.find(".").to_numpy(dtype=np.int64)
+    frac = np.where(dot >= 0, normalized.str.len().to_numpy(dtype=np.int64) - dot - 1, 0)
+    exact = (frac <= dec) & ~normalized.str.contains("e", case=False, regex=False).to_numpy(dtype=bool)
+    scaled = np.where(exact, normalized.where(exact, "0").astype(float).to_numpy(), 0.0) * 10.0 ** dec
+    exact &= np.abs(scaled) < 2 ** 53
+    minor = np.rint(np.where(exact, scaled, 0.0)).astype(np.int64).tolist()
+    for i in np.flatnonzero(~exact):
+        minor[i] = to_minor(normalized.iat[i], int(dec[i]))
+    return minor
+
+
+def validate_wallet_frame(df, first_row: int = 2, source: str = "") -> Tuple[List[WalletTransaction], List[Reject]]:
+    """
+    Blocco dell'export Wallet -> (transazioni valide, scarti). `first_row` è
+    la riga del file della prima riga del blocco. Nessuna eccezione per riga:
+    i controlli sono maschere su colonne intere.
+    """
+    import numpy as np
+    import pandas as pd
+
+    rows = np.arange(first_row, first_row + len(df))
+    rejects: List[Reject] = []
+    valid = np.ones(len(df), dtype=bool)
+
+    def reject(mask, column: str, reason: str):
+        nonlocal valid
+        if mask.any():
+            rejects.extend(Reject(source, int(r), column, reason) for r in rows[mask])
+            valid &= ~mask
+
+    def column(name: str, required: bool, default: str = ""):
+        if name not in df.columns:
+            if required:
+                reject(np.ones(len(df), dtype=bool), name, "colonna mancante")
+            return pd.Series(default, index=df.index, dtype=TEXT_DTYPE)
+        s = _text(df[name]).str.strip()
+        if required:
+            reject((s == "").to_numpy(dtype=bool), name, "valore mancante")
+        return s
+
+    account = column("account", required=True)
+    category = column("category", required=True)
+    date = column("date", required=True)
+    # Senza colonna valuta vale EUR (come prima); una cella vuota invece è un errore
+    currency = column("currency", required="currency" in df.columns, default="EUR").str.upper()
+
+    amount = column("amount", required=True)
+    amounts = normalize_amounts(amount)
+    reject((amount != "").to_numpy(dtype=bool) & amounts.isna().to_numpy(), "amount", "importo non numerico")
+
+    parsed = pd.to_datetime(date.str.slice(0, 19), format=DATE_FORMAT, errors="coerce")
+    reject((date != "").to_numpy(dtype=bool) & parsed.isna().to_numpy(),
+           "date", f"data non valida (atteso {DATE_FORMAT})")
+
+    is_transfer = ((column("transfer", required=False).str.lower() == "true")
+                   | (column("type", required=False).str.upper() == "TRANSFER")).to_numpy(dtype=bool)
+
+    rejects.sort(key=lambda r: r.row)
+    if not valid.any():
+        return [], rejects
+    currency = currency[valid]
+    minor = amounts_to_minor(amounts[valid], currency.map(currency_decimals))
+    transactions = [
+        WalletTransaction.model_construct(
+            account=acc, category=cat, currency=cur, amount_minor=amt,
+            note=note, payee=payee, date_str=d, is_transfer=tr,
+        )
+        for acc, cat, cur, amt, note, payee, d, tr in zip(
+            account[valid].tolist(), category[valid].tolist(), currency.tolist(), minor,
+            column("note", required=False)[valid].tolist(), column("payee", required=False)[valid].tolist(),
+            date[valid].tolist(), is_transfer[valid].tolist(),
+        )
+    ]
+    return transactions, rejects
+
+
+def exception_reason(e: Exception) -> Tuple[str, str]:
+    """(colonna, motivo) da un errore di validazione pydantic, per i reader a record"""
+    errors = getattr(e, "errors", None)
+    if callable(errors):
+        first = errors()[0]
+        return ".".join(str(p) for p in first.get("loc", ())), first.get("msg", str(e))
+    return "", str(e)